@@ -1,22 +1,37 @@
 #!/usr/bin/env python
 """Entry point script for running the insurance prediction project."""
 
+from __future__ import annotations
+
 import sys
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any
 
 from kedro.framework.hooks import _create_hook_manager
 from kedro.framework.session import KedroSession
 from kedro.framework.startup import bootstrap_project
 
+from insurance_prediction.runners import AutoRunner, IncrementalRunner
+from insurance_prediction.settings import RUNNER
+
 
-def run_pipeline(pipeline_name: str = None, **kwargs: Dict[str, Any]):
+def run_pipeline(
+    pipeline_name: str | None = None, incremental: bool = True, **kwargs: dict[str, Any]
+):
     """Run the specified pipeline with the given parameters.
 
     Args:
         pipeline_name: Name of the pipeline to run. If None, the default pipeline will be run.
+        incremental: Skip the nodes whose code, parameters and inputs are
+            unchanged since they last ran, see ``IncrementalRunner``.
         **kwargs: Additional parameters to pass to the run command.
     """
+    # The nodes run on the runner chosen by the RUNNER setting
+    runner = AutoRunner(**RUNNER)
+    if incremental:
+        runner = IncrementalRunner(runner=runner)
+    kwargs.setdefault("runner", runner)
+
     # Get the current project path
     project_path = Path.cwd()
 
@@ -37,9 +52,12 @@ def run_pipeline(pipeline_name: str = None, **kwargs: Dict[str, Any]):
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
+    # --full runs every node, ignoring the recorded fingerprints
+    incremental = "--full" not in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != "--full"]
+    if args:
         # Run a specific pipeline if provided
-        run_pipeline(sys.argv[1])
+        run_pipeline(args[0], incremental=incremental)
     else:
         # Run the default pipeline
-        run_pipeline()
+        run_pipeline(incremental=incremental)
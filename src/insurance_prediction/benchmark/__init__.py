@@ -0,0 +1,13 @@
+"""Benchmarks of the pipeline nodes on synthetic data."""
+
+from .runner import STEPS, compare_results, run_benchmark, run_suite
+from .synthetic import make_policies, write_policies
+
+__all__ = [
+    "STEPS",
+    "compare_results",
+    "make_policies",
+    "run_benchmark",
+    "run_suite",
+    "write_policies",
+]
@@ -0,0 +1,88 @@
+"""Benchmark the pipeline nodes with ``python -m insurance_prediction.benchmark``.
+
+Results are written as JSON; pass ``--compare`` with the results of an
+earlier commit to report the steps that got slower.
+"""
+
+import argparse
+import json
+import logging
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from insurance_prediction.benchmark.runner import (
+    STEPS,
+    compare_results,
+    load_parameters,
+    run_suite,
+)
+
+_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_size(size: str) -> int:
+    """Parse a number of rows such as ``10000``, ``10k`` or ``1m``."""
+    multiplier = _SUFFIXES.get(size[-1:].lower(), 1)
+    digits = size[:-1] if multiplier > 1 else size
+    try:
+        return int(float(digits) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid size '{size}'") from None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes", nargs="+", type=parse_size, default=[10_000, 1_000_000, 10_000_000]
+    )
+    parser.add_argument("--steps", nargs="+", choices=STEPS, default=list(STEPS))
+    parser.add_argument("--project-path", default=".")
+    parser.add_argument("--env", default=None)
+    parser.add_argument("--encoding", choices=["one_hot", "native"], default=None)
+    parser.add_argument("--backend", choices=["pandas", "arrow"], default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-directory", default="data/08_benchmarks/data")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None, help="Baseline results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parameters = load_parameters(args.project_path, args.env)
+    if args.encoding:
+        parameters["encoding"] = args.encoding
+    if args.backend:
+        parameters["backend"] = args.backend
+
+    report = run_suite(
+        args.sizes, args.data_directory, parameters, args.steps, args.seed
+    )
+    output = Path(
+        args.output
+        or f"data/08_benchmarks/benchmark_{datetime.now():%Y%m%dT%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        rows = compare_results(baseline, report, args.tolerance)
+        print(
+            f"{'step':<24}{'rows':>12}{'baseline s':>12}{'current s':>12}{'ratio':>8}"
+        )
+        for row in rows:
+            print(
+                f"{row['step']:<24}{row['rows']:>12}{row['baseline_seconds']:>12.3f}"
+                f"{row['current_seconds']:>12.3f}{row['wall_ratio']:>8.2f}"
+                + ("  REGRESSION" if row["regression"] else "")
+            )
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
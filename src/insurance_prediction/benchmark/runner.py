@@ -0,0 +1,356 @@
+"""Time and memory-profile the pipeline nodes on synthetic data."""
+
+from __future__ import annotations
+
+import gc
+import logging
+import os
+import platform
+import subprocess
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+from insurance_prediction.benchmark.synthetic import write_policies
+from insurance_prediction.pipelines.data_processing.nodes import (
+    fit_category_mappings,
+    load_data,
+    preprocess_data,
+    split_data,
+)
+from insurance_prediction.pipelines.model_evaluation.nodes import (
+    evaluate_model,
+    predict_probabilities,
+)
+from insurance_prediction.pipelines.model_training.nodes import (
+    train_model,
+    tune_model_hyperparameters,
+)
+from insurance_prediction.profiling import measure
+
+logger = logging.getLogger(__name__)
+
+# Steps in pipeline order; each one reads the outputs of those before it
+STEPS = (
+    "load_data",
+    "fit_category_mappings",
+    "preprocess_data",
+    "split_data",
+    "tuning_trial",
+    "train_model",
+    "predict_probabilities",
+    "evaluate_model",
+)
+
+# Fixed hyperparameters of the ``train_model`` step, so that its timings
+# compare across commits whatever the tuning step finds
+TRAIN_PARAMS = {"n_estimators": 100, "learning_rate": 0.1, "num_leaves": 31}
+
+# Parameters used when no project configuration is given
+DEFAULT_PARAMETERS = {
+    "categorical_columns": [
+        "CalYear",
+        "Gender",
+        "Type",
+        "Category",
+        "Occupation",
+        "SubGroup2",
+        "Group2",
+        "Group1",
+    ],
+    "encoding": "one_hot",
+    "backend": "pandas",
+    "test_size": 0.2,
+    "stratify": True,
+    "random_state": 42,
+    "tuning": {"pruner": "median", "early_stopping_rounds": 20},
+    "evaluation": {"threshold": 0.5},
+}
+
+
+def load_parameters(
+    project_path: str | None = None, env: str | None = None
+) -> dict[str, Any]:
+    """Read the parameters of a Kedro project without starting a session.
+
+    Args:
+        project_path: Root of the Kedro project, the current directory if
+            not set
+        env: Configuration environment overriding ``base``
+
+    Returns:
+        The project parameters
+    """
+    from kedro.config import OmegaConfigLoader
+
+    loader = OmegaConfigLoader(
+        str(Path(project_path or ".").resolve() / "conf"),
+        base_env="base",
+        default_run_env=env or "local",
+    )
+    return dict(loader["parameters"])
+
+
+def _steps(
+    data_path: Path, parameters: dict[str, Any]
+) -> dict[str, tuple[Callable[[dict[str, Any]], Any], Callable[[Any], dict]]]:
+    """Map each step to a function of the previous outputs and to a function
+    storing its result among them."""
+    tuning_options = {
+        **parameters.get("tuning", {}),
+        # One process and an in-memory study, which leaves no journal behind
+        "n_workers": 1,
+        "storage": None,
+        "warm_start_trials": 0,
+    }
+    random_state = parameters["random_state"]
+
+    return {
+        "load_data": (
+            lambda state: load_data(
+                str(data_path), backend=parameters.get("backend", "pandas")
+            ),
+            lambda raw: {"raw": raw},
+        ),
+        "fit_category_mappings": (
+            lambda state: fit_category_mappings(
+                state["raw"], parameters["categorical_columns"]
+            ),
+            lambda mappings: {"mappings": mappings},
+        ),
+        "preprocess_data": (
+            lambda state: preprocess_data(
+                state.pop("raw"),
+                parameters["categorical_columns"],
+                state["mappings"],
+                parameters["encoding"],
+            ),
+            lambda data: {"data": data},
+        ),
+        "split_data": (
+            lambda state: split_data(
+                state.pop("data"),
+                parameters["test_size"],
+                random_state,
+                parameters.get("stratify", False),
+            ),
+            lambda split: dict(zip(("X_train", "X_test", "y_train", "y_test"), split)),
+        ),
+        "tuning_trial": (
+            lambda state: tune_model_hyperparameters(
+                state["X_train"],
+                state["y_train"],
+                1,
+                random_state,
+                state["mappings"],
+                tuning_options,
+            ),
+            lambda best_params: {},
+        ),
+        "train_model": (
+            lambda state: train_model(
+                state["X_train"],
+                state["y_train"],
+                TRAIN_PARAMS,
+                random_state,
+                state["mappings"],
+            ),
+            lambda model: {"model": model},
+        ),
+        "predict_probabilities": (
+            lambda state: predict_probabilities(
+                state["model"], state["X_test"], state["mappings"]
+            ),
+            lambda predictions: {"predictions": predictions},
+        ),
+        "evaluate_model": (
+            lambda state: evaluate_model(
+                state["predictions"],
+                state["y_test"],
+                parameters.get("evaluation", {}).get("threshold", 0.5),
+            ),
+            lambda metrics: {},
+        ),
+    }
+
+
+def run_benchmark(
+    n_rows: int,
+    data_directory: str,
+    parameters: dict[str, Any] | None = None,
+    steps: Sequence[str] = STEPS,
+    seed: int = 0,
+) -> list[dict[str, Any]]:
+    """Run the pipeline steps once on synthetic policies and measure each.
+
+    The synthetic file is written once per size and seed and reused by later
+    runs. Each step is measured on its own: garbage is collected before it
+    starts, inputs the rest of the run no longer needs are released, and its
+    wall time, CPU time and peak increase of resident memory are recorded.
+    Steps are run in pipeline order from ``load_data`` up to the last of
+    ``steps``; steps not in ``steps`` run unmeasured to feed later ones.
+
+    Args:
+        n_rows: Number of policies
+        data_directory: Directory holding the synthetic files
+        parameters: Project parameters, ``DEFAULT_PARAMETERS`` if not set
+        steps: Steps to report, a subset of ``STEPS``
+        seed: Random seed of the synthetic data
+
+    Returns:
+        One result per reported step
+    """
+    unknown = set(steps) - set(STEPS)
+    if unknown:
+        raise ValueError(f"Unknown benchmark steps {sorted(unknown)}")
+    parameters = {**DEFAULT_PARAMETERS, **(parameters or {})}
+
+    data_path = Path(data_directory) / f"policies_{n_rows}_{seed}.parquet"
+    if not data_path.exists():
+        logger.info("Writing %d synthetic policies to '%s'", n_rows, data_path)
+        write_policies(data_path, n_rows, seed)
+
+    functions = _steps(data_path, parameters)
+    last_step = max(STEPS.index(step) for step in steps)
+    state: dict[str, Any] = {}
+    results = []
+    for step in STEPS[: last_step + 1]:
+        run, store = functions[step]
+        gc.collect()
+        with measure() as measurements:
+            output = run(state)
+        state.update(store(output))
+        del output
+        if step not in steps:
+            continue
+        result = {"step": step, "rows": n_rows, **measurements}
+        result["rows_per_second"] = (
+            n_rows / result["wall_seconds"] if result["wall_seconds"] else None
+        )
+        logger.info(
+            "%s on %d rows: %.3fs wall, %.3fs CPU, %+.1f MiB peak RSS",
+            step,
+            n_rows,
+            result["wall_seconds"],
+            result["cpu_seconds"],
+            result["peak_rss_delta_bytes"] / 2**20,
+        )
+        results.append(result)
+    return results
+
+
+def run_suite(
+    sizes: Sequence[int],
+    data_directory: str,
+    parameters: dict[str, Any] | None = None,
+    steps: Sequence[str] = STEPS,
+    seed: int = 0,
+) -> dict[str, Any]:
+    """Benchmark every size and describe the environment of the run.
+
+    Args:
+        sizes: Numbers of policies
+        data_directory: Directory holding the synthetic files
+        parameters: Project parameters, ``DEFAULT_PARAMETERS`` if not set
+        steps: Steps to report
+        seed: Random seed of the synthetic data
+
+    Returns:
+        The environment, the parameters and the results of every size
+    """
+    parameters = {**DEFAULT_PARAMETERS, **(parameters or {})}
+    results = []
+    for n_rows in sizes:
+        results.extend(run_benchmark(n_rows, data_directory, parameters, steps, seed))
+    return {
+        "environment": environment(),
+        "parameters": {
+            "encoding": parameters["encoding"],
+            "seed": seed,
+            "train_params": TRAIN_PARAMS,
+            "tuning": parameters.get("tuning", {}),
+        },
+        "results": results,
+    }
+
+
+def environment() -> dict[str, Any]:
+    """Describe the commit, interpreter, machine and libraries of a run."""
+    import lightgbm
+    import numpy
+    import pandas
+    import pyarrow
+    import sklearn
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "libraries": {
+            module.__name__: module.__version__
+            for module in (lightgbm, numpy, pandas, pyarrow, sklearn)
+        },
+    }
+
+
+def compare_results(
+    baseline: dict[str, Any],
+    current: dict[str, Any],
+    tolerance: float = 0.1,
+    min_seconds: float = 0.05,
+) -> list[dict[str, Any]]:
+    """Compare the wall times and memory of two benchmark runs.
+
+    Args:
+        baseline: Output of ``run_suite`` for the reference commit
+        current: Output of ``run_suite`` for the commit under test
+        tolerance: Relative slow-down of the wall time counted as a
+            regression
+        min_seconds: Smallest absolute slow-down counted as a regression,
+            which keeps the timer noise of very short steps out
+
+    Returns:
+        One row per step and size measured in both runs, with the ratios of
+        the current to the baseline measurements and a ``regression`` flag
+    """
+    reference = {
+        (result["rows"], result["step"]): result for result in baseline["results"]
+    }
+    rows = []
+    for result in current["results"]:
+        before = reference.get((result["rows"], result["step"]))
+        if before is None:
+            continue
+        wall_ratio = result["wall_seconds"] / max(before["wall_seconds"], 1e-9)
+        rows.append(
+            {
+                "step": result["step"],
+                "rows": result["rows"],
+                "baseline_seconds": before["wall_seconds"],
+                "current_seconds": result["wall_seconds"],
+                "wall_ratio": wall_ratio,
+                "peak_rss_delta_change_bytes": result["peak_rss_delta_bytes"]
+                - before["peak_rss_delta_bytes"],
+                "regression": wall_ratio > 1 + tolerance
+                and result["wall_seconds"] - before["wall_seconds"] > min_seconds,
+            }
+        )
+    return rows
+
+
+def _git(*args: str) -> str | None:
+    try:
+        completed = subprocess.run(
+            ["git", *args],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip()
@@ -0,0 +1,138 @@
+"""Synthetic policies shaped like the ``pg15training`` data."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from insurance_prediction.pipelines.data_processing.nodes import _raw_schema
+
+_GROUP2_LEVELS = ["L", "M", "N", "O", "P", "Q", "R", "S", "T", "U"]
+# Number of SubGroup2 levels within each Group2 level, 471 in all
+_SUBGROUP_COUNTS = [48] + [47] * 9
+
+# Levels of the factor columns of ``pg15training``. SubGroup2 subdivides
+# Group2: its levels are a Group2 level followed by a number ("L46", "O38")
+FACTOR_LEVELS: dict[str, list[str]] = {
+    "Gender": ["Female", "Male"],
+    "Type": ["A", "B", "C", "D", "E", "F"],
+    "Category": ["Large", "Medium", "Small"],
+    "Occupation": ["Employed", "Housewife", "Retired", "Self-employed", "Unemployed"],
+    "SubGroup2": sorted(
+        f"{group}{number}"
+        for group, count in zip(_GROUP2_LEVELS, _SUBGROUP_COUNTS)
+        for number in range(1, count + 1)
+    ),
+    "Group2": _GROUP2_LEVELS,
+}
+# Group2 code of each SubGroup2 level
+_SUBGROUP_GROUPS = np.array(
+    [_GROUP2_LEVELS.index(level[0]) for level in FACTOR_LEVELS["SubGroup2"]]
+)
+
+
+def make_policies(n_rows: int, seed: int = 0, first_id: int = 0) -> pd.DataFrame:
+    """Generate policies with the columns, dtypes and cardinalities of
+    ``pg15training``.
+
+    Claim counts follow a Poisson distribution whose rate depends on a few
+    of the features, so models have a signal to fit and trees grow to a
+    realistic size.
+
+    Args:
+        n_rows: Number of policies
+        seed: Random seed
+        first_id: Policy number of the first row
+
+    Returns:
+        Raw policies, as ``load_data`` returns them
+    """
+    rng = np.random.default_rng(seed)
+
+    def factor(column: str) -> pd.Categorical:
+        levels = FACTOR_LEVELS[column]
+        return pd.Categorical.from_codes(
+            rng.integers(0, len(levels), n_rows), categories=levels
+        )
+
+    subgroups = factor("SubGroup2")
+    data = pd.DataFrame(
+        {
+            "PolNum": np.arange(first_id, first_id + n_rows, dtype=np.int32)
+            + 200_114_978,
+            "CalYear": rng.choice(np.array([2009, 2010], dtype=np.int32), n_rows),
+            "Gender": factor("Gender"),
+            "Type": factor("Type"),
+            "Category": factor("Category"),
+            "Occupation": factor("Occupation"),
+            "Age": rng.integers(18, 76, n_rows, dtype=np.int32),
+            "Group1": rng.integers(1, 21, n_rows, dtype=np.int32),
+            "Bonus": rng.integers(-50, 151, n_rows, dtype=np.int32),
+            "Poldur": rng.integers(0, 16, n_rows, dtype=np.int32),
+            "Value": rng.integers(1_000, 50_001, n_rows, dtype=np.int32),
+            "Adind": rng.integers(0, 2, n_rows, dtype=np.int32),
+            "SubGroup2": subgroups,
+            "Group2": pd.Categorical.from_codes(
+                _SUBGROUP_GROUPS[subgroups.codes], categories=FACTOR_LEVELS["Group2"]
+            ),
+            "Density": rng.uniform(14.0, 300.0, n_rows),
+            "Exppdays": rng.integers(1, 366, n_rows, dtype=np.int32),
+        }
+    )
+
+    log_rate = (
+        np.log(0.15)
+        + 0.02 * (40 - data["Age"].to_numpy()) / 10
+        + 0.004 * data["Bonus"].to_numpy()
+        + 0.3 * data["Type"].cat.codes.to_numpy() / 5
+        + 0.4 * data["Group2"].cat.codes.to_numpy() / 9
+        + np.log(data["Exppdays"].to_numpy() / 365)
+    )
+    rate = np.exp(log_rate)
+    data["Numtppd"] = rng.poisson(rate).astype(np.int32)
+    data["Numtpbi"] = rng.poisson(rate / 3).astype(np.int32)
+    data["Indtppd"] = data["Numtppd"] * rng.gamma(2.0, 500.0, n_rows)
+    data["Indtpbi"] = data["Numtpbi"] * rng.gamma(2.0, 1_500.0, n_rows)
+    return data
+
+
+def write_policies(
+    path: str | Path,
+    n_rows: int,
+    seed: int = 0,
+    chunk_rows: int = 1_000_000,
+) -> Path:
+    """Write synthetic policies to a Parquet file as ``download_data`` does.
+
+    The file is generated and written ``chunk_rows`` at a time, so large
+    files never have to fit in memory at once.
+
+    Args:
+        path: Parquet file to write
+        n_rows: Number of policies
+        seed: Random seed; each chunk derives its own seed from it
+        chunk_rows: Number of policies generated at a time
+
+    Returns:
+        Path of the file
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".part")
+    seeds = np.random.SeedSequence(seed).generate_state(-(-n_rows // chunk_rows))
+    with pq.ParquetWriter(tmp_path, _raw_schema(make_policies(1))) as writer:
+        for chunk, chunk_seed in zip(range(0, n_rows, chunk_rows), seeds):
+            data = make_policies(
+                min(chunk_rows, n_rows - chunk), int(chunk_seed), first_id=chunk
+            )
+            writer.write_table(
+                pa.Table.from_pandas(
+                    data, schema=_raw_schema(data), preserve_index=False
+                )
+            )
+    tmp_path.replace(path)
+    return path
@@ -0,0 +1,14 @@
+"""Custom Kedro datasets."""
+
+from .chunked_parquet_dataset import ChunkedParquetDataset
+from .flat_model_dataset import FlatModelDataset
+from .sparse_features_dataset import SparseFeaturesDataset
+from .write_behind_dataset import WriteBehindDataset, flush_writes
+
+__all__ = [
+    "ChunkedParquetDataset",
+    "FlatModelDataset",
+    "SparseFeaturesDataset",
+    "WriteBehindDataset",
+    "flush_writes",
+]
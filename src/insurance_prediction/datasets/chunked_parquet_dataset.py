@@ -0,0 +1,69 @@
+"""Parquet dataset that also saves a frame streamed as chunks."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from kedro.io.core import DatasetError, get_filepath_str
+from kedro_datasets.pandas import ParquetDataset
+
+# ``DataFrame.to_parquet`` arguments that do not apply to ``ParquetWriter``
+_FRAME_ONLY_ARGS = ("engine", "index", "partition_cols", "storage_options")
+
+
+class ChunkedParquetDataset(ParquetDataset):
+    """A ``pandas.ParquetDataset`` accepting an iterator of frames.
+
+    Frames are saved as the parent dataset saves them. An iterator of frames
+    with the same columns and dtypes is written to one file, a row group per
+    frame, so only one frame is held in memory at a time. Their indexes are
+    always stored, and loading the file returns the concatenated frames.
+
+    Example catalog entry:
+
+    .. code-block:: yaml
+
+        X_train:
+          type: insurance_prediction.datasets.ChunkedParquetDataset
+          filepath: data/03_primary/X_train.parquet
+    """
+
+    def save(self, data: pd.DataFrame | Iterable[pd.DataFrame]) -> None:
+        if isinstance(data, pd.DataFrame):
+            super().save(data)
+            return
+        if not isinstance(data, Iterator):
+            raise DatasetError(
+                f"{self.__class__.__name__} saves a DataFrame or an iterator "
+                f"of DataFrames, got {type(data).__name__}"
+            )
+
+        save_path = get_filepath_str(self._get_save_path(), self._protocol)
+        writer_args = {
+            key: value
+            for key, value in self._save_args.items()
+            if key not in _FRAME_ONLY_ARGS
+        }
+        writer = None
+        with self._fs.open(save_path, **self._fs_open_args_save) as fs_file:
+            try:
+                for chunk in data:
+                    table = pa.Table.from_pandas(chunk, preserve_index=True)
+                    if writer is None:
+                        writer = pq.ParquetWriter(fs_file, table.schema, **writer_args)
+                    elif table.schema != writer.schema:
+                        # e.g. an object column holding only missing values
+                        table = table.cast(writer.schema)
+                    writer.write_table(table)
+            finally:
+                if writer is not None:
+                    writer.close()
+        if writer is None:
+            raise DatasetError(
+                f"Nothing to save to {self.__class__.__name__}: no chunk was given"
+            )
+
+        self._invalidate_cache()
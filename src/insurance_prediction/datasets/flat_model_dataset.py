@@ -0,0 +1,49 @@
+"""Dataset storing a ``FlatModel`` as a NumPy ``.npz`` archive."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+from kedro.io import AbstractDataset
+
+from insurance_prediction.flat_model import FlatModel
+
+
+class FlatModelDataset(AbstractDataset[FlatModel, FlatModel]):
+    """Save and load a flattened tree ensemble.
+
+    The node arrays are written to a single ``.npz`` archive without
+    pickling, so loading the model needs NumPy only.
+
+    Example catalog entry:
+
+    .. code-block:: yaml
+
+        flat_model:
+          type: insurance_prediction.datasets.FlatModelDataset
+          filepath: data/04_model/flat_model.npz
+    """
+
+    def __init__(self, filepath: str, metadata: dict[str, Any] | None = None):
+        """Create a new ``FlatModelDataset``.
+
+        Args:
+            filepath: Path of the ``.npz`` archive
+            metadata: Arbitrary metadata, ignored by Kedro
+        """
+        self._filepath = Path(filepath)
+        self.metadata = metadata
+
+    def load(self) -> FlatModel:
+        return FlatModel.load(self._filepath)
+
+    def save(self, data: FlatModel) -> None:
+        self._filepath.parent.mkdir(parents=True, exist_ok=True)
+        data.save(self._filepath)
+
+    def _exists(self) -> bool:
+        return self._filepath.exists()
+
+    def _describe(self) -> dict[str, Any]:
+        return {"filepath": str(self._filepath)}
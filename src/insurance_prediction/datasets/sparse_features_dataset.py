@@ -0,0 +1,73 @@
+"""Dataset storing a ``SparseFeatures`` matrix as a NumPy ``.npz`` archive."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from kedro.io import AbstractDataset
+from scipy import sparse
+
+from insurance_prediction.pipelines.data_processing.sparse import SparseFeatures
+
+
+class SparseFeaturesDataset(AbstractDataset[SparseFeatures, SparseFeatures]):
+    """Save and load a CSR feature matrix with its feature names.
+
+    The CSR buffers and the feature names are written to a single ``.npz``
+    archive, so loading rebuilds the matrix without densifying it.
+
+    Example catalog entry:
+
+    .. code-block:: yaml
+
+        X_train_sparse:
+          type: insurance_prediction.datasets.SparseFeaturesDataset
+          filepath: data/03_primary/X_train.npz
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        compressed: bool = False,
+        metadata: dict[str, Any] | None = None,
+    ):
+        """Create a new ``SparseFeaturesDataset``.
+
+        Args:
+            filepath: Path of the ``.npz`` archive
+            compressed: Whether to compress the archive
+            metadata: Arbitrary metadata, ignored by Kedro
+        """
+        self._filepath = Path(filepath)
+        self._compressed = compressed
+        self.metadata = metadata
+
+    def load(self) -> SparseFeatures:
+        with np.load(self._filepath, allow_pickle=False) as archive:
+            matrix = sparse.csr_matrix(
+                (archive["data"], archive["indices"], archive["indptr"]),
+                shape=tuple(archive["shape"]),
+            )
+            return SparseFeatures(matrix, archive["feature_names"].tolist())
+
+    def save(self, data: SparseFeatures) -> None:
+        self._filepath.parent.mkdir(parents=True, exist_ok=True)
+        savez = np.savez_compressed if self._compressed else np.savez
+        matrix = data.matrix.tocsr()
+        with self._filepath.open("wb") as f:
+            savez(
+                f,
+                data=matrix.data,
+                indices=matrix.indices,
+                indptr=matrix.indptr,
+                shape=np.array(matrix.shape),
+                feature_names=np.array(data.feature_names, dtype=str),
+            )
+
+    def _exists(self) -> bool:
+        return self._filepath.exists()
+
+    def _describe(self) -> dict[str, Any]:
+        return {"filepath": str(self._filepath), "compressed": self._compressed}
@@ -0,0 +1,170 @@
+"""Dataset handing saved data to its consumers in memory while it is written."""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+from kedro.io import AbstractDataset, DatasetError
+
+logger = logging.getLogger(__name__)
+
+# Background writes of every ``WriteBehindDataset``; two threads are enough
+# since Arrow already writes each Parquet file with several threads
+_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="write_behind")
+# Writes not yet waited for, failed ones included so their error is raised
+_PENDING: set[Future] = set()
+_PENDING_LOCK = threading.Lock()
+
+
+def _forget_succeeded(future: Future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        with _PENDING_LOCK:
+            _PENDING.discard(future)
+
+
+def flush_writes() -> None:
+    """Wait for the background writes of every ``WriteBehindDataset``.
+
+    Raises:
+        DatasetError: If a write failed; the other writes are still waited for
+    """
+    with _PENDING_LOCK:
+        pending = list(_PENDING)
+        _PENDING.clear()
+    errors = [error for error in (f.exception() for f in pending) if error]
+    for error in errors[1:]:
+        logger.error("Background write failed: %r", error)
+    if errors:
+        raise DatasetError(f"Background write failed: {errors[0]!r}") from errors[0]
+
+
+class WriteBehindDataset(AbstractDataset):
+    """Keep saved data in memory for the next nodes and persist it asynchronously.
+
+    Saving stores a reference to the data, which later loads return without
+    copying or deserializing it, and submits the save of the wrapped dataset
+    to a background thread, so the write overlaps with the nodes consuming
+    the data. With ``persist`` disabled nothing is written and the dataset
+    behaves like a ``MemoryDataset`` in ``assign`` mode. Nodes must hence not
+    modify their inputs in place.
+
+    Once the runner releases the data, loads wait for the pending write and
+    read the wrapped dataset. ``flush`` waits for the write of one dataset
+    and ``flush_writes`` for all of them, raising any error of the write;
+    the ``WriteBehindHooks`` call it at the end of every run.
+
+    An iterator, such as the chunks of a frame too large for memory, can
+    only be consumed once: it is saved to the wrapped dataset right away
+    and loads read it back from there.
+
+    Example catalog entry:
+
+    .. code-block:: yaml
+
+        preprocessed_data:
+          type: insurance_prediction.datasets.WriteBehindDataset
+          persist: ${runtime_params:persist_intermediates, true}
+          dataset:
+            type: pandas.ParquetDataset
+            filepath: data/02_intermediate/preprocessed_data.parquet
+    """
+
+    # The data only lives in the memory of the process saving it
+    _SINGLE_PROCESS = True
+
+    def __init__(
+        self,
+        dataset: dict[str, Any] | AbstractDataset,
+        persist: bool = True,
+        metadata: dict[str, Any] | None = None,
+    ):
+        """Create a new ``WriteBehindDataset``.
+
+        Args:
+            dataset: Dataset persisting the data, or its catalog configuration
+            persist: Whether saved data is written to the wrapped dataset
+            metadata: Arbitrary metadata, ignored by Kedro
+        """
+        if isinstance(dataset, dict):
+            dataset = AbstractDataset.from_config("_write_behind", dataset)
+        elif not isinstance(dataset, AbstractDataset):
+            raise DatasetError(
+                "'dataset' must be a dataset or the configuration of one, "
+                f"got {type(dataset).__name__}"
+            )
+        self._dataset = dataset
+        self.persist = persist
+        self.metadata = metadata
+        self._data: Any = None
+        self._cached = False
+        self._write: Future | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def dataset(self) -> AbstractDataset:
+        """The wrapped dataset."""
+        return self._dataset
+
+    def load(self) -> Any:
+        with self._lock:
+            if self._cached:
+                return self._data
+        if not self.persist:
+            raise DatasetError("Data for WriteBehindDataset has not been saved yet.")
+        self.flush()
+        return self._dataset.load()
+
+    def save(self, data: Any) -> None:
+        # One write per file at a time, which also raises a failed earlier one
+        self.flush()
+        if isinstance(data, Iterator):
+            if not self.persist:
+                raise DatasetError(
+                    "WriteBehindDataset cannot keep an iterator in memory, "
+                    "enable 'persist' to save it"
+                )
+            self._release()
+            self._dataset.save(data)
+            return
+        with self._lock:
+            self._data, self._cached = data, True
+        if self.persist:
+            write = _EXECUTOR.submit(self._dataset.save, data)
+            with _PENDING_LOCK:
+                _PENDING.add(write)
+            write.add_done_callback(_forget_succeeded)
+            with self._lock:
+                self._write = write
+
+    def flush(self) -> None:
+        """Wait for the pending write of the data, raising its error.
+
+        The write is only forgotten once it succeeded, so concurrent loads
+        all wait for it rather than read a partly written file, and a failed
+        write keeps raising.
+        """
+        with self._lock:
+            write = self._write
+            if write is None:
+                return
+            write.result()
+            self._write = None
+        with _PENDING_LOCK:
+            _PENDING.discard(write)
+
+    def _release(self) -> None:
+        # The pending write keeps its own reference to the data
+        with self._lock:
+            self._data, self._cached = None, False
+
+    def _exists(self) -> bool:
+        if self._cached:
+            return True
+        return self.persist and (self._write is not None or self._dataset.exists())
+
+    def _describe(self) -> dict[str, Any]:
+        return {"dataset": self._dataset._describe(), "persist": self.persist}
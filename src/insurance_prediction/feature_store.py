@@ -0,0 +1,211 @@
+"""Feature matrices shared between processes through memory-mapped files."""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+import weakref
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from typing_extensions import Self
+
+_MATRIX_FILE = "features.npy"
+_METADATA_FILE = "metadata.json"
+
+# Space left free in the RAM-backed directory for its other users
+_SHARED_MEMORY_HEADROOM = 16 * 2**20
+
+
+def shared_memory_directory(required_bytes: int = 0) -> str | None:
+    """Return a RAM-backed directory for temporary stores, if there is one.
+
+    ``/dev/shm`` is often small (64 MB in Docker by default), and a process
+    writing a mapped file that the tmpfs cannot back is killed with SIGBUS.
+    The directory is therefore only returned while it has ``required_bytes``
+    free on top of some headroom.
+
+    Args:
+        required_bytes: Size of the files to write
+
+    Returns:
+        The directory, or None when there is none or it lacks space
+    """
+    directory = "/dev/shm"
+    if (
+        os.path.isdir(directory)
+        and os.access(directory, os.W_OK)
+        and shutil.disk_usage(directory).free
+        >= required_bytes + _SHARED_MEMORY_HEADROOM
+    ):
+        return directory
+    return None
+
+
+@dataclass
+class DenseFeatures:
+    """A dense feature matrix with the column metadata LightGBM needs."""
+
+    matrix: np.ndarray
+    feature_names: list[str]
+    categorical_feature: list[str]
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def shape(self):
+        """Shape of the feature matrix."""
+        return self.matrix.shape
+
+
+class FeatureStore:
+    """A feature frame stored once as a memory-mapped NumPy matrix.
+
+    ``create`` writes the features as a single ``.npy`` matrix, encoded as
+    LightGBM encodes a DataFrame (categories as float codes, missing ones
+    as NaN, in the smallest float type holding every column), next to a JSON
+    file with the column names and categories. Every process attaching to
+    the store maps the same file, so the operating system keeps one copy in
+    its page cache however many workers read it. In a RAM-backed directory
+    such as ``/dev/shm`` nothing touches the disk.
+
+    A store pickles as its directory and attaches again when unpickled, so
+    sending it to worker processes costs nothing. The store returned by
+    ``create`` owns its directory and deletes it when closed, or when it is
+    garbage collected; attached stores never delete it.
+
+    Args:
+        directory: Directory of a store written by ``create``
+    """
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+        metadata = json.loads((self.directory / _METADATA_FILE).read_text())
+        self.feature_names: list[str] = metadata["feature_names"]
+        self.categorical_feature: list[str] = metadata["categorical_feature"]
+        self.categories: dict[str, list[Any]] = metadata["categories"]
+        self.matrix: np.ndarray = np.load(
+            self.directory / _MATRIX_FILE, mmap_mode="r", allow_pickle=False
+        )
+        self._finalizer: weakref.finalize | None = None
+
+    @classmethod
+    def create(
+        cls, X: pd.DataFrame, directory: str | Path | None = None
+    ) -> FeatureStore:
+        """Write a feature frame to a new store.
+
+        Columns are written one at a time into the mapped file, so this
+        needs little memory beyond the frame itself.
+
+        Args:
+            X: Features, categorical columns with ``category`` dtype
+            directory: Directory of the store, a new temporary directory in
+                ``shared_memory_directory()`` if not set, or in the default
+                temporary directory when the matrix does not fit there
+
+        Returns:
+            The store, owning its directory
+        """
+        categorical = {
+            column: dtype
+            for column, dtype in X.dtypes.items()
+            if isinstance(dtype, pd.CategoricalDtype)
+        }
+        dtype = np.result_type(
+            *(
+                np.float32 if column in categorical else dtype.type
+                for column, dtype in X.dtypes.items()
+            ),
+            np.float32,
+        )
+
+        if directory is None:
+            required_bytes = X.shape[0] * X.shape[1] * dtype.itemsize
+            directory = tempfile.mkdtemp(
+                prefix="feature_store_", dir=shared_memory_directory(required_bytes)
+            )
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        matrix = np.lib.format.open_memmap(
+            directory / _MATRIX_FILE, mode="w+", dtype=dtype, shape=X.shape
+        )
+        for position, column in enumerate(X.columns):
+            values = X[column]
+            if column in categorical:
+                codes = values.cat.codes.to_numpy()
+                matrix[:, position] = np.where(codes < 0, np.nan, codes)
+            else:
+                matrix[:, position] = values.to_numpy(dtype=dtype, na_value=np.nan)
+        matrix.flush()
+        del matrix
+
+        (directory / _METADATA_FILE).write_text(
+            json.dumps(
+                {
+                    "feature_names": [str(column) for column in X.columns],
+                    "categorical_feature": [str(column) for column in categorical],
+                    "categories": {
+                        str(column): dtype.categories.tolist()
+                        for column, dtype in categorical.items()
+                    },
+                }
+            )
+        )
+        store = cls(directory)
+        store._finalizer = weakref.finalize(
+            store, shutil.rmtree, str(directory), ignore_errors=True
+        )
+        return store
+
+    @classmethod
+    def attach(cls, directory: str | Path) -> FeatureStore:
+        """Map the store in ``directory`` without taking ownership of it."""
+        return cls(directory)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def shape(self):
+        """Shape of the feature matrix."""
+        return self.matrix.shape
+
+    @property
+    def columns(self) -> pd.Index:
+        """Feature names as an index, mirroring ``DataFrame.columns``."""
+        return pd.Index(self.feature_names)
+
+    def take(self, rows: np.ndarray) -> DenseFeatures:
+        """Return an in-memory copy of the features of the given row positions."""
+        return DenseFeatures(
+            np.take(self.matrix, rows, axis=0),
+            self.feature_names,
+            self.categorical_feature,
+        )
+
+    def close(self) -> None:
+        """Unmap the matrix and delete the store if this object owns it."""
+        self.matrix = None
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"directory": str(self.directory)}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__init__(state["directory"])
@@ -0,0 +1,232 @@
+"""Dependency-light tree ensemble scorer.
+
+This module only imports NumPy, so scoring workers can load an exported
+model and predict without importing LightGBM or scikit-learn.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+# Missing value handling of a split, as in LightGBM's ``missing_type``
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+_MISSING_TYPES = {"None": MISSING_NONE, "Zero": MISSING_ZERO, "NaN": MISSING_NAN}
+
+# Values LightGBM treats as zero for ``missing_type == "Zero"``
+_ZERO_THRESHOLD = 1e-35
+
+_ARRAYS = (
+    "roots",
+    "feature",
+    "threshold",
+    "left",
+    "right",
+    "default_left",
+    "missing_type",
+    "categorical",
+    "category_bitsets",
+    "leaf_value",
+)
+
+
+class FlatModel:
+    """A binary LightGBM ensemble flattened into NumPy arrays.
+
+    The nodes of all trees are stored in flat arrays indexed by a global node
+    id. A child reference ``c >= 0`` is an internal node and ``c < 0`` is
+    the leaf ``~c`` of ``leaf_value``. Each categorical split points to a
+    row of ``category_bitsets`` marking the categories sent left.
+
+    ``predict`` walks every tree of a block of rows at once, one tree level
+    per step, so the number of Python iterations is the depth of the
+    deepest tree rather than the number of rows or trees. Decisions follow
+    LightGBM: missing values go to the default child of ``NaN``/``Zero``
+    splits and count as zero otherwise, and categorical splits send
+    missing, negative and unseen categories right.
+
+    Args:
+        feature_names: Features in the order of the scored matrix columns
+        sigmoid: Slope of the sigmoid turning raw scores into probabilities
+        **arrays: The flat tree arrays
+    """
+
+    def __init__(self, feature_names: list[str], sigmoid: float, **arrays: np.ndarray):
+        self.feature_names = list(feature_names)
+        self.sigmoid = float(sigmoid)
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def from_dump(cls, dump: dict[str, Any]) -> FlatModel:
+        """Flatten the output of ``lightgbm.Booster.dump_model``.
+
+        Args:
+            dump: Model dump of a binary classifier
+
+        Returns:
+            The flattened model
+        """
+        objective = dump["objective"].split()
+        if dump["num_tree_per_iteration"] != 1 or objective[0] != "binary":
+            raise ValueError(f"Only binary models can be flattened, got {objective}")
+        sigmoid = float(
+            next(
+                (
+                    part.split(":")[1]
+                    for part in objective
+                    if part.startswith("sigmoid")
+                ),
+                1.0,
+            )
+        )
+
+        nodes: dict[str, list] = {
+            name: []
+            for name in (
+                "feature",
+                "threshold",
+                "left",
+                "right",
+                "default_left",
+                "missing_type",
+                "categorical",
+            )
+        }
+        category_sets: list[list[int]] = []
+        leaf_value: list[float] = []
+
+        def add(tree: dict[str, Any]) -> int:
+            if "leaf_value" in tree:
+                leaf_value.append(tree["leaf_value"])
+                return ~(len(leaf_value) - 1)
+            node = len(nodes["feature"])
+            for values in nodes.values():
+                values.append(None)
+            nodes["feature"][node] = tree["split_feature"]
+            nodes["default_left"][node] = tree["default_left"]
+            nodes["missing_type"][node] = _MISSING_TYPES[tree["missing_type"]]
+            if tree["decision_type"] == "==":
+                nodes["threshold"][node] = np.nan
+                nodes["categorical"][node] = len(category_sets)
+                category_sets.append(
+                    [int(category) for category in str(tree["threshold"]).split("||")]
+                )
+            else:
+                nodes["threshold"][node] = tree["threshold"]
+                nodes["categorical"][node] = -1
+            nodes["left"][node] = add(tree["left_child"])
+            nodes["right"][node] = add(tree["right_child"])
+            return node
+
+        roots = [add(tree["tree_structure"]) for tree in dump["tree_info"]]
+
+        width = max((max(categories) + 1 for categories in category_sets), default=0)
+        category_bitsets = np.zeros((len(category_sets), width), dtype=bool)
+        for row, categories in enumerate(category_sets):
+            category_bitsets[row, categories] = True
+
+        return cls(
+            dump["feature_names"],
+            sigmoid,
+            roots=np.array(roots, dtype=np.int32),
+            feature=np.array(nodes["feature"], dtype=np.int32),
+            threshold=np.array(nodes["threshold"], dtype=np.float64),
+            left=np.array(nodes["left"], dtype=np.int32),
+            right=np.array(nodes["right"], dtype=np.int32),
+            default_left=np.array(nodes["default_left"], dtype=bool),
+            missing_type=np.array(nodes["missing_type"], dtype=np.int8),
+            categorical=np.array(nodes["categorical"], dtype=np.int32),
+            category_bitsets=category_bitsets,
+            leaf_value=np.array(leaf_value, dtype=np.float64),
+        )
+
+    def predict_raw(self, X: np.ndarray, block_size: int = 10_000) -> np.ndarray:
+        """Return the raw score (sum of leaf values) of each row.
+
+        Args:
+            X: Feature matrix with columns in ``feature_names`` order
+            block_size: Rows traversed together, bounding the memory used
+
+        Returns:
+            Raw score of each row
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != len(self.feature_names):
+            raise ValueError(
+                f"Expected {len(self.feature_names)} features, got shape {X.shape}"
+            )
+        return np.concatenate(
+            [
+                self._predict_block(X[start : start + block_size])
+                for start in range(0, max(len(X), 1), block_size)
+            ]
+        )[: len(X)]
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Return the probability of the positive class of each row."""
+        return 1.0 / (1.0 + np.exp(-self.sigmoid * self.predict_raw(X)))
+
+    def _predict_block(self, X: np.ndarray) -> np.ndarray:
+        codes = np.tile(self.roots, (len(X), 1))
+        rows, trees = np.nonzero(codes >= 0)
+        while len(rows):
+            nodes = codes[rows, trees]
+            children = np.where(
+                self._goes_left(X[rows, self.feature[nodes]], nodes),
+                self.left[nodes],
+                self.right[nodes],
+            )
+            codes[rows, trees] = children
+            internal = children >= 0
+            rows, trees = rows[internal], trees[internal]
+        return self.leaf_value[~codes].sum(axis=1)
+
+    def _goes_left(self, values: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+        missing = np.isnan(values)
+        missing_type = self.missing_type[nodes]
+        numeric = np.where(missing & (missing_type != MISSING_NAN), 0.0, values)
+        default = (
+            (missing_type == MISSING_ZERO) & (np.abs(numeric) <= _ZERO_THRESHOLD)
+        ) | ((missing_type == MISSING_NAN) & missing)
+        with np.errstate(invalid="ignore"):
+            left = np.where(
+                default, self.default_left[nodes], numeric <= self.threshold[nodes]
+            )
+
+        categorical = self.categorical[nodes]
+        is_categorical = categorical >= 0
+        if is_categorical.any():
+            category = values[is_categorical]
+            known = (
+                ~np.isnan(category)
+                & (category >= 0)
+                & (category < self.category_bitsets.shape[1])
+            )
+            index = np.where(known, category, 0).astype(np.intp)
+            left[is_categorical] = (
+                known & self.category_bitsets[categorical[is_categorical], index]
+            )
+        return left
+
+    def save(self, path: str | Path) -> None:
+        """Write the model to a NumPy ``.npz`` archive."""
+        with Path(path).open("wb") as f:
+            np.savez(
+                f,
+                feature_names=np.array(self.feature_names, dtype=str),
+                sigmoid=np.array(self.sigmoid),
+                **{name: getattr(self, name) for name in _ARRAYS},
+            )
+
+    @classmethod
+    def load(cls, path: str | Path) -> FlatModel:
+        """Read a model written by ``save``."""
+        with np.load(path, allow_pickle=False) as archive:
+            return cls(
+                archive["feature_names"].tolist(),
+                float(archive["sigmoid"]),
+                **{name: archive[name] for name in _ARRAYS},
+            )
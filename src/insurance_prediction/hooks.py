@@ -0,0 +1,360 @@
+"""Kedro hooks instrumenting pipeline runs."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from kedro.framework.hooks import hook_impl
+
+from insurance_prediction.datasets.write_behind_dataset import flush_writes
+from insurance_prediction.profiling import PeakMemorySampler, max_rss
+
+logger = logging.getLogger(__name__)
+
+
+def data_size(data: Any) -> tuple[int | None, int | None]:
+    """Return the number of rows and the bytes held by a node input or output.
+
+    Frames and series report their shallow memory usage, which is exact for
+    numeric and categorical columns and leaves out the Python objects of
+    object columns; arrays, sparse matrices and ``SparseFeatures`` report the
+    size of their buffers. Other values, such as parameters and paths, have
+    neither.
+
+    Args:
+        data: Value passed between nodes
+
+    Returns:
+        Number of rows and size in bytes, ``None`` where unknown
+    """
+    matrix = getattr(data, "matrix", data)
+    if hasattr(data, "memory_usage") and hasattr(data, "shape"):
+        usage = data.memory_usage(index=True, deep=False)
+        return data.shape[0], int(getattr(usage, "sum", lambda: usage)())
+    if hasattr(matrix, "nnz") and hasattr(matrix, "data"):
+        buffers = [getattr(matrix, name, None) for name in ("indices", "indptr")]
+        return matrix.shape[0], int(
+            matrix.data.nbytes + sum(b.nbytes for b in buffers if b is not None)
+        )
+    if hasattr(data, "nbytes") and hasattr(data, "shape"):
+        return (data.shape[0] if data.shape else None), int(data.nbytes)
+    return None, None
+
+
+class InstrumentationHooks:
+    """Record the time, memory and data volume of every node of a run.
+
+    For each node the report holds its wall and CPU time, the peak increase
+    of the process's resident memory while it ran, the rows and bytes of its
+    inputs and outputs (see ``data_size``) and the time spent loading and
+    saving each of its datasets through the catalog. The report is written
+    as JSON when the run completes or fails, and optionally as a Chrome trace
+    that ``chrome://tracing`` or https://ui.perfetto.dev show as a timeline
+    of node, load and save spans per thread.
+
+    CPU time is that of the whole process, so it also counts nodes running
+    concurrently under the ``ThreadRunner``. Under the ``ParallelRunner``
+    nodes run in worker processes and only the dataset loads and saves of
+    the main process are recorded.
+
+    Args:
+        report_directory: Directory receiving ``run_<run id>.json``, no
+            report is written if not set
+        chrome_trace: Whether to also write ``run_<run id>.trace.json``
+        sample_interval: Seconds between samples of the resident memory
+    """
+
+    def __init__(
+        self,
+        report_directory: str | Path | None = None,
+        chrome_trace: bool = False,
+        sample_interval: float = 0.01,
+    ):
+        self.report_directory = Path(report_directory) if report_directory else None
+        self.chrome_trace = chrome_trace
+        self.sample_interval = sample_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.nodes: dict[str, dict[str, Any]] = {}
+        self.datasets: list[dict[str, Any]] = []
+        self._running: dict[str, tuple[float, float, PeakMemorySampler]] = {}
+        self._io_started: dict[tuple[str, str, str], float] = {}
+        self._run: dict[str, Any] = {}
+
+    def _now(self) -> float:
+        return time.perf_counter() - self._run.get("origin", 0.0)
+
+    @hook_impl
+    def before_pipeline_run(self, run_params: dict[str, Any]) -> None:
+        """Start the report of a run."""
+        self._reset()
+        self._run = {
+            "run_id": run_params.get("run_id") or run_params.get("session_id"),
+            "pipeline": run_params.get("pipeline_names")
+            or run_params.get("pipeline_name"),
+            "runner": run_params.get("runner"),
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "origin": time.perf_counter(),
+            "cpu_start": time.process_time(),
+        }
+
+    @hook_impl
+    def before_dataset_loaded(self, dataset_name: str, node) -> None:
+        self._io_started[("load", dataset_name, node.name)] = self._now()
+
+    @hook_impl
+    def after_dataset_loaded(self, dataset_name: str, node) -> None:
+        self._record_io("load", dataset_name, node.name)
+
+    @hook_impl
+    def before_dataset_saved(self, dataset_name: str, node) -> None:
+        self._io_started[("save", dataset_name, node.name)] = self._now()
+
+    @hook_impl
+    def after_dataset_saved(self, dataset_name: str, node) -> None:
+        self._record_io("save", dataset_name, node.name)
+
+    def _record_io(self, operation: str, dataset_name: str, node_name: str) -> None:
+        start = self._io_started.pop((operation, dataset_name, node_name), None)
+        if start is None:
+            return
+        with self._lock:
+            self.datasets.append(
+                {
+                    "dataset": dataset_name,
+                    "node": node_name,
+                    "operation": operation,
+                    "start": start,
+                    "seconds": self._now() - start,
+                    "thread": threading.get_ident(),
+                }
+            )
+
+    @hook_impl
+    def before_node_run(self, node) -> None:
+        """Start measuring a node."""
+        logger.info("Running node: %s", node.name)
+        sampler = PeakMemorySampler(self.sample_interval).start()
+        self._running[node.name] = (self._now(), time.process_time(), sampler)
+
+    @hook_impl
+    def after_node_run(
+        self, node, inputs: dict[str, Any], outputs: dict[str, Any]
+    ) -> None:
+        """Record the measurements of a node."""
+        metrics = self._finish_node(node.name, inputs, outputs)
+        logger.info(
+            "Completed node: %s in %.2fs (%.2fs CPU, %+.1f MiB peak RSS)",
+            node.name,
+            metrics["wall_seconds"],
+            metrics["cpu_seconds"],
+            metrics["peak_rss_delta_bytes"] / 2**20,
+        )
+
+    @hook_impl
+    def on_node_error(self, error: Exception, node, inputs: dict[str, Any]) -> None:
+        """Record the measurements of a failed node."""
+        if node.name in self._running:
+            self._finish_node(node.name, inputs, {}, error=repr(error))
+
+    def _finish_node(
+        self,
+        node_name: str,
+        inputs: dict[str, Any],
+        outputs: dict[str, Any],
+        error: str | None = None,
+    ) -> dict[str, Any]:
+        start, cpu_start, sampler = self._running.pop(node_name)
+        metrics = {
+            "node": node_name,
+            "start": start,
+            "wall_seconds": self._now() - start,
+            "cpu_seconds": time.process_time() - cpu_start,
+            "peak_rss_delta_bytes": sampler.stop(),
+            "thread": threading.get_ident(),
+            "inputs": _sizes(inputs),
+            "outputs": _sizes(outputs),
+        }
+        for direction in ("inputs", "outputs"):
+            sizes = metrics[direction].values()
+            metrics[f"{direction[:-1]}_rows"] = _total(sizes, "rows")
+            metrics[f"{direction[:-1]}_bytes"] = _total(sizes, "bytes")
+        if error is not None:
+            metrics["error"] = error
+        with self._lock:
+            self.nodes[node_name] = metrics
+        return metrics
+
+    @hook_impl
+    def after_pipeline_run(self) -> None:
+        """Write the report of a completed run."""
+        self.write_report("completed")
+
+    @hook_impl
+    def on_pipeline_error(self, error: Exception) -> None:
+        """Write the report of a failed run."""
+        self.write_report("failed", repr(error))
+
+    def report(self, status: str, error: str | None = None) -> dict[str, Any]:
+        """Build the report of the run so far.
+
+        Args:
+            status: ``"completed"`` or ``"failed"``
+            error: Error which failed the run
+
+        Returns:
+            The run's totals, the metrics of each node, sorted by start time,
+            with the load and save time of its datasets, and every dataset
+            load and save
+        """
+        with self._lock:
+            nodes = sorted(self.nodes.values(), key=lambda metrics: metrics["start"])
+            datasets = list(self.datasets)
+        io_seconds: dict[tuple[str, str], float] = {}
+        for event in datasets:
+            key = (event["node"], event["operation"])
+            io_seconds[key] = io_seconds.get(key, 0.0) + event["seconds"]
+        for metrics in nodes:
+            metrics["load_seconds"] = io_seconds.get((metrics["node"], "load"), 0.0)
+            metrics["save_seconds"] = io_seconds.get((metrics["node"], "save"), 0.0)
+
+        run = {
+            key: value
+            for key, value in self._run.items()
+            if key not in ("origin", "cpu_start")
+        }
+        return {
+            **run,
+            "status": status,
+            "error": error,
+            "wall_seconds": self._now(),
+            "cpu_seconds": time.process_time() - self._run.get("cpu_start", 0.0),
+            "peak_rss_bytes": max_rss(),
+            "nodes": nodes,
+            "datasets": datasets,
+        }
+
+    def write_report(self, status: str, error: str | None = None) -> Path | None:
+        """Write the report, and the Chrome trace if enabled, to disk.
+
+        Args:
+            status: ``"completed"`` or ``"failed"``
+            error: Error which failed the run
+
+        Returns:
+            Path of the report, ``None`` without a report directory
+        """
+        report = self.report(status, error)
+        slowest = sorted(report["nodes"], key=lambda m: -m["wall_seconds"])[:3]
+        logger.info(
+            "Run %s in %.1fs; slowest nodes: %s",
+            status,
+            report["wall_seconds"],
+            ", ".join(f"{m['node']} {m['wall_seconds']:.2f}s" for m in slowest),
+        )
+        if self.report_directory is None:
+            return None
+
+        self.report_directory.mkdir(parents=True, exist_ok=True)
+        name = str(report["run_id"] or f"{time.time():.0f}").replace(":", "-")
+        path = self.report_directory / f"run_{name}.json"
+        path.write_text(json.dumps(report, indent=2, default=str))
+        if self.chrome_trace:
+            trace_path = self.report_directory / f"run_{name}.trace.json"
+            trace_path.write_text(json.dumps(chrome_trace(report)))
+        logger.info("Run report written to '%s'", path)
+        return path
+
+
+class WriteBehindHooks:
+    """Wait for the background writes of ``WriteBehindDataset``s after a run.
+
+    A run only completes once every dataset it saved is on disk, and fails
+    if one of the writes did.
+    """
+
+    @hook_impl
+    def after_pipeline_run(self) -> None:
+        """Wait for the writes of a completed run."""
+        flush_writes()
+
+    @hook_impl
+    def on_pipeline_error(self) -> None:
+        """Wait for the writes of a failed run, logging their errors."""
+        try:
+            flush_writes()
+        except Exception:
+            # Only logged: the run already failed with its own error
+            logger.exception("Writing the datasets of the failed run failed")
+
+
+def chrome_trace(report: dict[str, Any]) -> dict[str, Any]:
+    """Convert a run report to the Chrome trace event format.
+
+    Args:
+        report: Output of ``InstrumentationHooks.report``
+
+    Returns:
+        Trace with one complete event per node run and dataset load or save
+    """
+    pid = os.getpid()
+    events = [
+        {
+            "name": metrics["node"],
+            "cat": "node",
+            "ph": "X",
+            "ts": metrics["start"] * 1e6,
+            "dur": metrics["wall_seconds"] * 1e6,
+            "pid": pid,
+            "tid": metrics["thread"],
+            "args": {
+                key: metrics[key]
+                for key in (
+                    "cpu_seconds",
+                    "peak_rss_delta_bytes",
+                    "input_rows",
+                    "input_bytes",
+                    "output_rows",
+                    "output_bytes",
+                )
+            },
+        }
+        for metrics in report["nodes"]
+    ]
+    events.extend(
+        {
+            "name": f"{event['operation']} {event['dataset']}",
+            "cat": event["operation"],
+            "ph": "X",
+            "ts": event["start"] * 1e6,
+            "dur": event["seconds"] * 1e6,
+            "pid": pid,
+            "tid": event["thread"],
+            "args": {"node": event["node"]},
+        }
+        for event in report["datasets"]
+    )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _sizes(data: dict[str, Any]) -> dict[str, dict[str, int | None]]:
+    sizes = {}
+    for name, value in data.items():
+        rows, n_bytes = data_size(value)
+        if rows is not None or n_bytes is not None:
+            sizes[name] = {"rows": rows, "bytes": n_bytes}
+    return sizes
+
+
+def _total(sizes, key: str) -> int | None:
+    values = [size[key] for size in sizes if size[key] is not None]
+    return sum(values) if values else None
@@ -1,10 +1,11 @@
 """Pipeline construction."""
 
-from kedro.pipeline import Pipeline
+from kedro.pipeline import Pipeline, pipeline
 
 from insurance_prediction.pipelines import data_processing as dp
 from insurance_prediction.pipelines import model_evaluation as me
 from insurance_prediction.pipelines import model_training as mt
+from insurance_prediction.pipelines import scoring as sc
 
 
 def create_pipelines() -> dict[str, Pipeline]:
@@ -24,4 +25,16 @@ def create_pipelines() -> dict[str, Pipeline]:
         "__default__": data_processing_pipeline
         + model_training_pipeline
         + model_evaluation_pipeline,
+        "sparse": dp.create_pipeline(sparse=True)
+        + pipeline(
+            model_training_pipeline + model_evaluation_pipeline,
+            inputs={"X_train": "X_train_sparse", "X_test": "X_test_sparse"},
+        ),
+        "streaming": dp.create_pipeline(streaming=True)
+        + model_training_pipeline
+        + model_evaluation_pipeline,
+        "scoring": sc.create_pipeline(),
+        "scoring_flat": pipeline(
+            sc.create_pipeline(), inputs={"trained_model": "flat_model"}
+        ),
     }
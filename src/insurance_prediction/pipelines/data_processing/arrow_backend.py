@@ -0,0 +1,335 @@
+"""PyArrow implementation of the data loading and preprocessing nodes.
+
+With ``backend: arrow`` the raw data stays a ``pyarrow.Table`` until it is
+preprocessed. The numeric columns and the target are computed by lazy Acero
+query plans, which Arrow executes on all cores, a batch of rows per thread,
+and the categorical columns are encoded in a thread pool, a column per
+thread. Only the result is converted to the pandas frame the rest of the
+pipeline receives: the same columns, dtypes and values ``preprocess_data``
+computes with pandas.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+from pyarrow import acero
+
+# Smallest batch of rows a thread of the query plans works on
+_MIN_BATCH_ROWS = 65_536
+_SIGNED_INTEGERS = (np.int8, np.int16, np.int32, np.int64)
+
+
+def read_table(data_path: str, memory_map: bool = True) -> pa.Table:
+    """Read the raw data as an Arrow table with multi-threaded decoding.
+
+    Args:
+        data_path: Path to the Parquet (or CSV) file
+        memory_map: Whether to memory-map the Parquet file
+
+    Returns:
+        Loaded data as a ``pyarrow.Table``
+    """
+    if Path(data_path).suffix == ".csv":
+        # Like ``pd.read_csv``, read missing strings as nulls rather than
+        # empty strings, and columns with no values as floats
+        table = pv.read_csv(
+            data_path, convert_options=pv.ConvertOptions(strings_can_be_null=True)
+        )
+        fields = [
+            (
+                pa.field(field.name, pa.float64())
+                if pa.types.is_null(field.type)
+                else field
+            )
+            for field in table.schema
+        ]
+        return table.cast(pa.schema(fields))
+    return pq.read_table(data_path, memory_map=memory_map)
+
+
+def loaded_dtypes(table: pa.Table) -> dict[str, Any]:
+    """Return the dtypes ``load_data`` gives the columns of the table.
+
+    Integer and boolean columns holding missing values become ``float64``
+    and ``object`` columns, unless the pandas metadata of the table maps
+    them to extension dtypes such as ``Int64``.
+
+    Args:
+        table: Raw data
+
+    Returns:
+        Mapping from column name to pandas dtype
+    """
+    dtypes = table.slice(0, 0).to_pandas().dtypes.to_dict()
+    for name, dtype in dtypes.items():
+        if isinstance(dtype, np.dtype) and table.column(name).null_count:
+            if dtype.kind in "iu":
+                dtypes[name] = np.dtype("float64")
+            elif dtype.kind == "b":
+                dtypes[name] = np.dtype(object)
+    return dtypes
+
+
+def fit_category_mappings(
+    table: pa.Table, categorical_columns: list[str]
+) -> dict[str, list[Any]]:
+    """Learn the category levels of each categorical column of a table.
+
+    The levels are those the pandas ``fit_category_mappings`` learns from
+    the loaded frame: the unified dictionary of dictionary-encoded columns,
+    and the sorted distinct values of the others.
+
+    Args:
+        table: Raw data
+        categorical_columns: List of categorical columns
+
+    Returns:
+        Mapping from column name to its ordered list of categories
+    """
+    mappings = {}
+    for column in categorical_columns:
+        values = table.column(column)
+        if pa.types.is_dictionary(values.type):
+            chunks = values.unify_dictionaries().chunks
+            levels = (
+                chunks[0].dictionary if chunks else pa.array([], values.type.value_type)
+            ).to_pandas()
+            mappings[column] = pd.Index(levels).tolist()
+        else:
+            levels = pd.Index(pc.unique(values).to_pandas()).dropna()
+            mappings[column] = levels.sort_values().tolist()
+    return mappings
+
+
+def _rechunk(table: pa.Table) -> pa.Table:
+    """Slice the table into about one batch per core, without copying."""
+    batch_rows = max(_MIN_BATCH_ROWS, -(-table.num_rows // (os.cpu_count() or 1)))
+    return pa.Table.from_batches(
+        table.to_batches(max_chunksize=batch_rows), schema=table.schema
+    )
+
+
+def _run(table: pa.Table, *nodes: acero.Declaration) -> pa.Table:
+    """Execute a query plan reading ``table`` on the CPU thread pool."""
+    source = acero.Declaration("table_source", acero.TableSourceNodeOptions(table))
+    return acero.Declaration.from_sequence([source, *nodes]).to_table(use_threads=True)
+
+
+def _project(expressions: dict[str, pc.Expression]) -> acero.Declaration:
+    return acero.Declaration(
+        "project",
+        acero.ProjectNodeOptions(list(expressions.values()), list(expressions)),
+    )
+
+
+def _is_integer(dtype: Any) -> bool:
+    return pd.api.types.is_integer_dtype(dtype) and not pd.api.types.is_bool_dtype(
+        dtype
+    )
+
+
+def _float32_error(column: str) -> pc.Expression:
+    """Largest change of the values of a column when cast to float32."""
+    field = pc.field(column).cast(pa.float64())
+    return pc.abs(
+        pc.subtract(field.cast(pa.float32(), safe=False).cast(pa.float64()), field)
+    )
+
+
+def _downcast_dtypes(
+    table: pa.Table, dtypes: dict[str, Any], numeric_columns: list[str]
+) -> dict[str, Any]:
+    """Find the dtype ``_compact_numeric`` downcasts each numeric column to.
+
+    The value ranges and float32 rounding errors of all columns are
+    aggregated by a single query plan.
+    """
+    integers = [c for c in numeric_columns if _is_integer(dtypes[c])]
+    floats = [c for c in numeric_columns if pd.api.types.is_float_dtype(dtypes[c])]
+    if not integers and not floats:
+        return {}
+    statistics = _run(
+        table,
+        _project(
+            {
+                **{column: pc.field(column) for column in integers},
+                **{column: _float32_error(column) for column in floats},
+            }
+        ),
+        acero.Declaration(
+            "aggregate",
+            acero.AggregateNodeOptions(
+                [(column, "min_max", None, column) for column in integers]
+                + [(column, "max", None, column) for column in floats]
+            ),
+        ),
+    ).to_pylist()[0]
+
+    downcasts = {}
+    for column in integers:
+        dtype = dtypes[column]
+        itemsize = getattr(dtype, "numpy_dtype", dtype).itemsize
+        low, high = statistics[column]["min"], statistics[column]["max"]
+        for candidate in _SIGNED_INTEGERS:
+            info = np.iinfo(candidate)
+            if np.dtype(candidate).itemsize > itemsize:
+                break
+            if low is None or (info.min <= low and high <= info.max):
+                downcasts[column] = candidate
+                break
+    for column in floats:
+        dtype = dtypes[column]
+        itemsize = getattr(dtype, "numpy_dtype", dtype).itemsize
+        error = statistics[column]
+        # NaN errors come from missing or infinite values, which both survive
+        if itemsize > 4 and (error is None or not error > 0):
+            downcasts[column] = np.float32
+    return {
+        column: (
+            np.dtype(numpy_type)
+            if isinstance(dtypes[column], np.dtype)
+            else pd.api.types.pandas_dtype(
+                np.dtype(numpy_type)
+                .name.replace("int", "Int")
+                .replace("float", "Float")
+            )
+        )
+        for column, numpy_type in downcasts.items()
+    }
+
+
+def _category_codes(values: pa.ChunkedArray, categories: list[Any]) -> np.ndarray:
+    """Position of the value of each row among the categories, -1 if absent.
+
+    Dictionary-encoded columns are looked up once per dictionary entry and
+    their indices remapped, rather than decoded.
+    """
+    value_type = values.type
+    if pa.types.is_dictionary(value_type):
+        value_type = value_type.value_type
+    value_set = pa.array(pd.Index(categories).tolist(), value_type)
+
+    chunks = []
+    for chunk in values.chunks:
+        if isinstance(chunk, pa.DictionaryArray):
+            lookup = pc.index_in(chunk.dictionary, value_set=value_set)
+            chunks.append(pc.take(lookup, chunk.indices))
+        else:
+            chunks.append(pc.index_in(chunk, value_set=value_set))
+    codes = pa.chunked_array(chunks, pa.int32())
+    return pc.fill_null(codes, -1).to_numpy()
+
+
+def _dummies(
+    pool: ThreadPoolExecutor,
+    codes: dict[str, np.ndarray],
+    category_mappings: dict[str, list[Any]],
+    index: pd.Index,
+) -> pd.DataFrame:
+    """One-hot encode category codes into a single ``uint8`` block.
+
+    The columns and names are those of ``pd.get_dummies`` on the
+    categorical columns; each column is scattered by its own thread.
+    """
+    names, offsets = [], {}
+    for column in codes:
+        offsets[column] = len(names)
+        names.extend(
+            f"{column}_{level}" for level in pd.Index(category_mappings[column])
+        )
+    # Transposed, so that each dummy column is contiguous
+    block = np.zeros((len(names), len(index)), dtype=np.uint8)
+    rows = np.arange(len(index))
+
+    def scatter(column: str) -> None:
+        present = codes[column] >= 0
+        block[offsets[column] + codes[column][present], rows[present]] = 1
+
+    list(pool.map(scatter, codes))
+    return pd.DataFrame(block.T, index=index, columns=names, copy=False)
+
+
+def preprocess_table(
+    table: pa.Table,
+    numeric_columns: list[str],
+    target_column: str,
+    categorical_columns: list[str],
+    category_mappings: dict[str, list[Any]],
+    encoding: str,
+) -> pd.DataFrame:
+    """Preprocess a table into the frame ``preprocess_data`` returns.
+
+    The downcast dtypes, the casts and the target are computed by query
+    plans; the category codes of the columns, and their dummies, are
+    computed in a thread pool, a column per thread.
+
+    Args:
+        table: Raw data
+        numeric_columns: Columns used as features as they are
+        target_column: Claim count the target flags
+        categorical_columns: List of categorical columns to encode
+        category_mappings: Categories of each column
+        encoding: Either ``"one_hot"`` or ``"native"``
+
+    Returns:
+        Preprocessed data
+    """
+    table = _rechunk(table)
+    dtypes = loaded_dtypes(table)
+    downcasts = _downcast_dtypes(table, dtypes, numeric_columns)
+
+    expressions = {}
+    for column in numeric_columns:
+        expressions[column] = pc.field(column)
+        if isinstance(downcasts.get(column), np.dtype):
+            numpy_type = pa.from_numpy_dtype(downcasts[column])
+            expressions[column] = expressions[column].cast(numpy_type, safe=False)
+    # NaN claim counts are not 0, hence flagged, like missing ones in pandas
+    expressions["target"] = pc.coalesce(
+        pc.not_equal(pc.field(target_column), 0), pa.scalar(True)
+    ).cast(pa.uint8())
+    result = _run(table, _project(expressions))
+    data = result.to_pandas(use_threads=True)
+    # Extension dtypes are rebuilt from their Arrow column
+    for column in numeric_columns:
+        dtype = downcasts.get(column, dtypes[column])
+        if hasattr(dtype, "__from_arrow__"):
+            data[column] = pd.Series(
+                dtype.__from_arrow__(result.column(column)), index=data.index
+            )
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        codes = dict(
+            zip(
+                categorical_columns,
+                pool.map(
+                    lambda column: _category_codes(
+                        table.column(column), category_mappings[column]
+                    ),
+                    categorical_columns,
+                ),
+            )
+        )
+        if encoding == "native":
+            categoricals = pd.DataFrame(
+                {
+                    column: pd.Categorical.from_codes(
+                        codes[column],
+                        dtype=pd.CategoricalDtype(category_mappings[column]),
+                    )
+                    for column in categorical_columns
+                },
+                index=data.index,
+            )
+        else:
+            categoricals = _dummies(pool, codes, category_mappings, data.index)
+
+    return pd.concat([data, categoricals], axis=1)
@@ -0,0 +1,409 @@
+"""Out-of-core preprocessing of raw Parquet files larger than memory.
+
+The streaming pipeline produces the same ``X_train``, ``X_test``,
+``y_train`` and ``y_test`` as ``load_data``, ``preprocess_data`` and
+``apply_split`` run on the whole file, while holding only a chunk of rows,
+the target and the split in memory:
+
+1. ``scan_raw_data`` reads the categorical columns and the claim counts
+   chunk by chunk to learn the category levels and the target.
+2. The split is drawn from the target as usual (``split_indices``).
+3. ``preprocess_split_chunked`` encodes the file chunk by chunk and spills
+   the rows of each chunk to temporary files by their position in the
+   training or test set, ``chunk_rows`` positions per file. Numeric columns
+   keep their loaded dtype meanwhile, since the dtype ``preprocess_data``
+   downcasts a column to depends on all of its values.
+4. The four outputs are iterators reading the spill files back in order,
+   sorting and downcasting each one, which the ``ChunkedParquetDataset``
+   writes a chunk at a time.
+"""
+
+from __future__ import annotations
+
+import logging
+import tempfile
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from insurance_prediction.pipelines.data_processing.nodes import (
+    TARGET_SOURCE,
+    _compact_numeric,
+    _encode_categoricals,
+    _numeric_columns,
+    _target,
+    take_rows,
+)
+
+logger = logging.getLogger(__name__)
+
+# Column of the spill files holding the position of a row in its set
+_POSITION = "__position__"
+
+
+def nullable_columns(parquet_file: pq.ParquetFile) -> set[str]:
+    """Return the columns holding missing values anywhere in the file.
+
+    The row group statistics are used where they were written, and the
+    column is read otherwise.
+
+    Args:
+        parquet_file: Raw data file
+
+    Returns:
+        Names of the columns with at least one missing value
+    """
+    metadata = parquet_file.metadata
+    nullable = set()
+    for index, name in enumerate(parquet_file.schema_arrow.names):
+        statistics = [
+            metadata.row_group(group).column(index).statistics
+            for group in range(metadata.num_row_groups)
+        ]
+        if all(s is not None and s.has_null_count for s in statistics):
+            has_nulls = any(s.null_count for s in statistics)
+        else:
+            has_nulls = any(
+                batch.column(0).null_count
+                for batch in parquet_file.iter_batches(columns=[name])
+            )
+        if has_nulls:
+            nullable.add(name)
+    return nullable
+
+
+def iter_raw_chunks(
+    data_path: str,
+    chunk_rows: int,
+    columns: list[str] | None = None,
+    nullable: set[str] | None = None,
+) -> Iterator[pd.DataFrame]:
+    """Read a raw Parquet file as frames of at most ``chunk_rows`` rows.
+
+    Each frame is indexed by the position of its rows in the file and has
+    the dtypes ``load_data`` gives the whole file: Arrow converts integer
+    and boolean columns holding missing values to ``float64`` and
+    ``object``, so the chunks without a missing value of such a column are
+    converted likewise.
+
+    Args:
+        data_path: Path to the Parquet file
+        chunk_rows: Largest number of rows of a chunk
+        columns: Columns to read, all of them if not set
+        nullable: Columns with missing values in the file, see
+            ``nullable_columns``; computed if not set
+
+    Yields:
+        The chunks in file order
+    """
+    parquet_file = pq.ParquetFile(data_path, memory_map=True)
+    if nullable is None:
+        nullable = nullable_columns(parquet_file)
+    # Record batches drop the pandas metadata restoring extension dtypes
+    metadata = parquet_file.schema_arrow.metadata
+    start = 0
+    for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+        chunk = pa.Table.from_batches([batch]).replace_schema_metadata(metadata)
+        chunk = chunk.to_pandas()
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        start += len(chunk)
+        casts = {}
+        for column in nullable.intersection(chunk.columns):
+            dtype = chunk[column].dtype
+            # Extension dtypes such as ``Int64`` already hold missing values
+            if not isinstance(dtype, np.dtype):
+                continue
+            if dtype.kind in "iu":
+                casts[column] = chunk[column].astype("float64")
+            elif dtype.kind == "b":
+                casts[column] = chunk[column].astype(object)
+        yield chunk.assign(**casts) if casts else chunk
+
+
+def scan_raw_data(
+    data_path: str,
+    categorical_columns: list[str],
+    streaming_options: dict[str, Any],
+) -> tuple[dict[str, list[Any]], pd.DataFrame]:
+    """Learn the category levels and the target in one pass over the file.
+
+    Only the categorical columns and the claim counts are read. The levels
+    are those ``fit_category_mappings`` learns from the whole file: the
+    dictionary levels of dictionary-encoded columns in the order Arrow
+    unifies them, and the sorted distinct values of the other columns.
+
+    Args:
+        data_path: Path to the Parquet file
+        categorical_columns: List of categorical columns
+        streaming_options: ``chunk_rows``, the number of rows read at once
+
+    Returns:
+        category_mappings: Categories of each categorical column
+        target: Target of every row (as DataFrame)
+    """
+    parquet_file = pq.ParquetFile(data_path)
+    columns = categorical_columns + [
+        column for column in [TARGET_SOURCE] if column not in categorical_columns
+    ]
+    levels: dict[str, pd.Index] = {}
+    dictionary_columns = set()
+    targets = []
+    for chunk in iter_raw_chunks(
+        data_path,
+        streaming_options["chunk_rows"],
+        columns,
+        nullable_columns(parquet_file),
+    ):
+        for column in categorical_columns:
+            values = chunk[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                dictionary_columns.add(column)
+                found = values.cat.categories
+            else:
+                found = pd.Index(values.dropna().unique())
+            levels[column] = (
+                levels[column].append(found).unique() if column in levels else found
+            )
+        targets.append(_target(chunk))
+
+    category_mappings = {
+        column: (
+            levels[column]
+            if column in dictionary_columns
+            else levels[column].sort_values()
+        ).tolist()
+        for column in categorical_columns
+    }
+    return category_mappings, pd.concat(targets).to_frame()
+
+
+def _widest(dtypes: list[Any]) -> Any:
+    """Return the dtype holding the values of every other one of ``dtypes``."""
+    return max(dtypes, key=lambda dtype: getattr(dtype, "numpy_dtype", dtype).itemsize)
+
+
+class _Spill:
+    """Encoded rows of the training and test sets, spilled to disk.
+
+    The spill directory is deleted once every stream returned by ``chunks``
+    is exhausted, or when the object is garbage collected. Streams may be
+    consumed from different threads, as when the catalog saves them
+    asynchronously, so their count is kept under a lock.
+    """
+
+    def __init__(self, spill_directory: str | None, chunk_rows: int):
+        if spill_directory is not None:
+            Path(spill_directory).mkdir(parents=True, exist_ok=True)
+        self.directory = tempfile.TemporaryDirectory(
+            prefix="spill_", dir=spill_directory
+        )
+        self.chunk_rows = chunk_rows
+        self.n_files: dict[str, int] = {}
+        self.features: list[str] = []
+        self.dtypes: dict[str, Any] = {}
+        self._streams = 0
+        self._lock = threading.Lock()
+
+    def path(self, split: str, number: int) -> Path:
+        return Path(self.directory.name) / f"{split}_{number:06d}.parquet"
+
+    def write(
+        self,
+        chunks: Iterator[pd.DataFrame],
+        n_rows: int,
+        split_indices: dict[str, np.ndarray],
+        downcast_columns: list[str],
+    ) -> None:
+        """Scatter the chunks to the spill files of their rows.
+
+        Args:
+            chunks: Encoded chunks in file order, indexed by row position
+            n_rows: Number of rows of the file
+            split_indices: Row positions of the ``train`` and ``test`` sets
+            downcast_columns: Columns downcast as by ``preprocess_data``; the
+                streams cast them to the widest dtype picked for any chunk
+        """
+        splits = list(split_indices)
+        # Set, and position within it, of every row of the file
+        row_split = np.full(n_rows, -1, dtype=np.int8)
+        row_position = np.zeros(n_rows, dtype=np.int64)
+        for code, split in enumerate(splits):
+            rows = split_indices[split]
+            row_split[rows] = code
+            row_position[rows] = np.arange(len(rows))
+            self.n_files[split] = -(-len(rows) // self.chunk_rows)
+
+        downcasts: dict[str, list[Any]] = {column: [] for column in downcast_columns}
+        writers: dict[tuple[str, int], pq.ParquetWriter] = {}
+        schema = None
+        try:
+            for chunk in chunks:
+                self.features = [c for c in chunk.columns if c != "target"]
+                # Parquet only keeps the categories of string columns
+                self.dtypes.update(
+                    (column, dtype)
+                    for column, dtype in chunk.dtypes.items()
+                    if isinstance(dtype, pd.CategoricalDtype)
+                )
+                for column, dtypes in downcasts.items():
+                    dtypes.append(_compact_numeric(chunk[column]).dtype)
+
+                rows = chunk.index.to_numpy()
+                for code, split in enumerate(splits):
+                    selected = np.flatnonzero(row_split[rows] == code)
+                    positions = row_position[rows[selected]]
+                    numbers = positions // self.chunk_rows
+                    for number in np.unique(numbers).tolist():
+                        in_file = numbers == number
+                        table = pa.Table.from_pandas(
+                            take_rows(chunk, selected[in_file]).assign(
+                                **{_POSITION: positions[in_file]}
+                            ),
+                            preserve_index=True,
+                        )
+                        if schema is None:
+                            schema = table.schema
+                        elif table.schema != schema:
+                            table = table.cast(schema)
+                        if (split, number) not in writers:
+                            writers[split, number] = pq.ParquetWriter(
+                                self.path(split, number), schema
+                            )
+                        writers[split, number].write_table(table)
+        except BaseException:
+            self.directory.cleanup()
+            raise
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        self.dtypes.update(
+            (column, _widest(dtypes)) for column, dtypes in downcasts.items() if dtypes
+        )
+        logger.info(
+            "Spilled %d rows to %d files in '%s'",
+            n_rows,
+            len(writers),
+            self.directory.name,
+        )
+
+    def chunks(self, split: str, columns: list[str]) -> Iterator[pd.DataFrame]:
+        """Stream columns of the rows of a set in order.
+
+        Args:
+            split: ``"train"`` or ``"test"``
+            columns: Columns to read
+
+        Returns:
+            Iterator over frames of at most ``chunk_rows`` consecutive rows
+        """
+        # Counted now: a stream never started never deletes the directory
+        with self._lock:
+            self._streams += 1
+        return self._read(split, columns)
+
+    def _read(self, split: str, columns: list[str]) -> Iterator[pd.DataFrame]:
+        try:
+            for number in range(self.n_files[split]):
+                spilled = pq.read_table(
+                    self.path(split, number),
+                    columns=columns + [_POSITION],
+                    use_pandas_metadata=True,
+                ).to_pandas()
+                order = np.argsort(spilled[_POSITION].to_numpy(), kind="stable")
+                chunk = take_rows(spilled, order, columns)
+                casts = {
+                    column: chunk[column].astype(self.dtypes[column])
+                    for column in columns
+                    if column in self.dtypes
+                    and chunk[column].dtype != self.dtypes[column]
+                }
+                yield chunk.assign(**casts) if casts else chunk
+        finally:
+            with self._lock:
+                self._streams -= 1
+                if self._streams == 0:
+                    self.directory.cleanup()
+
+
+def preprocess_split_chunked(
+    data_path: str,
+    categorical_columns: list[str],
+    category_mappings: dict[str, list[Any]],
+    encoding: str,
+    split_indices: dict[str, np.ndarray],
+    streaming_options: dict[str, Any],
+) -> tuple[
+    Iterator[pd.DataFrame],
+    Iterator[pd.DataFrame],
+    Iterator[pd.DataFrame],
+    Iterator[pd.DataFrame],
+]:
+    """Preprocess and split a raw Parquet file a chunk at a time.
+
+    The rows are encoded and spilled to disk as the file is read; the
+    returned iterators read them back, so their outputs must be saved to a
+    dataset accepting chunks such as ``ChunkedParquetDataset``. Concatenated,
+    the chunks of each output equal the frame ``apply_split`` returns for
+    the ``preprocess_data`` output of the whole file.
+
+    Args:
+        data_path: Path to the Parquet file
+        categorical_columns: List of categorical columns to encode
+        category_mappings: Categories of each column, see ``scan_raw_data``
+        encoding: Either ``"one_hot"`` or ``"native"``
+        split_indices: Row positions of the ``train`` and ``test`` sets
+        streaming_options: ``chunk_rows``, the number of rows read and
+            written at once, and ``spill_directory``, the directory of the
+            temporary files (the system's temporary directory if null)
+
+    Returns:
+        X_train: Chunks of the training features
+        X_test: Chunks of the test features
+        y_train: Chunks of the training targets
+        y_test: Chunks of the test targets
+    """
+    if encoding not in ("one_hot", "native"):
+        raise ValueError(f"Unknown encoding '{encoding}', use 'one_hot' or 'native'")
+    parquet_file = pq.ParquetFile(data_path)
+    nullable = nullable_columns(parquet_file)
+    numeric_columns = _numeric_columns(
+        pd.DataFrame(columns=parquet_file.schema_arrow.names), categorical_columns
+    )
+
+    def encoded_chunks() -> Iterator[pd.DataFrame]:
+        for chunk in iter_raw_chunks(
+            data_path, streaming_options["chunk_rows"], nullable=nullable
+        ):
+            yield pd.concat(
+                [
+                    chunk[numeric_columns],
+                    _target(chunk),
+                    _encode_categoricals(
+                        chunk, categorical_columns, category_mappings, encoding
+                    ),
+                ],
+                axis=1,
+            )
+
+    spill = _Spill(
+        streaming_options.get("spill_directory"), streaming_options["chunk_rows"]
+    )
+    spill.write(
+        encoded_chunks(),
+        parquet_file.metadata.num_rows,
+        split_indices,
+        numeric_columns,
+    )
+    return (
+        spill.chunks("train", spill.features),
+        spill.chunks("test", spill.features),
+        spill.chunks("train", ["target"]),
+        spill.chunks("test", ["target"]),
+    )
@@ -0,0 +1,143 @@
+"""Content-addressed cache for remote data downloads."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import requests
+
+CHUNK_SIZE = 1 << 20
+
+
+@dataclass
+class CacheEntry:
+    """Metadata describing the cached copy of a remote file."""
+
+    url: str
+    sha256: str
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+class DownloadCache:
+    """Cache of downloaded files keyed by URL and stored by content hash.
+
+    Each URL maps to a small JSON entry holding the validators returned by the
+    server (``ETag``/``Last-Modified``) and the SHA-256 of the body. Bodies are
+    stored once under ``blobs/<sha256>``, so identical content is never kept
+    twice.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._entries = self.directory / "entries"
+        self._blobs = self.directory / "blobs"
+        self._entries.mkdir(parents=True, exist_ok=True)
+        self._blobs.mkdir(parents=True, exist_ok=True)
+
+    def blob_path(self, sha256: str) -> Path:
+        """Return the path of the blob with the given content hash."""
+        return self._blobs / sha256
+
+    def get(self, url: str) -> CacheEntry | None:
+        """Return the cache entry for a URL if its blob is still present."""
+        entry_path = self._entry_path(url)
+        if not entry_path.exists():
+            return None
+        entry = CacheEntry(**json.loads(entry_path.read_text(encoding="utf-8")))
+        if not self.blob_path(entry.sha256).exists():
+            return None
+        return entry
+
+    def fetch(
+        self, url: str, offline: bool = False, timeout: float | None = None
+    ) -> tuple[CacheEntry, bool]:
+        """Return an up-to-date cache entry for a URL.
+
+        The server is asked to revalidate the cached copy with a conditional
+        request. A changed body is streamed to a temporary file while being
+        hashed, so it is never held in memory in full.
+
+        Args:
+            url: URL to fetch
+            offline: Serve from the cache only, never touching the network
+            timeout: Timeout in seconds for the HTTP request
+
+        Returns:
+            The cache entry and whether its content changed
+        """
+        entry = self.get(url)
+        if offline:
+            if entry is None:
+                raise RuntimeError(f"No cached copy of '{url}' available offline")
+            return entry, False
+
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        with requests.get(url, headers=headers, stream=True, timeout=timeout) as r:
+            if r.status_code == 304 and entry is not None:
+                return entry, False
+            r.raise_for_status()
+            sha256 = self._store(r)
+            new_entry = CacheEntry(
+                url=url,
+                sha256=sha256,
+                etag=r.headers.get("ETag"),
+                last_modified=r.headers.get("Last-Modified"),
+            )
+
+        self._write_entry(new_entry)
+        changed = entry is None or entry.sha256 != new_entry.sha256
+        return new_entry, changed
+
+    def _entry_path(self, url: str) -> Path:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self._entries / f"{key}.json"
+
+    def _store(self, response: requests.Response) -> str:
+        digest = hashlib.sha256()
+        fd, tmp_name = tempfile.mkstemp(dir=self._blobs, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+            sha256 = digest.hexdigest()
+            os.replace(tmp_name, self.blob_path(sha256))
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        return sha256
+
+    def _write_entry(self, entry: CacheEntry) -> None:
+        entry_path = self._entry_path(entry.url)
+        tmp_path = entry_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(asdict(entry)), encoding="utf-8")
+        os.replace(tmp_path, entry_path)
+
+
+def read_source_marker(output_path: Path) -> str | None:
+    """Return the content hash an output file was last produced from."""
+    marker = _marker_path(output_path)
+    if not marker.exists() or not output_path.exists():
+        return None
+    return marker.read_text(encoding="utf-8").strip()
+
+
+def write_source_marker(output_path: Path, sha256: str) -> None:
+    """Record the content hash an output file was produced from."""
+    _marker_path(output_path).write_text(sha256, encoding="utf-8")
+
+
+def _marker_path(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + ".source")
@@ -0,0 +1,164 @@
+"""Fitted feature encoder shared by training and scoring."""
+
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class FeatureEncoder:
+    """Turn raw records into the feature matrix the model was trained on.
+
+    The encoder is fitted on the training features, so its output columns
+    are exactly ``feature_names`` whatever values a batch happens to contain.
+    For every categorical column it precomputes the output position of each
+    category, which lets ``transform`` write a whole batch into a
+    preallocated array with one vectorized lookup per column instead of
+    calling ``pd.get_dummies`` and realigning the result.
+
+    Unseen categories encode to all-zero dummies in ``one_hot`` mode and to
+    missing values in ``native`` mode, matching ``preprocess_data``.
+    """
+
+    def __init__(
+        self,
+        feature_names: list[str],
+        category_mappings: dict[str, list[Any]],
+        encoding: str,
+    ):
+        self.feature_names = list(feature_names)
+        self.category_mappings = {
+            column: list(categories) for column, categories in category_mappings.items()
+        }
+        self.encoding = encoding
+
+        positions = {name: i for i, name in enumerate(self.feature_names)}
+        self.category_positions: dict[str, np.ndarray] = {}
+        if encoding == "one_hot":
+            for column, categories in self.category_mappings.items():
+                names = [f"{column}_{category}" for category in categories]
+                missing = [name for name in names if name not in positions]
+                if missing:
+                    raise ValueError(f"Features {missing} are not in feature_names")
+                self.category_positions[column] = np.array(
+                    [positions.pop(name) for name in names], dtype=np.intp
+                )
+        elif encoding == "native":
+            for column in self.category_mappings:
+                self.category_positions[column] = np.array(
+                    [positions.pop(column)], dtype=np.intp
+                )
+        else:
+            raise ValueError(
+                f"Unknown encoding '{encoding}', use 'one_hot' or 'native'"
+            )
+        self.numeric_positions = positions
+        self._indexes: dict[str, pd.Index] = {}
+
+    @classmethod
+    def fit(
+        cls,
+        X: pd.DataFrame,
+        category_mappings: dict[str, list[Any]],
+        encoding: str = "one_hot",
+    ) -> FeatureEncoder:
+        """Fit an encoder on preprocessed training features.
+
+        Args:
+            X: Preprocessed training features
+            category_mappings: Categories of each categorical column
+            encoding: Encoding used to produce ``X``
+
+        Returns:
+            Fitted encoder
+        """
+        return cls(X.columns.tolist(), category_mappings, encoding)
+
+    def transform(
+        self, data: pd.DataFrame, out: np.ndarray | None = None
+    ) -> np.ndarray:
+        """Encode a batch of raw records.
+
+        Args:
+            data: Raw records holding at least the numeric and categorical
+                input columns; any other columns are ignored
+            out: Optional preallocated ``(len(data), n_features)`` array
+
+        Returns:
+            Feature matrix with columns in ``feature_names`` order
+        """
+        n_rows = len(data)
+        if out is None:
+            out = np.empty((n_rows, len(self.feature_names)), dtype=np.float64)
+        elif out.shape != (n_rows, len(self.feature_names)):
+            raise ValueError(f"Output array has shape {out.shape}")
+
+        for column, position in self.numeric_positions.items():
+            out[:, position] = data[column].to_numpy(dtype=out.dtype, na_value=np.nan)
+
+        for column, positions in self.category_positions.items():
+            codes = self._index(column).get_indexer(data[column])
+            if self.encoding == "native":
+                out[:, positions[0]] = np.where(codes >= 0, codes, np.nan)
+                continue
+            out[:, positions] = 0
+            known = codes >= 0
+            out[np.flatnonzero(known), positions[codes[known]]] = 1
+
+        return out
+
+    def transform_sparse(self, data: pd.DataFrame) -> sparse.csr_matrix:
+        """Encode a batch of raw records into a CSR matrix.
+
+        Only the non-zero numeric values and one entry per known category are
+        stored, so memory does not grow with the number of categories.
+        Missing numeric values are kept as explicit ``NaN`` entries.
+
+        Args:
+            data: Raw records holding at least the input columns
+
+        Returns:
+            Sparse feature matrix with columns in ``feature_names`` order
+        """
+        if self.encoding != "one_hot":
+            raise ValueError("Sparse output requires the 'one_hot' encoding")
+
+        rows, cols, values = [], [], []
+        for column, position in self.numeric_positions.items():
+            column_values = data[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            nonzero = np.flatnonzero(column_values)
+            rows.append(nonzero)
+            cols.append(np.full(len(nonzero), position, dtype=np.intp))
+            values.append(column_values[nonzero])
+
+        for column, positions in self.category_positions.items():
+            codes = self._index(column).get_indexer(data[column])
+            known = np.flatnonzero(codes >= 0)
+            rows.append(known)
+            cols.append(positions[codes[known]])
+            values.append(np.ones(len(known)))
+
+        return sparse.csr_matrix(
+            (
+                np.concatenate(values),
+                (np.concatenate(rows), np.concatenate(cols)),
+            ),
+            shape=(len(data), len(self.feature_names)),
+        )
+
+    def transform_frame(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Encode a batch of raw records into a DataFrame with feature names."""
+        return pd.DataFrame(self.transform(data), columns=self.feature_names)
+
+    def _index(self, column: str) -> pd.Index:
+        if column not in self._indexes:
+            self._indexes[column] = pd.Index(self.category_mappings[column])
+        return self._indexes[column]
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_indexes"] = {}
+        return state
@@ -1,86 +1,429 @@
 """Data processing nodes."""
 
-import io
+from __future__ import annotations
+
+import logging
+import time
 from pathlib import Path
-from typing import List, Tuple
+from typing import Any
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import rdata
-import requests
 from sklearn.model_selection import train_test_split
 
+from insurance_prediction.pipelines.data_processing import arrow_backend
+from insurance_prediction.pipelines.data_processing.download_cache import (
+    DownloadCache,
+    read_source_marker,
+    write_source_marker,
+)
+from insurance_prediction.pipelines.data_processing.encoder import FeatureEncoder
+from insurance_prediction.pipelines.data_processing.sparse import SparseFeatures
+
+logger = logging.getLogger(__name__)
+
+# Claim counts and indicators that leak the target
+DROPPED_COLUMNS = ["Numtppd", "Numtpbi", "Indtppd", "Indtpbi"]
+# Claim count the target flags
+TARGET_SOURCE = "Numtppd"
+# Dataframe libraries ``load_data`` can load the raw data with
+BACKENDS = ("pandas", "arrow")
+
 
-def download_data(url: str, output_directory: str, file_name: str) -> str:
-    """Download data from a URL and save it to a CSV file.
+def download_data(
+    url: str,
+    output_directory: str,
+    file_name: str,
+    cache_options: dict[str, Any] | None = None,
+) -> str:
+    """Download data from a URL and save it to a Parquet file.
+
+    The download goes through a local content-addressed cache which is
+    revalidated with the server on every run. When the cached content is
+    unchanged and the Parquet file was already produced from it, parsing and
+    writing are skipped entirely.
+
+    The file is written with an explicit schema in which R factors become
+    dictionary-encoded columns that keep all of their levels.
 
     Args:
         url: URL to download data from
         output_directory: Directory to save the data
         file_name: Name of the file to save the data
+        cache_options: Optional cache settings: ``directory`` (defaults to
+            ``<output_directory>/.cache``), ``offline`` to serve only from the
+            cache and ``timeout`` for the HTTP request in seconds
 
     Returns:
         Path to the downloaded data
     """
+    cache_options = cache_options or {}
+
     # Create the output directory if it doesn't exist
     Path(output_directory).mkdir(parents=True, exist_ok=True)
 
     # Full path to save the data
     output_path = Path(output_directory) / file_name
 
-    # Download the file from the URL
-    response = requests.get(url)
+    cache = DownloadCache(
+        cache_options.get("directory") or Path(output_directory) / ".cache"
+    )
+    entry, _ = cache.fetch(
+        url,
+        offline=cache_options.get("offline", False),
+        timeout=cache_options.get("timeout"),
+    )
+
+    if read_source_marker(output_path) == entry.sha256:
+        logger.info("Cached data for '%s' is up to date, skipping parse", url)
+        return str(output_path)
 
-    # Write the content to a file
-    f = io.BytesIO(response.content)
-    r_data = rdata.read_rda(f)["pg15training"]
-    r_data.to_csv(output_path, index=False)
+    # Parse the cached file and write it out
+    r_data = rdata.read_rda(cache.blob_path(entry.sha256))["pg15training"]
+    table = pa.Table.from_pandas(
+        r_data, schema=_raw_schema(r_data), preserve_index=False
+    )
+    pq.write_table(table, output_path)
+    write_source_marker(output_path, entry.sha256)
 
     # Return the path as a string for the TextDataSet
     return str(output_path)
 
 
-def load_data(data_path: str) -> pd.DataFrame:
-    """Load data from a CSV file.
+def _raw_schema(data: pd.DataFrame) -> pa.Schema:
+    """Build the Arrow schema used to store the raw data.
+
+    Categorical columns are stored as dictionaries so that their levels
+    survive the round-trip; nullable integers keep their width.
+    """
+    fields = []
+    for column, dtype in data.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            arrow_type = pa.dictionary(pa.int32(), pa.string(), ordered=dtype.ordered)
+        elif pd.api.types.is_string_dtype(dtype) or dtype == object:
+            arrow_type = pa.string()
+        else:
+            arrow_type = pa.from_numpy_dtype(getattr(dtype, "numpy_dtype", dtype))
+        fields.append(pa.field(str(column), arrow_type))
+    return pa.schema(fields)
+
+
+def load_data(
+    data_path: str, memory_map: bool = True, backend: str = "pandas"
+) -> pd.DataFrame | pa.Table:
+    """Load the raw data.
+
+    Parquet files are read through a memory map and dictionary-encoded
+    columns come back as ``category`` dtype. CSV files are still accepted.
+
+    With ``backend="arrow"`` the data is returned as a ``pyarrow.Table``,
+    which ``fit_category_mappings`` and ``preprocess_data`` then process
+    with multi-threaded Arrow query plans into the same outputs.
 
     Args:
-        data_path: Path to the CSV file
+        data_path: Path to the Parquet (or CSV) file
+        memory_map: Whether to memory-map the Parquet file
+        backend: Either ``"pandas"`` or ``"arrow"``
 
     Returns:
-        Loaded data as a pandas DataFrame
+        Loaded data as a pandas DataFrame, or an Arrow table
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', use 'pandas' or 'arrow'")
+    if backend == "arrow":
+        return arrow_backend.read_table(data_path, memory_map)
+    if Path(data_path).suffix == ".csv":
+        return pd.read_csv(data_path)
+    return pq.read_table(data_path, memory_map=memory_map).to_pandas()
+
+
+def _compact_numeric(column: pd.Series) -> pd.Series:
+    """Downcast a numeric column to the smallest dtype that holds its values.
+
+    Floats are only downcast to float32 when every value survives the round
+    trip exactly, so the data, and what the encoder and scoring see, is
+    unchanged.
     """
-    return pd.read_csv(data_path)
+    if pd.api.types.is_bool_dtype(column) or not pd.api.types.is_numeric_dtype(column):
+        return column
+    if pd.api.types.is_integer_dtype(column):
+        return pd.to_numeric(column, downcast="integer")
+    dtype = column.dtype
+    if getattr(dtype, "numpy_dtype", dtype).itemsize <= 4:
+        return column
+    downcast = column.astype(
+        np.float32 if isinstance(dtype, np.dtype) else pd.Float32Dtype()
+    )
+    return downcast if downcast.astype(dtype).equals(column) else column
+
+
+def _report_step(step: str, start: float, result) -> None:
+    """Log the duration of a preprocessing step and the size of its result."""
+    memory = result.memory_usage(deep=True)
+    logger.info(
+        "preprocess_data %s: %.3fs, %.2f MiB",
+        step,
+        time.perf_counter() - start,
+        int(memory.sum() if hasattr(memory, "sum") else memory) / 2**20,
+    )
+
+
+def _target(data: pd.DataFrame) -> pd.Series:
+    """Flag the policies with at least one third-party property damage claim."""
+    return data[TARGET_SOURCE].ne(0).astype("uint8").rename("target")
+
+
+def _numeric_columns(
+    data: pd.DataFrame | pa.Table, categorical_columns: list[str]
+) -> list[str]:
+    """Return the input columns that are used as features as they are."""
+    excluded = set(DROPPED_COLUMNS) | set(categorical_columns)
+    columns = data.column_names if isinstance(data, pa.Table) else data.columns
+    return [column for column in columns if column not in excluded]
+
 
+def fit_category_mappings(
+    data: pd.DataFrame | pa.Table, categorical_columns: list[str]
+) -> dict[str, list[Any]]:
+    """Learn the category levels of each categorical column.
 
-def preprocess_data(data: pd.DataFrame, categorical_columns: List[str]) -> pd.DataFrame:
-    """Preprocess the data by creating a target column, dropping columns, and one-hot encoding.
+    Columns that are already categorical (R factors) keep their declared
+    levels; other columns use their sorted distinct values.
 
     Args:
-        data: Raw data
-        categorical_columns: List of categorical columns to one-hot encode
+        data: Raw data, a frame or an Arrow table
+        categorical_columns: List of categorical columns
+
+    Returns:
+        Mapping from column name to its ordered list of categories
+    """
+    if isinstance(data, pa.Table):
+        return arrow_backend.fit_category_mappings(data, categorical_columns)
+    mappings = {}
+    for column in categorical_columns:
+        values = data[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            levels = values.cat.categories
+        else:
+            levels = pd.Index(values.dropna().unique()).sort_values()
+        mappings[column] = levels.tolist()
+    return mappings
+
+
+def apply_category_mappings(
+    data: pd.DataFrame, category_mappings: dict[str, list[Any]] | None
+) -> pd.DataFrame:
+    """Cast the mapped columns of a frame to their persisted categories.
+
+    Parquet only keeps the ``category`` dtype for string categories, so
+    frames loaded from the catalog use this to restore it before reaching
+    LightGBM. Columns missing from ``data`` (e.g. after one-hot encoding)
+    are ignored and the frame is returned as is when nothing needs casting.
+
+    Args:
+        data: Frame holding some of the mapped columns
+        category_mappings: Categories of each column
+
+    Returns:
+        Frame with the mapped columns as ``category`` dtype
+    """
+    casts = {}
+    for column, categories in (category_mappings or {}).items():
+        if column not in data.columns:
+            continue
+        dtype = pd.CategoricalDtype(categories)
+        if data[column].dtype != dtype:
+            casts[column] = data[column].astype(dtype)
+    return data.assign(**casts) if casts else data
+
+
+def _encode_categoricals(
+    data: pd.DataFrame,
+    categorical_columns: list[str],
+    category_mappings: dict[str, list[Any]],
+    encoding: str,
+) -> pd.DataFrame:
+    """Cast the categorical columns to their categories and encode them."""
+    categoricals = pd.DataFrame(
+        {
+            column: data[column].astype(pd.CategoricalDtype(category_mappings[column]))
+            for column in categorical_columns
+        },
+        index=data.index,
+    )
+    if encoding == "one_hot":
+        # Add one hot encoder processor
+        categoricals = pd.get_dummies(categoricals, dtype="uint8")
+    return categoricals
+
+
+def preprocess_data(
+    data: pd.DataFrame | pa.Table,
+    categorical_columns: list[str],
+    category_mappings: dict[str, list[Any]] | None = None,
+    encoding: str = "one_hot",
+) -> pd.DataFrame:
+    """Preprocess the data by creating a target column, dropping columns, and encoding categoricals.
+
+    The input frame is not modified. The target is computed in a single
+    vectorized comparison, numeric columns are downcast and the output frame
+    is assembled with a single copy.
+
+    Categorical columns are first cast to the categories in
+    ``category_mappings`` so that the encoded columns do not depend on the
+    values present in this particular batch. With ``encoding="one_hot"`` they
+    are expanded into ``uint8`` dummies; with ``encoding="native"`` they are
+    kept as ``category`` columns for LightGBM to split on directly.
+
+    An Arrow table, loaded with ``backend="arrow"``, is preprocessed by a
+    multi-threaded Arrow query plan into the same frame.
+
+    Args:
+        data: Raw data, a frame or an Arrow table
+        categorical_columns: List of categorical columns to encode
+        category_mappings: Categories of each column, learned from ``data``
+            when not given
+        encoding: Either ``"one_hot"`` or ``"native"``
 
     Returns:
         Preprocessed data
     """
+    if encoding not in ("one_hot", "native"):
+        raise ValueError(f"Unknown encoding '{encoding}', use 'one_hot' or 'native'")
+    if category_mappings is None:
+        category_mappings = fit_category_mappings(data, categorical_columns)
 
-    data["target"] = data["Numtppd"].apply(lambda x: 1 if x != 0 else 0)
+    if isinstance(data, pa.Table):
+        start = time.perf_counter()
+        data = arrow_backend.preprocess_table(
+            data,
+            _numeric_columns(data, categorical_columns),
+            TARGET_SOURCE,
+            categorical_columns,
+            category_mappings,
+            encoding,
+        )
+        _report_step("arrow", start, data)
+        return data
 
-    data = data.drop(columns=["Numtppd", "Numtpbi", "Indtppd", "Indtpbi"])
+    start = time.perf_counter()
+    target = _target(data)
+    _report_step("target", start, target)
 
-    # Add one hot encoder processor
-    data = pd.get_dummies(data, columns=categorical_columns)
+    start = time.perf_counter()
+    numeric = {
+        column: _compact_numeric(data[column])
+        for column in _numeric_columns(data, categorical_columns)
+    }
+    _report_step("downcast", start, pd.DataFrame(numeric, copy=False))
+
+    start = time.perf_counter()
+    categoricals = _encode_categoricals(
+        data, categorical_columns, category_mappings, encoding
+    )
+    _report_step(encoding, start, categoricals)
+
+    start = time.perf_counter()
+    data = pd.concat([pd.DataFrame(numeric, copy=False), target, categoricals], axis=1)
+    _report_step("concat", start, data)
 
     return data
 
 
+def split_indices(
+    data: pd.DataFrame,
+    test_size: float,
+    random_state: int,
+    stratify: bool = False,
+) -> dict[str, np.ndarray]:
+    """Split the row positions of the data into training and test sets.
+
+    Only the target is read, so the result is a tiny artifact that can be
+    applied to any store holding the rows in the same order.
+
+    Args:
+        data: Frame with a ``target`` column
+        test_size: Fraction of data to use for testing
+        random_state: Random seed for reproducibility
+        stratify: Whether to keep the target ratio equal in both sets
+
+    Returns:
+        Row positions of the ``train`` and ``test`` sets
+    """
+    train_rows, test_rows = train_test_split(
+        np.arange(len(data)),
+        test_size=test_size,
+        random_state=random_state,
+        stratify=data["target"] if stratify else None,
+    )
+    return {"train": train_rows, "test": test_rows}
+
+
+def take_rows(
+    data: pd.DataFrame, rows: np.ndarray, columns: list[str] | None = None
+) -> pd.DataFrame:
+    """Select rows (and optionally columns) of a frame with a single copy.
+
+    ``DataFrame.take`` followed by dropping a column copies the selected
+    rows twice. Taking each column on its own writes every value once, and
+    taking from the column's array keeps extension dtypes such as
+    ``category``.
+
+    Args:
+        data: Frame to select from
+        rows: Row positions
+        columns: Columns to keep, all of them when not given
+
+    Returns:
+        Frame holding the selected rows and columns
+    """
+    columns = data.columns if columns is None else columns
+    return pd.DataFrame(
+        {column: data[column].array.take(rows) for column in columns},
+        index=data.index[rows],
+        copy=False,
+    )
+
+
+def apply_split(
+    data: pd.DataFrame, split_indices: dict[str, np.ndarray]
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Split data into features and targets, training and test sets.
+
+    Args:
+        data: Preprocessed data
+        split_indices: Row positions of the ``train`` and ``test`` sets
+
+    Returns:
+        X_train: Training features
+        X_test: Test features
+        y_train: Training targets (as DataFrame)
+        y_test: Test targets (as DataFrame)
+    """
+    features = [column for column in data.columns if column != "target"]
+    train_rows, test_rows = split_indices["train"], split_indices["test"]
+
+    return (
+        take_rows(data, train_rows, features),
+        take_rows(data, test_rows, features),
+        take_rows(data, train_rows, ["target"]),
+        take_rows(data, test_rows, ["target"]),
+    )
+
+
 def split_data(
-    data: pd.DataFrame, test_size: float, random_state: int
-) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    data: pd.DataFrame, test_size: float, random_state: int, stratify: bool = False
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """Split data into features and targets, training and test sets.
 
     Args:
         data: Preprocessed data
         test_size: Fraction of data to use for testing
         random_state: Random seed for reproducibility
+        stratify: Whether to keep the target ratio equal in both sets
 
     Returns:
         X_train: Training features
@@ -88,15 +431,94 @@ def split_data(
         y_train: Training targets (as DataFrame)
         y_test: Test targets (as DataFrame)
     """
-    X = data.drop("target", axis=1)
-    y = data["target"]
+    return apply_split(data, split_indices(data, test_size, random_state, stratify))
+
+
+def build_sparse_features(
+    data: pd.DataFrame,
+    categorical_columns: list[str],
+    category_mappings: dict[str, list[Any]] | None = None,
+) -> tuple[SparseFeatures, pd.DataFrame]:
+    """Preprocess the data straight into a sparse one-hot feature matrix.
+
+    The features are the same as the ``one_hot`` output of
+    ``preprocess_data`` but are built as a CSR matrix without ever
+    materialising the dense dummies.
 
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=test_size, random_state=random_state
+    Args:
+        data: Raw data, a frame or an Arrow table
+        categorical_columns: List of categorical columns to one-hot encode
+        category_mappings: Categories of each column, learned from ``data``
+            when not given
+
+    Returns:
+        features: Sparse feature matrix
+        target: Target (as DataFrame)
+    """
+    if isinstance(data, pa.Table):
+        data = data.to_pandas()
+    if category_mappings is None:
+        category_mappings = fit_category_mappings(data, categorical_columns)
+    mappings = {column: category_mappings[column] for column in categorical_columns}
+
+    feature_names = _numeric_columns(data, categorical_columns) + [
+        f"{column}_{category}"
+        for column, categories in mappings.items()
+        for category in categories
+    ]
+    encoder = FeatureEncoder(feature_names, mappings, "one_hot")
+
+    start = time.perf_counter()
+    features = SparseFeatures(encoder.transform_sparse(data), feature_names)
+    logger.info(
+        "build_sparse_features: %.3fs, %d stored values",
+        time.perf_counter() - start,
+        features.matrix.nnz,
     )
 
-    # Convert Series to DataFrames for compatibility with ParquetDataSet
-    y_train_df = pd.DataFrame(y_train, columns=["target"])
-    y_test_df = pd.DataFrame(y_test, columns=["target"])
+    return features, _target(data).to_frame()
+
+
+def split_sparse_data(
+    features: SparseFeatures,
+    target: pd.DataFrame,
+    split_indices: dict[str, np.ndarray],
+) -> tuple[SparseFeatures, SparseFeatures, pd.DataFrame, pd.DataFrame]:
+    """Split sparse features and targets into training and test sets.
+
+    Args:
+        features: Sparse feature matrix
+        target: Target (as DataFrame)
+        split_indices: Row positions of the ``train`` and ``test`` sets
 
-    return X_train, X_test, y_train_df, y_test_df
+    Returns:
+        X_train: Training features
+        X_test: Test features
+        y_train: Training targets (as DataFrame)
+        y_test: Test targets (as DataFrame)
+    """
+    train_rows, test_rows = split_indices["train"], split_indices["test"]
+    return (
+        features.take(train_rows),
+        features.take(test_rows),
+        target.iloc[train_rows],
+        target.iloc[test_rows],
+    )
+
+
+def fit_feature_encoder(
+    X_train: pd.DataFrame,
+    category_mappings: dict[str, list[Any]],
+    encoding: str = "one_hot",
+) -> FeatureEncoder:
+    """Fit the encoder that turns raw records into model features.
+
+    Args:
+        X_train: Training features, dense or ``SparseFeatures``
+        category_mappings: Categories of each categorical column
+        encoding: Encoding used by ``preprocess_data``
+
+    Returns:
+        Fitted feature encoder
+    """
+    return FeatureEncoder.fit(X_train, category_mappings, encoding)
@@ -2,52 +2,197 @@
 
 from kedro.pipeline import Pipeline, node, pipeline
 
+from insurance_prediction.pipelines.data_processing.chunked import (
+    preprocess_split_chunked,
+    scan_raw_data,
+)
 from insurance_prediction.pipelines.data_processing.nodes import (
+    apply_split,
+    build_sparse_features,
     download_data,
+    fit_category_mappings,
+    fit_feature_encoder,
     load_data,
     preprocess_data,
-    split_data,
+    split_indices,
+    split_sparse_data,
 )
 
 
-def create_pipeline(**kwargs) -> Pipeline:
+def create_pipeline(
+    sparse: bool = False, streaming: bool = False, **kwargs
+) -> Pipeline:
     """Create the data processing pipeline.
 
     Args:
+        sparse: Build the features as a sparse one-hot matrix, producing
+            ``X_train_sparse``/``X_test_sparse`` instead of the dense
+            ``X_train``/``X_test`` frames.
+        streaming: Preprocess and split the raw file a chunk at a time,
+            never loading it whole, into the same outputs as the default
+            pipeline.
         **kwargs: Ignore any additional arguments added in the future.
 
     Returns:
         A Pipeline object containing all the data processing nodes.
     """
+    download_node = node(
+        func=download_data,
+        inputs=[
+            "params:data_url",
+            "params:output_directory",
+            "params:file_name",
+            "params:download_cache",
+        ],
+        outputs="raw_data_path",
+        name="download_data_node",
+        # Revalidates the remote file, so incremental runs never skip it
+        tags="always_run",
+    )
+
+    if streaming:
+        return pipeline(
+            [
+                download_node,
+                node(
+                    func=scan_raw_data,
+                    inputs=[
+                        "raw_data_path",
+                        "params:categorical_columns",
+                        "params:streaming",
+                    ],
+                    outputs=["category_mappings", "preprocessed_target"],
+                    name="scan_raw_data_node",
+                ),
+                node(
+                    func=split_indices,
+                    inputs=[
+                        "preprocessed_target",
+                        "params:test_size",
+                        "params:random_state",
+                        "params:stratify",
+                    ],
+                    outputs="split_indices",
+                    name="split_indices_node",
+                ),
+                node(
+                    func=preprocess_split_chunked,
+                    inputs=[
+                        "raw_data_path",
+                        "params:categorical_columns",
+                        "category_mappings",
+                        "params:encoding",
+                        "split_indices",
+                        "params:streaming",
+                    ],
+                    outputs=["X_train", "X_test", "y_train", "y_test"],
+                    name="preprocess_split_chunked_node",
+                ),
+                node(
+                    func=fit_feature_encoder,
+                    inputs=["X_train", "category_mappings", "params:encoding"],
+                    outputs="feature_encoder",
+                    name="fit_feature_encoder_node",
+                ),
+            ]
+        )
+
+    ingestion_nodes = [
+        download_node,
+        node(
+            func=load_data,
+            inputs={"data_path": "raw_data_path", "backend": "params:backend"},
+            outputs="raw_data",
+            name="load_data_node",
+        ),
+        node(
+            func=fit_category_mappings,
+            inputs=["raw_data", "params:categorical_columns"],
+            outputs="category_mappings",
+            name="fit_category_mappings_node",
+        ),
+    ]
+
+    if sparse:
+        return pipeline(
+            ingestion_nodes
+            + [
+                node(
+                    func=build_sparse_features,
+                    inputs=[
+                        "raw_data",
+                        "params:categorical_columns",
+                        "category_mappings",
+                    ],
+                    outputs=["preprocessed_features_sparse", "preprocessed_target"],
+                    name="build_sparse_features_node",
+                ),
+                node(
+                    func=split_indices,
+                    inputs=[
+                        "preprocessed_target",
+                        "params:test_size",
+                        "params:random_state",
+                        "params:stratify",
+                    ],
+                    outputs="split_indices",
+                    name="split_indices_node",
+                ),
+                node(
+                    func=split_sparse_data,
+                    inputs=[
+                        "preprocessed_features_sparse",
+                        "preprocessed_target",
+                        "split_indices",
+                    ],
+                    outputs=["X_train_sparse", "X_test_sparse", "y_train", "y_test"],
+                    name="split_sparse_data_node",
+                ),
+                node(
+                    func=fit_feature_encoder,
+                    inputs=["X_train_sparse", "category_mappings"],
+                    outputs="feature_encoder",
+                    name="fit_feature_encoder_node",
+                ),
+            ]
+        )
+
     return pipeline(
-        [
+        ingestion_nodes
+        + [
             node(
-                func=download_data,
+                func=preprocess_data,
                 inputs=[
-                    "params:data_url",
-                    "params:output_directory",
-                    "params:file_name",
+                    "raw_data",
+                    "params:categorical_columns",
+                    "category_mappings",
+                    "params:encoding",
                 ],
-                outputs="raw_data_path",
-                name="download_data_node",
-            ),
-            node(
-                func=load_data,
-                inputs="raw_data_path",
-                outputs="raw_data",
-                name="load_data_node",
-            ),
-            node(
-                func=preprocess_data,
-                inputs=["raw_data", "params:categorical_columns"],
                 outputs="preprocessed_data",
                 name="preprocess_data_node",
             ),
             node(
-                func=split_data,
-                inputs=["preprocessed_data", "params:test_size", "params:random_state"],
+                func=split_indices,
+                inputs=[
+                    "preprocessed_data",
+                    "params:test_size",
+                    "params:random_state",
+                    "params:stratify",
+                ],
+                outputs="split_indices",
+                name="split_indices_node",
+            ),
+            node(
+                func=apply_split,
+                inputs=["preprocessed_data", "split_indices"],
                 outputs=["X_train", "X_test", "y_train", "y_test"],
                 name="split_data_node",
             ),
+            node(
+                func=fit_feature_encoder,
+                inputs=["X_train", "category_mappings", "params:encoding"],
+                outputs="feature_encoder",
+                name="fit_feature_encoder_node",
+            ),
         ]
     )
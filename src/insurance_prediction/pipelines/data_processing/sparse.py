@@ -0,0 +1,68 @@
+"""Sparse feature matrix container."""
+
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+@dataclass
+class SparseFeatures:
+    """A CSR feature matrix together with its column names.
+
+    It exposes the small part of the DataFrame interface the pipeline
+    relies on (``columns``, ``shape``, ``take``), so the index-based split
+    and the feature encoder work on it unchanged.
+    """
+
+    matrix: sparse.csr_matrix
+    feature_names: list[str]
+
+    def __post_init__(self):
+        if self.matrix.shape[1] != len(self.feature_names):
+            raise ValueError(
+                f"Matrix has {self.matrix.shape[1]} columns but "
+                f"{len(self.feature_names)} feature names were given"
+            )
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def columns(self) -> pd.Index:
+        """Feature names as an index, mirroring ``DataFrame.columns``."""
+        return pd.Index(self.feature_names)
+
+    @property
+    def shape(self):
+        """Shape of the feature matrix."""
+        return self.matrix.shape
+
+    def take(self, rows: np.ndarray) -> "SparseFeatures":
+        """Return the features of the given row positions."""
+        return SparseFeatures(self.matrix[rows], self.feature_names)
+
+
+def positive_probabilities(model: Any, X: Any) -> np.ndarray:
+    """Predict the probability of the positive class for a feature set.
+
+    scikit-learn only reads feature names from DataFrames and warns that a
+    bare matrix has none, so ``SparseFeatures`` are checked against the
+    features of the booster and scored by it directly.
+
+    Args:
+        model: Trained ``LGBMClassifier``
+        X: Features, either a DataFrame or ``SparseFeatures``
+
+    Returns:
+        Probability of the positive class of each row
+    """
+    if not isinstance(X, SparseFeatures):
+        return model.predict_proba(X)[:, 1]
+    if X.feature_names != model.booster_.feature_name():
+        raise ValueError(
+            "Sparse features do not match the features the model was trained on"
+        )
+    return model.booster_.predict(X.matrix)
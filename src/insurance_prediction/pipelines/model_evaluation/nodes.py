@@ -1,72 +1,232 @@
 """Model evaluation nodes."""
 
+from __future__ import annotations
+
 from pathlib import Path
-from typing import Dict
+from typing import Any
 
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
+from matplotlib.figure import Figure
 from sklearn.metrics import (
     ConfusionMatrixDisplay,
-    accuracy_score,
-    f1_score,
-    precision_score,
-    recall_score,
+    average_precision_score,
+    brier_score_loss,
+    log_loss,
+    roc_auc_score,
+)
+
+from insurance_prediction.pipelines.data_processing.nodes import (
+    apply_category_mappings,
+)
+from insurance_prediction.pipelines.data_processing.sparse import (
+    positive_probabilities,
 )
 
 
-def evaluate_model(
-    model, X_test: pd.DataFrame, y_test: pd.DataFrame
-) -> Dict[str, float]:
-    """Evaluate model performance on test data.
+def predict_probabilities(
+    model,
+    X_test: pd.DataFrame,
+    category_mappings: dict[str, list[Any]] | None = None,
+) -> pd.DataFrame:
+    """Score the test set once.
+
+    Every evaluation node reads this output instead of running inference
+    again.
 
     Args:
         model: Trained model
         X_test: Test features
-        y_test: Test targets (DataFrame)
+        category_mappings: Categories of the natively encoded columns
 
     Returns:
-        Dictionary of model metrics
+        Frame with the predicted probability of the positive class
     """
+    probabilities = positive_probabilities(
+        model, apply_category_mappings(X_test, category_mappings)
+    )
+    return pd.DataFrame({"probability": probabilities})
 
-    y_test_values = y_test["target"].values
 
-    y_pred = model.predict(X_test)
+def confusion_counts(
+    y_true: np.ndarray, probabilities: np.ndarray, thresholds: np.ndarray
+) -> dict[str, np.ndarray]:
+    """Count the confusion matrix cells at many thresholds at once.
+
+    A row is predicted positive when its probability is above the
+    threshold, as in ``LGBMClassifier.predict``. The probabilities of each
+    class are sorted once and every threshold is located with a binary
+    search, so the cost is ``O((n + t) log n)`` instead of one pass over the
+    rows per threshold.
+
+    Args:
+        y_true: Binary targets
+        probabilities: Predicted probabilities of the positive class
+        thresholds: Thresholds to evaluate
+
+    Returns:
+        Arrays ``tp``, ``fp``, ``tn`` and ``fn`` with one count per threshold
+    """
+    positive = y_true.astype(bool)
+    scores_pos = np.sort(probabilities[positive])
+    scores_neg = np.sort(probabilities[~positive])
+    tp = len(scores_pos) - np.searchsorted(scores_pos, thresholds, side="right")
+    fp = len(scores_neg) - np.searchsorted(scores_neg, thresholds, side="right")
+    return {
+        "tp": tp,
+        "fp": fp,
+        "tn": len(scores_neg) - fp,
+        "fn": len(scores_pos) - tp,
+    }
+
+
+def _threshold_metrics(counts: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    tp, fp, tn, fn = counts["tp"], counts["fp"], counts["tn"], counts["fn"]
+    # Undefined ratios are reported as 0, like scikit-learn's zero_division
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(
+            precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0
+        )
+    return {
+        "accuracy": (tp + tn) / (tp + fp + tn + fn),
+        "precision": precision,
+        "recall": recall,
+        "f1_score": f1,
+    }
+
+
+def evaluate_model(
+    predictions: pd.DataFrame, y_test: pd.DataFrame, threshold: float = 0.5
+) -> dict[str, float]:
+    """Evaluate model performance on test data.
+
+    Args:
+        predictions: Predicted probabilities from ``predict_probabilities``
+        y_test: Test targets (DataFrame)
+        threshold: Probability above which a row is predicted positive
+
+    Returns:
+        Dictionary of model metrics; the ranking metrics are ``None`` when
+        the test set holds a single class
+    """
+    y_test_values = y_test["target"].to_numpy()
+    probabilities = predictions["probability"].to_numpy()
 
-    # Calculate metrics
+    counts = confusion_counts(y_test_values, probabilities, np.array([threshold]))
     metrics = {
-        "accuracy": accuracy_score(y_test_values, y_pred),
-        "precision": precision_score(y_test_values, y_pred),
-        "recall": recall_score(y_test_values, y_pred),
-        "f1_score": f1_score(y_test_values, y_pred),
+        name: float(values[0]) for name, values in _threshold_metrics(counts).items()
     }
 
+    both_classes = len(np.unique(y_test_values)) == 2
+    metrics.update(
+        {
+            "roc_auc": (
+                float(roc_auc_score(y_test_values, probabilities))
+                if both_classes
+                else None
+            ),
+            "pr_auc": (
+                float(average_precision_score(y_test_values, probabilities))
+                if both_classes
+                else None
+            ),
+            "log_loss": float(log_loss(y_test_values, probabilities, labels=[0, 1])),
+            "brier_score": float(brier_score_loss(y_test_values, probabilities)),
+        }
+    )
+
     return metrics
 
 
+def threshold_sweep(
+    predictions: pd.DataFrame, y_test: pd.DataFrame, n_thresholds: int = 101
+) -> pd.DataFrame:
+    """Evaluate the classification metrics over a grid of thresholds.
+
+    Args:
+        predictions: Predicted probabilities from ``predict_probabilities``
+        y_test: Test targets (DataFrame)
+        n_thresholds: Number of evenly spaced thresholds from 0 to 1
+
+    Returns:
+        One row per threshold with the confusion counts and metrics
+    """
+    thresholds = np.linspace(0.0, 1.0, n_thresholds)
+    counts = confusion_counts(
+        y_test["target"].to_numpy(), predictions["probability"].to_numpy(), thresholds
+    )
+    return pd.DataFrame(
+        {"threshold": thresholds, **counts, **_threshold_metrics(counts)}
+    )
+
+
+def calibration_bins(
+    predictions: pd.DataFrame, y_test: pd.DataFrame, n_bins: int = 10
+) -> pd.DataFrame:
+    """Compare predicted and observed positive rates in probability bins.
+
+    Args:
+        predictions: Predicted probabilities from ``predict_probabilities``
+        y_test: Test targets (DataFrame)
+        n_bins: Number of equal-width probability bins
+
+    Returns:
+        One row per bin with its bounds, row count, mean predicted
+        probability and observed positive rate (``NaN`` for empty bins)
+    """
+    probabilities = predictions["probability"].to_numpy()
+    y_test_values = y_test["target"].to_numpy()
+
+    edges = np.linspace(0.0, 1.0, n_bins + 1)
+    bins = np.clip(
+        np.searchsorted(edges, probabilities, side="right") - 1, 0, n_bins - 1
+    )
+    count = np.bincount(bins, minlength=n_bins)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_probability = np.bincount(bins, probabilities, n_bins) / count
+        positive_rate = np.bincount(bins, y_test_values, n_bins) / count
+
+    return pd.DataFrame(
+        {
+            "lower": edges[:-1],
+            "upper": edges[1:],
+            "count": count,
+            "mean_probability": mean_probability,
+            "positive_rate": positive_rate,
+        }
+    )
+
+
 def plot_confusion_matrix(
-    model, X_test: pd.DataFrame, y_test: pd.DataFrame, output_directory: str
+    predictions: pd.DataFrame,
+    y_test: pd.DataFrame,
+    output_directory: str,
+    threshold: float = 0.5,
 ) -> None:
     """Plot and save confusion matrix.
 
     Args:
-        model: Trained model
-        X_test: Test features
+        predictions: Predicted probabilities from ``predict_probabilities``
         y_test: Test targets (DataFrame)
         output_directory: Directory to save the plot
+        threshold: Probability above which a row is predicted positive
     """
 
     y_test_values = y_test["target"].values
 
-    y_pred = model.predict(X_test)
+    y_pred = (predictions["probability"].to_numpy() > threshold).astype(int)
 
     # Create plot directory if it doesn't exist
     plot_dir = Path(output_directory) / "plots"
     plot_dir.mkdir(parents=True, exist_ok=True)
 
-    # Plot confusion matrix
-    plt.figure(figsize=(10, 8))
-    ConfusionMatrixDisplay.from_predictions(y_test_values, y_pred)
-    plt.title("Confusion Matrix")
+    # Plot confusion matrix on a figure of its own rather than pyplot's
+    # global current figure, so the node can run in a ThreadRunner thread
+    figure = Figure(figsize=(10, 8))
+    axes = figure.subplots()
+    ConfusionMatrixDisplay.from_predictions(y_test_values, y_pred, ax=axes)
+    axes.set_title("Confusion Matrix")
 
-    plt.savefig(plot_dir / "confusion_matrix.png", bbox_inches="tight")
-    plt.close()
+    figure.savefig(plot_dir / "confusion_matrix.png", bbox_inches="tight")
@@ -3,14 +3,20 @@
 from kedro.pipeline import Pipeline, node, pipeline
 
 from insurance_prediction.pipelines.model_evaluation.nodes import (
+    calibration_bins,
     evaluate_model,
     plot_confusion_matrix,
+    predict_probabilities,
+    threshold_sweep,
 )
 
 
 def create_pipeline(**kwargs) -> Pipeline:
     """Create the model evaluation pipeline.
 
+    The test set is scored once by ``predict_probabilities_node``; every
+    other node reads the stored probabilities.
+
     Args:
         **kwargs: Ignore any additional arguments added in the future.
 
@@ -19,15 +25,46 @@ def create_pipeline(**kwargs) -> Pipeline:
     """
     return pipeline(
         [
+            node(
+                func=predict_probabilities,
+                inputs=["trained_model", "X_test", "category_mappings"],
+                outputs="test_predictions",
+                name="predict_probabilities_node",
+            ),
             node(
                 func=evaluate_model,
-                inputs=["trained_model", "X_test", "y_test"],
+                inputs=["test_predictions", "y_test", "params:evaluation.threshold"],
                 outputs="model_metrics",
                 name="evaluate_model_node",
             ),
+            node(
+                func=threshold_sweep,
+                inputs=[
+                    "test_predictions",
+                    "y_test",
+                    "params:evaluation.n_thresholds",
+                ],
+                outputs="threshold_sweep",
+                name="threshold_sweep_node",
+            ),
+            node(
+                func=calibration_bins,
+                inputs=[
+                    "test_predictions",
+                    "y_test",
+                    "params:evaluation.n_calibration_bins",
+                ],
+                outputs="calibration_bins",
+                name="calibration_bins_node",
+            ),
             node(
                 func=plot_confusion_matrix,
-                inputs=["trained_model", "X_test", "y_test", "params:output_directory"],
+                inputs=[
+                    "test_predictions",
+                    "y_test",
+                    "params:output_directory",
+                    "params:evaluation.threshold",
+                ],
                 outputs=None,
                 name="plot_confusion_matrix_node",
             ),
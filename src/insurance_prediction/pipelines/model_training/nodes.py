@@ -1,40 +1,89 @@
 """Model training nodes."""
 
-from typing import Any, Dict
+from __future__ import annotations
 
+import tempfile
+import uuid
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, ClassVar
+
+import lightgbm as lgb
+import numpy as np
 import optuna
 import pandas as pd
 from lightgbm import LGBMClassifier
 from optuna.samplers import TPESampler
-from sklearn.metrics import accuracy_score
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import StratifiedKFold, train_test_split
 
+from insurance_prediction.feature_store import DenseFeatures, FeatureStore
+from insurance_prediction.flat_model import FlatModel
+from insurance_prediction.pipelines.data_processing.nodes import apply_category_mappings
+from insurance_prediction.pipelines.data_processing.sparse import SparseFeatures
+from insurance_prediction.pipelines.model_training.tuning import (
+    claim_trial,
+    create_pruner,
+    create_storage,
+    data_fingerprint,
+    data_profile,
+    fidelity_fractions,
+    load_or_create_study,
+    nested_subsamples,
+    optimize_in_parallel,
+    pruning_callback,
+    run_folds,
+    search_space_hash,
+    threads_per_trial,
+)
 
-def objective(trial, X_train, y_train, random_state):
-    """Objective function for Optuna hyperparameter tuning.
+
+def categorical_features(X: pd.DataFrame) -> list[str]:
+    """Return the columns that LightGBM should treat as categorical.
 
     Args:
-        trial: Optuna trial object
-        X_train: Training features
-        y_train: Training targets (DataFrame)
-        random_state: Random seed for reproducibility
+        X: Features
 
     Returns:
-        Accuracy score on validation set
+        Names of the columns with ``category`` dtype
     """
+    return [
+        column
+        for column, dtype in X.dtypes.items()
+        if isinstance(dtype, pd.CategoricalDtype)
+    ]
 
-    X_train_sub, X_val, y_train_sub, y_val = train_test_split(
-        X_train, y_train, test_size=0.2, random_state=random_state
-    )
 
-    # Extract target values as array
-    y_train_values = y_train_sub["target"].values
-    y_val_values = y_val["target"].values
+def lightgbm_inputs(X) -> tuple[Any, dict[str, Any]]:
+    """Return the matrix and extra ``fit`` arguments LightGBM needs for X.
 
-    # Define the hyperparameter search space
-    param = {
-        "objective": "binary",
-        "n_jobs": 1,
+    Args:
+        X: Features, either a DataFrame, ``SparseFeatures``, or a
+            ``FeatureStore`` or rows of one
+
+    Returns:
+        The object to pass as ``X`` and the keyword arguments for ``fit``
+    """
+    if isinstance(X, SparseFeatures):
+        return X.matrix, {"feature_name": X.feature_names}
+    if isinstance(X, (FeatureStore, DenseFeatures)):
+        return X.matrix, {
+            "feature_name": X.feature_names,
+            "categorical_feature": X.categorical_feature,
+        }
+    return X, {"categorical_feature": categorical_features(X)}
+
+
+def suggest_params(trial) -> dict[str, Any]:
+    """Sample the tuned LightGBM hyperparameters for a trial.
+
+    Args:
+        trial: Optuna trial object
+
+    Returns:
+        Hyperparameters of the trial
+    """
+    return {
         "n_estimators": trial.suggest_int("n_estimators", 10, 200),
         "learning_rate": trial.suggest_float("learning_rate", 0.001, 0.3, log=True),
         "max_depth": trial.suggest_int("max_depth", 3, 10),
@@ -44,47 +93,411 @@ def objective(trial, X_train, y_train, random_state):
         "colsample_bytree": trial.suggest_float("colsample_bytree", 0.5, 1.0),
     }
 
-    # Initialize the model with the chosen set of hyperparameters and random_state
-    model = LGBMClassifier(**param, random_state=random_state, verbosity=-1)
 
-    model.fit(X_train_sub, y_train_values)
+class ValidationDatasets:
+    """Binned LightGBM Datasets of the tuning validation folds, built once.
+
+    The validation folds are precomputed as row positions, and the training
+    and validation ``lgb.Dataset`` of each fold are constructed on first use
+    and then shared by every trial run in the process, so the feature
+    histograms are not rebuilt for each trial. Only the source data and the
+    row positions are pickled, which lets each tuning worker build its own
+    Datasets once.
+
+    With several ``fractions``, each fold also gets nested stratified
+    subsamples of its training rows, one per multi-fidelity rung. They are
+    drawn once and taken as subsets of the fold's binned Dataset, so they
+    share its bins and need no binning of their own.
+
+    Binning is fixed by ``DATASET_PARAMS``; tuned parameters must not change
+    how features are binned.
+
+    ``share`` moves dense features to a ``FeatureStore``, which worker
+    processes map instead of each unpickling a copy of the frame. A worker
+    then only holds the rows of the fold being binned, briefly, and the
+    binned Datasets, a byte per value.
+    """
+
+    # Parameters baked into the binned Datasets. ``feature_pre_filter`` is
+    # off so that trials may lower ``min_child_samples`` below the value the
+    # Datasets were built with.
+    DATASET_PARAMS: ClassVar[Mapping[str, Any]] = MappingProxyType(
+        {"max_bin": 255, "feature_pre_filter": False, "verbosity": -1}
+    )
+
+    def __init__(
+        self,
+        X_train,
+        y_train: pd.DataFrame,
+        random_state: int,
+        folds: list[tuple[np.ndarray, np.ndarray]],
+        fractions: Sequence[float] = (1.0,),
+    ):
+        self.X_train = X_train
+        self.y_train = y_train["target"].to_numpy()
+        self.random_state = random_state
+        self.folds = folds
+        self.fractions = list(fractions)
+        # Positions within each fold's training rows of every rung but the last
+        self.subsamples = [
+            nested_subsamples(
+                self.y_train[train_rows], self.fractions[:-1], random_state
+            )
+            for train_rows, _ in folds
+        ]
+        self._datasets: list[tuple[lgb.Dataset, lgb.Dataset]] | None = None
+        self._rungs: dict[int, list[tuple[lgb.Dataset, lgb.Dataset]]] = {}
+
+    @classmethod
+    def holdout(
+        cls,
+        X_train,
+        y_train: pd.DataFrame,
+        random_state: int,
+        test_size: float = 0.2,
+        fractions: Sequence[float] = (1.0,),
+    ) -> ValidationDatasets:
+        """Validate on a single random holdout of ``test_size`` of the rows."""
+        # Split row positions so that dense and sparse features are handled alike
+        train_rows, val_rows = train_test_split(
+            np.arange(X_train.shape[0]), test_size=test_size, random_state=random_state
+        )
+        return cls(X_train, y_train, random_state, [(train_rows, val_rows)], fractions)
+
+    @classmethod
+    def k_fold(
+        cls,
+        X_train,
+        y_train: pd.DataFrame,
+        random_state: int,
+        n_folds: int = 5,
+        fractions: Sequence[float] = (1.0,),
+    ) -> ValidationDatasets:
+        """Validate on ``n_folds`` stratified folds of the rows."""
+        splitter = StratifiedKFold(
+            n_splits=n_folds, shuffle=True, random_state=random_state
+        )
+        target = y_train["target"].to_numpy()
+        folds = list(splitter.split(np.zeros((len(target), 1)), target))
+        return cls(X_train, y_train, random_state, folds, fractions)
+
+    def share(self) -> FeatureStore | None:
+        """Move DataFrame features to a new ``FeatureStore``.
+
+        Returns:
+            The store, to be closed once the workers are done, ``None`` if
+            the features are not a DataFrame
+        """
+        if not isinstance(self.X_train, pd.DataFrame):
+            return None
+        self.X_train = FeatureStore.create(self.X_train)
+        return self.X_train
+
+    def datasets(
+        self, n_jobs: int = 1, rung: int = -1
+    ) -> list[tuple[lgb.Dataset, lgb.Dataset]]:
+        """Return the constructed training and validation Datasets of each fold.
+
+        Args:
+            n_jobs: Number of threads used to bin the features
+            rung: Index in ``fractions`` of the training rows to use, all
+                rows by default
+
+        Returns:
+            For each fold, the training Dataset and the validation Dataset
+            binned like it
+        """
+        rung = rung % len(self.fractions)
+        if rung < len(self.fractions) - 1:
+            if rung not in self._rungs:
+                self._rungs[rung] = [
+                    (train_set.subset(subsamples[rung]).construct(), val_set)
+                    for (train_set, val_set), subsamples in zip(
+                        self.datasets(n_jobs), self.subsamples
+                    )
+                ]
+            return self._rungs[rung]
+
+        if self._datasets is None:
+            params = {
+                **self.DATASET_PARAMS,
+                "seed": self.random_state,
+                "num_threads": n_jobs,
+            }
+            self._datasets = [
+                self._construct(train_rows, val_rows, params)
+                for train_rows, val_rows in self.folds
+            ]
+        return self._datasets
+
+    def _construct(
+        self, train_rows: np.ndarray, val_rows: np.ndarray, params: dict[str, Any]
+    ) -> tuple[lgb.Dataset, lgb.Dataset]:
+        X_fit, fit_kwargs = lightgbm_inputs(self.X_train.take(train_rows))
+        train_set = lgb.Dataset(
+            X_fit, label=self.y_train[train_rows], params=params, **fit_kwargs
+        )
+        val_set = lgb.Dataset(
+            lightgbm_inputs(self.X_train.take(val_rows))[0],
+            label=self.y_train[val_rows],
+            reference=train_set,
+            params=params,
+            **fit_kwargs,
+        )
+        # Bin now, which also releases the row copies taken above
+        return train_set.construct(), val_set.construct()
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_datasets"] = None
+        state["_rungs"] = {}
+        return state
+
+
+def objective(trial, validation, n_jobs=1, early_stopping_rounds=None):
+    """Objective function for Optuna hyperparameter tuning.
+
+    Each validation fold is trained on its own thread, the ``n_jobs``
+    LightGBM threads being shared among the folds, and the trial scores the
+    mean validation accuracy of the folds. With ``early_stopping_rounds``,
+    boosting of each fold stops once its validation log-loss has not
+    improved for that many rounds; the mean best iteration is stored as the
+    ``best_iteration`` user attribute of the trial.
+
+    With a single rung, the validation accuracy of the first fold is
+    reported to the trial after every boosting iteration so that the
+    study's pruner can stop losing trials early, which also stops the other
+    folds. With several rungs (multi-fidelity), the trial is trained on each
+    rung's row subsample in turn and the mean accuracy is reported once per
+    rung, at a step equal to the rung's rows in units of the smallest rung,
+    so that only trials the pruner keeps move on to more rows.
+
+    Args:
+        trial: Optuna trial object
+        validation: ``ValidationDatasets`` of the training data
+        n_jobs: Number of LightGBM threads
+        early_stopping_rounds: Patience of early stopping, disabled if not set
+
+    Returns:
+        Accuracy score on validation set
+    """
+    n_folds = len(validation.folds)
+    n_fold_workers = min(n_folds, n_jobs)
+    multi_fidelity = len(validation.fractions) > 1
+
+    # Define the hyperparameter search space, the scikit-learn names being
+    # aliases of the native LightGBM parameters
+    param = {
+        "objective": "binary",
+        "metric": ["binary_logloss", "binary_error"],
+        "n_jobs": max(1, n_jobs // n_fold_workers),
+        "random_state": validation.random_state,
+        "verbosity": -1,
+        **validation.DATASET_PARAMS,
+        **suggest_params(trial),
+    }
+    n_estimators = param.pop("n_estimators")
+
+    for rung, fraction in enumerate(validation.fractions):
+        folds = validation.datasets(n_jobs, rung)
+
+        def fit_fold(fold, stop_callback, folds=folds):
+            train_set, val_set = folds[fold]
+            callbacks = [stop_callback]
+            if fold == 0 and not multi_fidelity:
+                callbacks.append(pruning_callback(trial))
+            if early_stopping_rounds:
+                callbacks.append(
+                    lgb.early_stopping(
+                        early_stopping_rounds, first_metric_only=True, verbose=False
+                    )
+                )
+            return lgb.train(
+                param,
+                train_set,
+                num_boost_round=n_estimators,
+                valid_sets=[val_set],
+                callbacks=callbacks,
+            )
 
-    y_pred = model.predict(X_val)
+        boosters = run_folds(fit_fold, n_folds, n_fold_workers)
 
-    accuracy = accuracy_score(y_val_values, y_pred)
+        # The validation error of the best iteration, thresholded at 0.5 like
+        # ``LGBMClassifier.predict``
+        accuracy = float(
+            np.mean(
+                [
+                    1.0 - booster.best_score["valid_0"]["binary_error"]
+                    for booster in boosters
+                ]
+            )
+        )
+        if multi_fidelity and fraction < 1.0:
+            trial.report(accuracy, step=round(fraction / validation.fractions[0]))
+            if trial.should_prune():
+                raise optuna.TrialPruned(f"Pruned on {fraction:.0%} of the rows")
+
+    best_iterations = [booster.best_iteration or n_estimators for booster in boosters]
+    trial.set_user_attr("best_iteration", round(np.mean(best_iterations)))
 
     return accuracy
 
 
 def tune_model_hyperparameters(
-    X_train: pd.DataFrame, y_train: pd.DataFrame, n_trials: int, random_state: int
-) -> Dict[str, Any]:
+    X_train: pd.DataFrame,
+    y_train: pd.DataFrame,
+    n_trials: int,
+    random_state: int,
+    category_mappings: dict[str, list[Any]] | None = None,
+    tuning_options: dict[str, Any] | None = None,
+) -> dict[str, Any]:
     """Tune model hyperparameters using Optuna.
 
+    With ``n_workers`` above one, trials run in batches across worker
+    processes that share a journal-file storage; see
+    ``tuning.optimize_in_parallel`` for how the result stays reproducible.
+    Dense features are then shared with the workers through a memory-mapped
+    ``FeatureStore`` rather than copied into each of them.
+
+    With a persistent ``storage``, the study is keyed by the search space and
+    a fingerprint of the data: a crashed run is resumed, an unchanged run
+    does no new trials, and new data warm-starts from the previous best
+    trials.
+
     Args:
         X_train: Training features
         y_train: Training targets (DataFrame)
         n_trials: Number of trials for hyperparameter optimization
         random_state: Random seed for reproducibility
+        category_mappings: Categories of the natively encoded columns
+        tuning_options: Optional settings: ``n_workers`` (processes, default
+            1), ``n_threads`` (LightGBM threads per trial, defaults to the
+            cores divided by ``n_workers``), ``storage`` (path of the
+            Optuna journal file, in-memory for a single worker when unset),
+            ``warm_start_trials`` and ``warm_start_budget`` (see
+            ``tuning.load_or_create_study``), ``pruner`` (``"median"``,
+            ``"successive_halving"`` or unset for none),
+            ``early_stopping_rounds``, ``validation`` (``"holdout"`` or
+            ``"k_fold"``), ``n_folds``, and ``min_subsample`` and
+            ``reduction_factor`` for multi-fidelity tuning on row
+            subsamples (see ``tuning.fidelity_fractions``), which prunes
+            with successive halving unless another pruner is set
 
     Returns:
         Best hyperparameters
     """
+    tuning_options = tuning_options or {}
+    n_workers = tuning_options.get("n_workers") or 1
+    n_jobs = threads_per_trial(n_workers, tuning_options.get("n_threads"))
+    early_stopping_rounds = tuning_options.get("early_stopping_rounds")
+    reduction_factor = tuning_options.get("reduction_factor", 3)
+    fractions = fidelity_fractions(
+        tuning_options.get("min_subsample"), reduction_factor
+    )
+    if len(fractions) > 1:
+        # Steps are rows in units of the smallest rung, one report per rung
+        max_resource = round(fractions[-1] / fractions[0])
+        pruner = create_pruner(
+            tuning_options.get("pruner") or "successive_halving",
+            min_resource=1,
+            max_resource=max_resource,
+            reduction_factor=reduction_factor,
+        )
+    else:
+        pruner = create_pruner(tuning_options.get("pruner"))
+
+    X_train = apply_category_mappings(X_train, category_mappings)
+    validation_settings = {
+        "validation": tuning_options.get("validation", "holdout"),
+        "early_stopping_rounds": early_stopping_rounds,
+    }
+    if len(fractions) > 1:
+        validation_settings["fractions"] = fractions
+    if validation_settings["validation"] == "holdout":
+        validation = ValidationDatasets.holdout(
+            X_train, y_train, random_state, fractions=fractions
+        )
+    elif validation_settings["validation"] == "k_fold":
+        validation_settings["n_folds"] = tuning_options.get("n_folds", 5)
+        validation = ValidationDatasets.k_fold(
+            X_train,
+            y_train,
+            random_state,
+            validation_settings["n_folds"],
+            fractions=fractions,
+        )
+    else:
+        raise ValueError(
+            f"Unknown validation '{validation_settings['validation']}', "
+            "use 'holdout' or 'k_fold'"
+        )
+    objective_args = (validation, n_jobs, early_stopping_rounds)
+
     # Setting the logging level WARNING, the INFO logs are suppressed
     optuna.logging.set_verbosity(optuna.logging.WARNING)
 
-    # Create a seeded sampler for reproducibility
-    sampler = TPESampler(seed=random_state)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage_path = tuning_options.get("storage")
+        persistent = bool(storage_path)
+        if n_workers > 1 and not persistent:
+            storage_path = str(Path(tmp_dir) / "optuna_journal.log")
+        storage = create_storage(storage_path)
 
-    # Create a study object with the seeded sampler and optimize the objective function
-    study = optuna.create_study(direction="maximize", sampler=sampler)
-    study.optimize(
-        lambda trial: objective(trial, X_train, y_train, random_state),
-        n_trials=n_trials,
-    )
+        # Create a seeded sampler for reproducibility
+        sampler = TPESampler(seed=random_state)
+
+        # Create a study object with the seeded sampler and optimize the objective function
+        if persistent:
+            study, n_trials = load_or_create_study(
+                storage,
+                sampler,
+                search_space_hash(suggest_params, validation_settings),
+                data_fingerprint(X_train, y_train),
+                data_profile(X_train, y_train),
+                n_trials,
+                warm_start_trials=tuning_options.get("warm_start_trials", 5),
+                warm_start_budget=tuning_options.get("warm_start_budget", 1.0),
+                pruner=pruner,
+            )
+        else:
+            study = optuna.create_study(
+                direction="maximize",
+                sampler=sampler,
+                pruner=pruner,
+                storage=storage,
+                study_name=f"tune-{uuid.uuid4().hex[:12]}",
+            )
+
+        if n_trials > 0 and n_workers > 1:
+            store = validation.share()
+            try:
+                optimize_in_parallel(
+                    study,
+                    storage_path,
+                    objective,
+                    objective_args,
+                    suggest_params,
+                    n_trials=n_trials,
+                    n_workers=n_workers,
+                    pruner=pruner,
+                )
+            finally:
+                if store is not None:
+                    store.close()
+        elif n_trials > 0:
 
-    # Retrieve the best hyperparameters
-    best_params = study.best_params
+            def run_trial(trial: optuna.Trial) -> float:
+                claim_trial(trial)
+                return objective(trial, *objective_args)
+
+            study.optimize(run_trial, n_trials=n_trials)
+
+        # Retrieve the best hyperparameters, keeping the number of boosting
+        # rounds at which the best trial peaked
+        best_params = study.best_params
+        best_params["n_estimators"] = study.best_trial.user_attrs.get(
+            "best_iteration", best_params["n_estimators"]
+        )
 
     # Add fixed parameters
     best_params.update(
@@ -99,8 +512,9 @@ def tune_model_hyperparameters(
 def train_model(
     X_train: pd.DataFrame,
     y_train: pd.DataFrame,
-    best_params: Dict[str, Any],
+    best_params: dict[str, Any],
     random_state: int,
+    category_mappings: dict[str, list[Any]] | None = None,
 ) -> LGBMClassifier:
     """Train a model with the best hyperparameters.
 
@@ -109,15 +523,34 @@ def train_model(
         y_train: Training targets (DataFrame)
         best_params: Best hyperparameters from tuning
         random_state: Random seed for reproducibility
+        category_mappings: Categories of the natively encoded columns
 
     Returns:
         Trained model
     """
+    X_train = apply_category_mappings(X_train, category_mappings)
+
     # Extract target values as array
     y_train_values = y_train["target"].values
 
     # Train the final model with the best hyperparameters and random_state
     model = LGBMClassifier(**best_params, random_state=random_state, verbosity=-1)
-    model.fit(X_train, y_train_values)
+    X_fit, fit_kwargs = lightgbm_inputs(X_train)
+    model.fit(X_fit, y_train_values, **fit_kwargs)
 
     return model
+
+
+def export_model(model: LGBMClassifier) -> tuple[str, FlatModel]:
+    """Export a trained model in forms that load without scikit-learn.
+
+    Args:
+        model: Trained model
+
+    Returns:
+        The booster in LightGBM's native text model format, which
+        ``lightgbm.Booster(model_file=...)`` loads directly, and the trees
+        flattened into NumPy arrays for ``FlatModel``
+    """
+    booster = model.booster_
+    return booster.model_to_string(), FlatModel.from_dump(booster.dump_model())
@@ -3,6 +3,7 @@
 from kedro.pipeline import Pipeline, node, pipeline
 
 from insurance_prediction.pipelines.model_training.nodes import (
+    export_model,
     train_model,
     tune_model_hyperparameters,
 )
@@ -26,6 +27,8 @@ def create_pipeline(**kwargs) -> Pipeline:
                     "y_train",
                     "params:n_trials",
                     "params:random_state",
+                    "category_mappings",
+                    "params:tuning",
                 ],
                 outputs="best_hyperparameters",
                 name="tune_model_hyperparameters_node",
@@ -37,9 +40,16 @@ def create_pipeline(**kwargs) -> Pipeline:
                     "y_train",
                     "best_hyperparameters",
                     "params:random_state",
+                    "category_mappings",
                 ],
                 outputs="trained_model",
                 name="train_model_node",
             ),
+            node(
+                func=export_model,
+                inputs="trained_model",
+                outputs=["model_booster", "flat_model"],
+                name="export_model_node",
+            ),
         ]
     )
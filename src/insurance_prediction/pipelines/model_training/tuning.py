@@ -0,0 +1,536 @@
+"""Helpers for running Optuna studies across processes."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import socket
+import threading
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import optuna
+import pandas as pd
+from optuna.distributions import distribution_to_json
+from optuna.storages import JournalStorage
+from optuna.storages.journal import JournalFileBackend
+from optuna.trial import TrialState
+
+from insurance_prediction.pipelines.data_processing.sparse import SparseFeatures
+
+logger = logging.getLogger(__name__)
+
+# State of a tuning worker process, set once by ``_init_worker``
+_WORKER: dict[str, Any] = {}
+
+# Largest changes in row count (relative) and target rate (absolute) for
+# which new data counts as a slight drift of the data a study was run on
+MAX_ROW_DRIFT = 0.1
+MAX_TARGET_RATE_DRIFT = 0.01
+
+# Seconds after which a running trial that never recorded its owner counts
+# as left behind by a crash
+UNCLAIMED_TRIAL_TIMEOUT = 60.0
+
+
+def create_storage(path: str | None) -> JournalStorage | None:
+    """Return a journal-file storage at ``path``, or ``None`` for in-memory.
+
+    Journal files are safe to share between processes on one machine and
+    need no database server.
+    """
+    if not path:
+        return None
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    return JournalStorage(JournalFileBackend(str(path)))
+
+
+def threads_per_trial(n_workers: int, n_threads: int | None = None) -> int:
+    """Return the LightGBM thread count of each trial.
+
+    Args:
+        n_workers: Number of trials running at the same time
+        n_threads: Explicit thread count, derived from the cores when not set
+
+    Returns:
+        Number of threads so that all workers together use every core once
+    """
+    if n_threads:
+        return n_threads
+    return max(1, (os.cpu_count() or 1) // n_workers)
+
+
+def create_pruner(
+    name: str | None,
+    min_resource: int = 10,
+    max_resource: Any = "auto",
+    reduction_factor: int = 3,
+) -> optuna.pruners.BasePruner:
+    """Return the Optuna pruner called ``name``.
+
+    Args:
+        name: ``"median"``, ``"successive_halving"``, ``"hyperband"`` or
+            ``None``
+        min_resource: First step at which a trial may be pruned
+        max_resource: Last step of a trial, for ``"hyperband"``
+        reduction_factor: Ratio between the resources of successive rungs
+
+    Returns:
+        The pruner, a ``NopPruner`` when ``name`` is not set
+    """
+    if not name:
+        return optuna.pruners.NopPruner()
+    if name == "median":
+        return optuna.pruners.MedianPruner(
+            n_startup_trials=5, n_warmup_steps=min_resource
+        )
+    if name == "successive_halving":
+        return optuna.pruners.SuccessiveHalvingPruner(
+            min_resource=min_resource, reduction_factor=reduction_factor
+        )
+    if name == "hyperband":
+        return optuna.pruners.HyperbandPruner(
+            min_resource=min_resource,
+            max_resource=max_resource,
+            reduction_factor=reduction_factor,
+        )
+    raise ValueError(
+        f"Unknown pruner '{name}', use 'median', 'successive_halving' or 'hyperband'"
+    )
+
+
+def fidelity_fractions(
+    min_subsample: float | None, reduction_factor: int = 3
+) -> list[float]:
+    """Return the row fractions of the multi-fidelity rungs, smallest first.
+
+    Each rung uses ``reduction_factor`` times the rows of the previous one
+    and the last rung uses every row, the first one using at least
+    ``min_subsample`` of them.
+
+    Args:
+        min_subsample: Smallest fraction of rows, a single full rung if unset
+        reduction_factor: Ratio between the rows of successive rungs
+
+    Returns:
+        Fractions of the rows used by each rung
+    """
+    if not min_subsample or min_subsample >= 1:
+        return [1.0]
+    n_rungs = math.floor(math.log(1 / min_subsample, reduction_factor) + 1e-9)
+    return [reduction_factor ** (rung - n_rungs) for rung in range(n_rungs + 1)]
+
+
+def nested_subsamples(
+    target: np.ndarray, fractions: Sequence[float], random_state: int
+) -> list[np.ndarray]:
+    """Draw nested stratified row subsamples, one per fraction.
+
+    The rows of each class are shuffled once and every subsample takes the
+    first rows of each class, so a subsample contains all smaller ones and
+    keeps the class balance of ``target``.
+
+    Args:
+        target: Class of each row
+        fractions: Fractions of the rows to draw
+        random_state: Random seed of the shuffle
+
+    Returns:
+        Sorted row positions of each subsample
+    """
+    rng = np.random.default_rng(random_state)
+    classes = [rng.permutation(np.flatnonzero(target == c)) for c in np.unique(target)]
+    return [
+        np.sort(
+            np.concatenate(
+                [rows[: max(1, math.ceil(fraction * len(rows)))] for rows in classes]
+            )
+        )
+        for fraction in fractions
+    ]
+
+
+def pruning_callback(trial: optuna.Trial, metric: str = "binary_error") -> Callable:
+    """Return a LightGBM callback reporting validation accuracy to a trial.
+
+    The accuracy (one minus ``metric``) of the first validation set is
+    reported at every iteration, and the trial is pruned as soon as the
+    study's pruner asks for it.
+    """
+
+    def _callback(env) -> None:
+        for _, eval_name, value, *_ in env.evaluation_result_list:
+            if eval_name == metric:
+                trial.report(1.0 - value, step=env.iteration)
+                break
+        if trial.should_prune():
+            raise optuna.TrialPruned(f"Pruned at iteration {env.iteration}")
+
+    # Run after early stopping has looked at the iteration
+    _callback.order = 40
+    return _callback
+
+
+class _FoldStopped(Exception):
+    """Raised inside a fold after another fold of the same trial failed."""
+
+
+def run_folds(
+    fit_fold: Callable[[int, Callable], Any], n_folds: int, n_workers: int
+) -> list[Any]:
+    """Train the validation folds of a trial on a thread pool.
+
+    LightGBM releases the GIL while boosting, so folds train in parallel in
+    one process. ``fit_fold(fold, stop_callback)`` must pass
+    ``stop_callback`` to LightGBM: once a fold raises, for instance when the
+    trial is pruned, the other folds stop at their next iteration and the
+    first such exception is re-raised.
+
+    Args:
+        fit_fold: Function training one fold
+        n_folds: Number of folds
+        n_workers: Number of folds trained at the same time
+
+    Returns:
+        The results of ``fit_fold`` in fold order
+    """
+    stop = threading.Event()
+
+    def stop_callback(env) -> None:
+        if stop.is_set():
+            raise _FoldStopped()
+
+    def run(fold: int) -> Any:
+        try:
+            return fit_fold(fold, stop_callback)
+        except _FoldStopped:
+            raise
+        except BaseException:
+            stop.set()
+            raise
+
+    if n_workers <= 1:
+        return [run(fold) for fold in range(n_folds)]
+
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(run, fold) for fold in range(n_folds)]
+    for future in futures:
+        error = future.exception()
+        if error is not None and not isinstance(error, _FoldStopped):
+            raise error
+    return [future.result() for future in futures]
+
+
+def search_space_hash(
+    suggest: Callable[[optuna.Trial], Any], settings: dict[str, Any]
+) -> str:
+    """Hash the search space of ``suggest`` together with objective settings.
+
+    The distributions are read by running ``suggest`` on a throwaway trial,
+    so any change to the search space yields a new hash.
+    """
+    trial = optuna.create_study().ask()
+    suggest(trial)
+    space = {
+        name: distribution_to_json(distribution)
+        for name, distribution in sorted(trial.distributions.items())
+    }
+    payload = json.dumps({"space": space, "settings": settings}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def data_fingerprint(X, y: pd.DataFrame) -> str:
+    """Hash the content, columns and dtypes of the tuning data."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(column) for column in X.columns]).encode("utf-8"))
+    if isinstance(X, SparseFeatures):
+        for array in (X.matrix.data, X.matrix.indices, X.matrix.indptr):
+            digest.update(np.ascontiguousarray(array).tobytes())
+    else:
+        digest.update(json.dumps([str(dtype) for dtype in X.dtypes]).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(y, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def data_profile(X, y: pd.DataFrame) -> dict[str, Any]:
+    """Summarise the tuning data to judge how far it drifted between runs."""
+    return {
+        "n_rows": int(X.shape[0]),
+        "target_rate": float(y["target"].mean()),
+        "columns": hashlib.sha256(
+            json.dumps([str(column) for column in X.columns]).encode("utf-8")
+        ).hexdigest(),
+    }
+
+
+def is_slight_drift(previous: dict[str, Any], current: dict[str, Any]) -> bool:
+    """Return whether ``current`` data is close to the ``previous`` data."""
+    return (
+        previous.get("columns") == current["columns"]
+        and abs(current["n_rows"] - previous["n_rows"])
+        <= MAX_ROW_DRIFT * previous["n_rows"]
+        and abs(current["target_rate"] - previous["target_rate"])
+        <= MAX_TARGET_RATE_DRIFT
+    )
+
+
+def claim_trial(trial: optuna.Trial) -> None:
+    """Record the host and process running ``trial``, see ``is_orphaned``."""
+    trial.set_user_attr("owner", {"host": socket.gethostname(), "pid": os.getpid()})
+
+
+def is_orphaned(trial: optuna.trial.FrozenTrial) -> bool:
+    """Whether a running trial was left behind by a process that is gone.
+
+    Only processes on this host can be checked, so trials owned by another
+    host, or any trial on Windows, are taken as alive. A trial of the
+    current process is orphaned: studies are loaded before the process
+    starts trials of its own. A trial that never recorded its owner is
+    orphaned once it has been running for ``UNCLAIMED_TRIAL_TIMEOUT``.
+
+    Args:
+        trial: Running trial
+
+    Returns:
+        True if no process is running the trial any more
+    """
+    owner = trial.user_attrs.get("owner")
+    if owner is None:
+        started = trial.datetime_start or datetime.now()
+        return (datetime.now() - started).total_seconds() > UNCLAIMED_TRIAL_TIMEOUT
+    if owner["host"] != socket.gethostname() or os.name == "nt":
+        return False
+    if owner["pid"] == os.getpid():
+        return True
+    try:
+        # Signal 0 only checks that the process exists
+        os.kill(owner["pid"], 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def load_or_create_study(
+    storage: JournalStorage,
+    sampler: optuna.samplers.BaseSampler,
+    space_hash: str,
+    fingerprint: str,
+    profile: dict[str, Any],
+    n_trials: int,
+    warm_start_trials: int = 5,
+    warm_start_budget: float = 1.0,
+    pruner: optuna.pruners.BasePruner | None = None,
+) -> tuple[optuna.Study, int]:
+    """Resume the study of this data and search space, or start a new one.
+
+    Studies are named after the search-space hash and the data fingerprint.
+    An existing study is resumed: running trials whose process is gone (see
+    ``is_orphaned``) are marked failed and retried, trials still run by
+    another process are left to it, and only the missing trials are run. A new
+    study is warm-started with the best trials of the latest study on the
+    same search space; when that study's data only drifted slightly, the
+    budget is cut to ``warm_start_budget`` of ``n_trials``.
+
+    Args:
+        storage: Persistent study storage
+        sampler: Sampler of the study
+        space_hash: Hash of the search space and objective settings
+        fingerprint: Fingerprint of the tuning data
+        profile: Profile of the tuning data
+        n_trials: Trial budget of a study run from scratch
+        warm_start_trials: Number of previous best trials to enqueue
+        warm_start_budget: Fraction of ``n_trials`` run after a slight drift
+        pruner: Pruner of the study
+
+    Returns:
+        The study and the number of trials still to run
+    """
+    study_name = f"tune-{space_hash[:12]}-{fingerprint[:12]}"
+    summaries = optuna.get_all_study_summaries(storage, include_best_trial=False)
+
+    if any(summary.study_name == study_name for summary in summaries):
+        study = optuna.load_study(
+            study_name=study_name, storage=storage, sampler=sampler, pruner=pruner
+        )
+        running = study.get_trials(deepcopy=False, states=(TrialState.RUNNING,))
+        # Only waiting trials count as retries already queued: the failed
+        # trial itself has the same parameters
+        queued = [
+            trial.params
+            for trial in study.get_trials(deepcopy=False, states=(TrialState.WAITING,))
+        ]
+        for trial in running:
+            if is_orphaned(trial):
+                study.tell(trial.number, state=TrialState.FAIL)
+                if trial.params not in queued:
+                    study.enqueue_trial(trial.params)
+                    queued.append(trial.params)
+        running = study.get_trials(deepcopy=False, states=(TrialState.RUNNING,))
+        finished = study.get_trials(
+            deepcopy=False, states=(TrialState.COMPLETE, TrialState.PRUNED)
+        )
+        # Scale a warm-start budget along if the requested trials changed
+        budget = math.ceil(
+            n_trials
+            * study.user_attrs.get("n_trials", n_trials)
+            / study.user_attrs.get("requested_trials", n_trials)
+        )
+        study.set_user_attr("requested_trials", n_trials)
+        study.set_user_attr("n_trials", budget)
+        logger.info("Resuming study '%s' after %d trials", study_name, len(finished))
+        return study, max(0, budget - len(finished) - len(running))
+
+    previous = _latest_study(summaries, space_hash)
+    budget = n_trials
+    study = optuna.create_study(
+        direction="maximize",
+        sampler=sampler,
+        pruner=pruner,
+        storage=storage,
+        study_name=study_name,
+    )
+    study.set_user_attr("space_hash", space_hash)
+    study.set_user_attr("data_profile", profile)
+
+    if previous is not None:
+        for params in _best_params(previous, storage, warm_start_trials):
+            study.enqueue_trial(params)
+        if is_slight_drift(previous.user_attrs.get("data_profile", {}), profile):
+            budget = max(1, math.ceil(n_trials * warm_start_budget))
+        logger.info(
+            "Warm-starting study '%s' from '%s' with %d trials",
+            study_name,
+            previous.study_name,
+            budget,
+        )
+
+    study.set_user_attr("requested_trials", n_trials)
+    study.set_user_attr("n_trials", budget)
+    return study, budget
+
+
+def _latest_study(
+    summaries: list[optuna.study.StudySummary], space_hash: str
+) -> optuna.study.StudySummary | None:
+    candidates = [
+        summary
+        for summary in summaries
+        if summary.user_attrs.get("space_hash") == space_hash
+        and summary.datetime_start is not None
+    ]
+    return max(candidates, key=lambda s: s.datetime_start, default=None)
+
+
+def _best_params(
+    summary: optuna.study.StudySummary, storage: JournalStorage, n_best: int
+) -> list[dict[str, Any]]:
+    study = optuna.load_study(study_name=summary.study_name, storage=storage)
+    completed = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+    completed.sort(key=lambda trial: trial.value, reverse=True)
+    return [trial.params for trial in completed[:n_best]]
+
+
+def optimize_in_parallel(
+    study: optuna.Study,
+    storage_path: str,
+    objective: Callable[..., float],
+    objective_args: Sequence[Any],
+    suggest: Callable[[optuna.Trial], Any],
+    n_trials: int,
+    n_workers: int,
+    pruner: optuna.pruners.BasePruner | None = None,
+) -> None:
+    """Run the trials of a study in batches across worker processes.
+
+    The parameters of every trial in a batch are sampled here, in the parent
+    process, before the batch starts, and results are told back in trial
+    order. The sampler therefore sees the same history whatever the timing
+    of the workers, which keeps a seeded study reproducible. Workers attach
+    to the study through the shared ``storage_path`` so that they can report
+    intermediate values.
+
+    Args:
+        study: Study stored at ``storage_path``
+        storage_path: Path of the journal file backing ``study``
+        objective: Module-level function called as
+            ``objective(trial, *objective_args)`` in the workers
+        objective_args: Extra arguments of ``objective``, sent to each worker
+            once
+        suggest: Function sampling the parameters of a trial
+        n_trials: Number of trials to run
+        n_workers: Number of worker processes
+        pruner: Pruner used by the workers to stop trials early
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(
+            storage_path,
+            study.study_name,
+            objective,
+            tuple(objective_args),
+            pruner,
+        ),
+    ) as executor:
+        remaining = n_trials
+        while remaining > 0:
+            trials = [study.ask() for _ in range(min(n_workers, remaining))]
+            for trial in trials:
+                claim_trial(trial)
+                suggest(trial)
+
+            # Trials are addressed by storage id, which Optuna keeps private
+            results = list(
+                executor.map(_run_trial, [trial._trial_id for trial in trials])
+            )
+
+            errors = []
+            for trial, (state, value) in zip(trials, results):
+                if state == TrialState.FAIL:
+                    errors.append(value)
+                    value = None
+                study.tell(trial, value, state=state)
+            if errors:
+                raise RuntimeError(f"Tuning trial failed: {errors[0]}")
+            remaining -= len(trials)
+
+
+def _init_worker(
+    storage_path: str,
+    study_name: str,
+    objective: Callable[..., float],
+    objective_args: tuple[Any, ...],
+    pruner: optuna.pruners.BasePruner | None,
+) -> None:
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    _WORKER["study"] = optuna.load_study(
+        study_name=study_name, storage=create_storage(storage_path), pruner=pruner
+    )
+    _WORKER["objective"] = objective
+    _WORKER["objective_args"] = objective_args
+
+
+def _run_trial(trial_id: int) -> tuple[TrialState, Any]:
+    trial = optuna.trial.Trial(_WORKER["study"], trial_id)
+    try:
+        value = _WORKER["objective"](trial, *_WORKER["objective_args"])
+    except optuna.TrialPruned:
+        return TrialState.PRUNED, None
+    except Exception as exc:
+        # Reported back to the parent, which fails the trial
+        logger.exception("Trial %d failed", trial.number)
+        return TrialState.FAIL, repr(exc)
+    return TrialState.COMPLETE, value
@@ -0,0 +1,5 @@
+"""Batch scoring pipeline."""
+
+from .pipeline import create_pipeline
+
+__all__ = ["create_pipeline"]
@@ -0,0 +1,223 @@
+"""Batch scoring nodes."""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from insurance_prediction.flat_model import FlatModel
+from insurance_prediction.pipelines.data_processing.encoder import FeatureEncoder
+
+logger = logging.getLogger(__name__)
+
+# State of a scoring worker process, set once by ``_init_worker``
+_WORKER: dict[str, Any] = {}
+
+
+def read_chunks(
+    path: str, chunk_size: int, columns: list[str] | None = None
+) -> Iterator[pd.DataFrame]:
+    """Stream a CSV or Parquet file as frames of at most ``chunk_size`` rows.
+
+    Parquet files are read batch by batch from their row groups and CSV
+    files in chunks of rows, so only one chunk is held in memory at a time.
+
+    Args:
+        path: Path of a ``.csv`` or Parquet file
+        chunk_size: Maximum number of rows per chunk
+        columns: Columns to read, all of them when not given
+
+    Yields:
+        Consecutive chunks of the file
+    """
+    if Path(path).suffix == ".csv":
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size)
+        return
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+        yield batch.to_pandas()
+
+
+def score_chunk(
+    model,
+    encoder: FeatureEncoder,
+    chunk: pd.DataFrame,
+    id_columns: list[str] | None = None,
+    threshold: float = 0.5,
+    n_threads: int | None = None,
+) -> pd.DataFrame:
+    """Encode and score a chunk of raw records.
+
+    Args:
+        model: Trained model, or its ``FlatModel`` export
+        encoder: Feature encoder fitted with the model
+        chunk: Raw records
+        id_columns: Columns of ``chunk`` copied next to the predictions
+        threshold: Probability above which a record is predicted positive
+        n_threads: Number of LightGBM threads, LightGBM's default if not set
+
+    Returns:
+        The id columns, the predicted probability and the predicted class
+    """
+    features = encoder.transform(chunk)
+    if isinstance(model, FlatModel):
+        probability = model.predict(features)
+    else:
+        predict_params = {"num_threads": n_threads} if n_threads else {}
+        probability = model.booster_.predict(features, **predict_params)
+
+    result = chunk[id_columns or []].reset_index(drop=True)
+    result["probability"] = probability
+    result["prediction"] = (probability > threshold).astype(np.int8)
+    return result
+
+
+def score_file(
+    model,
+    encoder: FeatureEncoder,
+    input_path: str,
+    output_path: str,
+    chunk_size: int = 100_000,
+    n_workers: int = 1,
+    id_columns: list[str] | None = None,
+    threshold: float = 0.5,
+) -> dict[str, Any]:
+    """Score a file of raw records too large to load at once.
+
+    The input is streamed in chunks, each chunk is encoded with the fitted
+    ``FeatureEncoder`` and scored, and the predictions are appended to a
+    Parquet file as they come, so memory stays bounded by the chunks in
+    flight. With ``n_workers`` above one, chunks are scored in worker
+    processes that load the model once; at most two chunks per worker are
+    in flight and results are written in input order.
+
+    Args:
+        model: Trained model, or its ``FlatModel`` export
+        encoder: Feature encoder fitted with the model
+        input_path: Raw records to score, CSV or Parquet
+        output_path: Parquet file receiving the predictions
+        chunk_size: Number of rows per chunk
+        n_workers: Number of worker processes
+        id_columns: Input columns copied next to the predictions
+        threshold: Probability above which a record is predicted positive
+
+    Returns:
+        Summary of the run
+    """
+    start = time.perf_counter()
+    id_columns = list(id_columns or [])
+    columns = list(
+        dict.fromkeys(
+            id_columns
+            + list(encoder.numeric_positions)
+            + list(encoder.category_positions)
+        )
+    )
+    chunks = read_chunks(input_path, chunk_size, columns)
+
+    if n_workers > 1:
+        n_threads = max(1, (os.cpu_count() or 1) // n_workers)
+        results = _map_in_workers(
+            chunks,
+            n_workers,
+            (model, encoder, id_columns, threshold, n_threads),
+        )
+    else:
+        results = (
+            score_chunk(model, encoder, chunk, id_columns, threshold)
+            for chunk in chunks
+        )
+
+    n_rows, n_chunks = _write_parquet(results, Path(output_path))
+
+    seconds = time.perf_counter() - start
+    logger.info(
+        "Scored %d rows in %d chunks in %.1fs (%.0f rows/s)",
+        n_rows,
+        n_chunks,
+        seconds,
+        n_rows / seconds if seconds else 0.0,
+    )
+    return {
+        "output_path": str(output_path),
+        "rows": n_rows,
+        "chunks": n_chunks,
+        "seconds": seconds,
+        "rows_per_second": n_rows / seconds if seconds else None,
+    }
+
+
+def _write_parquet(
+    results: Iterable[pd.DataFrame], output_path: Path
+) -> tuple[int, int]:
+    # Write next to the target and move it in place once complete, so a
+    # failed run never leaves a truncated file behind
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(output_path.name + ".part")
+    writer = None
+    n_rows = n_chunks = 0
+    try:
+        for result in results:
+            table = pa.Table.from_pandas(result, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table)
+            n_rows += len(result)
+            n_chunks += 1
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
+    if writer is None:
+        raise ValueError("No records to score")
+    writer.close()
+    os.replace(tmp_path, output_path)
+    return n_rows, n_chunks
+
+
+def _map_in_workers(
+    chunks: Iterable[pd.DataFrame], n_workers: int, worker_args: tuple[Any, ...]
+) -> Iterator[pd.DataFrame]:
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=worker_args,
+    ) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_score_in_worker, chunk))
+            if len(pending) >= 2 * n_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _init_worker(
+    model,
+    encoder: FeatureEncoder,
+    id_columns: list[str],
+    threshold: float,
+    n_threads: int,
+) -> None:
+    _WORKER["model"] = model
+    _WORKER["encoder"] = encoder
+    _WORKER["options"] = (id_columns, threshold, n_threads)
+
+
+def _score_in_worker(chunk: pd.DataFrame) -> pd.DataFrame:
+    return score_chunk(_WORKER["model"], _WORKER["encoder"], chunk, *_WORKER["options"])
@@ -0,0 +1,35 @@
+"""Batch scoring pipeline definition."""
+
+from kedro.pipeline import Pipeline, node, pipeline
+
+from insurance_prediction.pipelines.scoring.nodes import score_file
+
+
+def create_pipeline(**kwargs) -> Pipeline:
+    """Create the batch scoring pipeline.
+
+    Args:
+        **kwargs: Ignore any additional arguments added in the future.
+
+    Returns:
+        A Pipeline object containing the batch scoring node.
+    """
+    return pipeline(
+        [
+            node(
+                func=score_file,
+                inputs=[
+                    "trained_model",
+                    "feature_encoder",
+                    "params:scoring.input_path",
+                    "params:scoring.output_path",
+                    "params:scoring.chunk_size",
+                    "params:scoring.n_workers",
+                    "params:scoring.id_columns",
+                    "params:scoring.threshold",
+                ],
+                outputs="scoring_summary",
+                name="score_file_node",
+            ),
+        ]
+    )
@@ -0,0 +1,117 @@
+"""Wall time, CPU time and memory measurements of a block of code."""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+# ``ru_maxrss`` is in kilobytes on Linux and in bytes on macOS
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def current_rss() -> int | None:
+    """Return the resident set size of this process in bytes, if available."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def max_rss() -> int | None:
+    """Return the peak resident set size of this process so far in bytes.
+
+    Returns:
+        The peak, or None where the ``resource`` module is missing (Windows)
+    """
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT
+
+
+class PeakMemorySampler:
+    """Track the peak resident set size while a block of code runs.
+
+    A daemon thread samples the resident set size every ``interval``
+    seconds, which also catches memory allocated by native libraries such
+    as LightGBM and Arrow. Where the current resident set size cannot be
+    read, the process-wide peak is used instead, so the reported increase
+    is zero unless the block sets a new peak for the process. Where neither
+    can be read, the increase is always zero.
+
+    Args:
+        interval: Seconds between samples
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.start_rss = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> PeakMemorySampler:
+        """Record the starting resident set size and start sampling."""
+        self.start_rss = self._sample()
+        self.peak_rss = self.start_rss
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> int:
+        """Stop sampling and return the peak increase in bytes."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.peak_rss = max(self.peak_rss, self._sample())
+        return self.peak_rss - self.start_rss
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, self._sample())
+
+    @staticmethod
+    def _sample() -> int:
+        rss = current_rss()
+        if rss is None:
+            rss = max_rss()
+        return 0 if rss is None else rss
+
+
+@contextmanager
+def measure(sample_interval: float = 0.005) -> Iterator[dict[str, Any]]:
+    """Measure the wall time, CPU time and peak memory of a block.
+
+    The yielded dictionary is filled in when the block exits with
+    ``wall_seconds``, ``cpu_seconds`` (user and system time of all threads
+    of the process), ``rss_start_bytes`` and ``peak_rss_delta_bytes``.
+
+    Args:
+        sample_interval: Seconds between memory samples
+
+    Yields:
+        Dictionary receiving the measurements
+    """
+    measurements: dict[str, Any] = {}
+    sampler = PeakMemorySampler(sample_interval).start()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield measurements
+    finally:
+        measurements["wall_seconds"] = time.perf_counter() - wall_start
+        measurements["cpu_seconds"] = time.process_time() - cpu_start
+        measurements["peak_rss_delta_bytes"] = sampler.stop()
+        measurements["rss_start_bytes"] = sampler.start_rss
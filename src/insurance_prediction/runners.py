@@ -0,0 +1,468 @@
+"""Kedro runners of the project."""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from kedro.io import MemoryDataset
+from kedro.pipeline import Pipeline
+from kedro.runner import AbstractRunner, ParallelRunner, SequentialRunner, ThreadRunner
+
+from insurance_prediction.datasets import WriteBehindDataset
+
+logger = logging.getLogger(__name__)
+
+# Nodes with this tag run on every incremental run, because their result
+# depends on something outside of their inputs, such as a remote file
+ALWAYS_RUN_TAG = "always_run"
+
+# Bump to invalidate every recorded fingerprint
+_FINGERPRINT_VERSION = "1"
+
+# Runners ``select_runner`` can choose from
+RUNNERS = {
+    "sequential": SequentialRunner,
+    "thread": ThreadRunner,
+    "parallel": ParallelRunner,
+}
+
+
+def _sha256(*parts: str | bytes) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8") if isinstance(part, str) else part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+@functools.cache
+def _package_source_hash(directory: str) -> str:
+    """Hash the source of every module of a package directory."""
+    files = sorted(Path(directory).glob("*.py"))
+    return _sha256(*(part for f in files for part in (f.name, f.read_bytes())))
+
+
+def code_fingerprint(func) -> str:
+    """Hash the code a node function depends on.
+
+    This is the source of the function and of every module of the package
+    defining it, so editing a helper next to a node function reruns the
+    node. Code imported from other packages is not covered.
+
+    Args:
+        func: Node function, possibly wrapped in ``functools.partial``
+
+    Returns:
+        Hash of the code
+    """
+    while isinstance(func, functools.partial):
+        func = func.func
+    module = inspect.getmodule(func)
+    parts = [getattr(func, "__qualname__", repr(func))]
+    try:
+        parts.append(inspect.getsource(func))
+    except (OSError, TypeError):
+        pass
+    if module is not None and getattr(module, "__file__", None):
+        parts.append(_package_source_hash(str(Path(module.__file__).parent)))
+    return _sha256(*parts)
+
+
+def value_fingerprint(value: Any) -> str:
+    """Hash an in-memory value.
+
+    Frames and arrays are hashed by content, JSON-like values by their
+    canonical JSON form and anything else by its pickle. A string naming an
+    existing file also covers the file's content, so a parameter or dataset
+    holding a path changes when the file does.
+
+    Args:
+        value: Value to hash
+
+    Returns:
+        Hash of the value
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return _sha256(
+            repr(value.dtypes if isinstance(value, pd.DataFrame) else value.dtype),
+            pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes(),
+        )
+    if isinstance(value, np.ndarray):
+        return _sha256(str(value.dtype), str(value.shape), value.tobytes())
+    if isinstance(value, str) and len(value) < 4096:
+        try:
+            if Path(value).is_file():
+                return _sha256(value, file_fingerprint(value))
+        except OSError:
+            pass
+    try:
+        return _sha256(json.dumps(value, sort_keys=True))
+    except (TypeError, ValueError):
+        return _sha256(pickle.dumps(value, protocol=4))
+
+
+def file_fingerprint(path: str | Path, cache: dict | None = None) -> str:
+    """Hash the content of a file, or of every file under a directory.
+
+    Args:
+        path: File or directory
+        cache: Hashes by path, reused while the size and modification time
+            of the file are unchanged; updated in place
+
+    Returns:
+        Hash of the content
+    """
+    path = Path(path)
+    files = (
+        sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    )
+    parts = []
+    for file in files:
+        stat = file.stat()
+        key = str(file.resolve())
+        cached = (cache or {}).get(key)
+        if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            sha = cached[2]
+        else:
+            digest = hashlib.sha256()
+            with file.open("rb") as f:
+                for block in iter(lambda: f.read(2**20), b""):
+                    digest.update(block)
+            sha = digest.hexdigest()
+            if cache is not None:
+                cache[key] = [stat.st_size, stat.st_mtime_ns, sha]
+        parts.extend([str(file.relative_to(path)) if path.is_dir() else "", sha])
+    return _sha256(*parts)
+
+
+def pipeline_width(pipeline: Pipeline) -> int:
+    """Return the number of nodes of a pipeline that can run at once.
+
+    This is the size of the largest of ``Pipeline.grouped_nodes``, the
+    groups of nodes whose inputs are all produced by earlier groups.
+
+    Args:
+        pipeline: Pipeline to measure
+
+    Returns:
+        The largest number of independent nodes, 0 for an empty pipeline
+    """
+    return max((len(group) for group in pipeline.grouped_nodes), default=0)
+
+
+def select_runner(
+    pipeline: Pipeline,
+    runner: str = "auto",
+    max_workers: int | None = None,
+    is_async: bool = False,
+) -> AbstractRunner:
+    """Choose the runner of a pipeline from its shape.
+
+    With ``"auto"``, a chain of nodes runs on a ``SequentialRunner`` and a
+    pipeline with independent nodes on a ``ThreadRunner`` with one worker
+    per node that can run at once (see ``pipeline_width``). Threads rather
+    than processes, because the heavy nodes (Arrow, pandas, LightGBM) release
+    the GIL, and the intermediate ``MemoryDataset``s of the catalog, which
+    the ``ParallelRunner`` refuses, are passed without pickling. The
+    ``ParallelRunner`` can be chosen explicitly for pipelines whose
+    intermediate datasets are all persisted.
+
+    With ``is_async`` the sequential and process runners load the inputs
+    and save the outputs of each node in parallel threads, so a node writing
+    several Parquet files writes them at the same time. The ``ThreadRunner``
+    does not support it and needs not: the I/O of a node already overlaps
+    with the nodes running in the other threads.
+
+    Args:
+        pipeline: Pipeline to run
+        runner: ``"auto"``, or one of ``RUNNERS`` to force a runner
+        max_workers: Workers of the thread or process runner, the width of
+            the pipeline if not set
+        is_async: Whether datasets are loaded and saved asynchronously,
+            ignored by the ``ThreadRunner``
+
+    Returns:
+        The runner
+    """
+    width = pipeline_width(pipeline)
+    if runner == "auto":
+        runner = "thread" if width > 1 else "sequential"
+    if runner not in RUNNERS:
+        raise ValueError(
+            f"Unknown runner '{runner}', expected 'auto' or one of {sorted(RUNNERS)}"
+        )
+    if runner == "sequential":
+        return SequentialRunner(is_async=is_async)
+    max_workers = max_workers or max(width, 1)
+    if runner == "thread":
+        return ThreadRunner(max_workers=max_workers)
+    return ParallelRunner(max_workers=max_workers, is_async=is_async)
+
+
+class AutoRunner(SequentialRunner):
+    """Run each pipeline on the runner ``select_runner`` chooses for it.
+
+    The choice is made when the pipeline is run, so it follows the nodes
+    actually run, for example the stale nodes of an ``IncrementalRunner``
+    run or a ``--from-nodes`` slice.
+
+    Args:
+        runner: ``"auto"``, or one of ``RUNNERS`` to force a runner
+        max_workers: Workers of the thread or process runner, the width of
+            the pipeline if not set
+        is_async: Whether datasets are loaded and saved asynchronously
+    """
+
+    def __init__(
+        self,
+        runner: str = "auto",
+        max_workers: int | None = None,
+        is_async: bool = False,
+    ):
+        super().__init__(is_async=is_async)
+        if runner != "auto" and runner not in RUNNERS:
+            raise ValueError(
+                f"Unknown runner '{runner}', expected 'auto' or one of "
+                f"{sorted(RUNNERS)}"
+            )
+        self.runner = runner
+        self.max_workers = max_workers
+
+    def run(
+        self, pipeline: Pipeline, catalog, hook_manager=None, *args, **kwargs
+    ) -> dict[str, Any]:
+        runner = select_runner(pipeline, self.runner, self.max_workers, self._is_async)
+        logger.info(
+            "Running %d node(s) with %s%s",
+            len(pipeline.nodes),
+            type(runner).__name__,
+            " and asynchronous dataset I/O" if runner._is_async else "",
+        )
+        return runner.run(pipeline, catalog, hook_manager, *args, **kwargs)
+
+
+class IncrementalRunner(SequentialRunner):
+    """Run only the nodes whose code, parameters or input data changed.
+
+    Each node is fingerprinted with a hash of its code (see
+    ``code_fingerprint``) and of its inputs: parameters and the outputs of
+    ``always_run`` nodes are hashed by value (see ``value_fingerprint``),
+    persisted datasets by the content of their files, and memory datasets by
+    the fingerprint of the node producing them. A node whose fingerprint
+    matches the one recorded when it last ran, and whose persisted outputs
+    are unchanged since, is skipped and its outputs are read from the
+    catalog by the nodes that need them.
+
+    The run has two stages. Nodes tagged ``always_run``, and the nodes they
+    depend on, run first, because they read from outside the pipeline (the
+    download revalidates the remote file). The remaining nodes are then
+    planned in topological order: a node downstream of a node that runs
+    also runs, since its inputs are not known in advance, and a skipped node
+    producing a memory dataset for a node that runs is run again to
+    provide it. Fingerprints are recorded once the run succeeds, in a JSON
+    manifest which also caches file hashes by size and modification time.
+
+    Args:
+        manifest_path: JSON file recording the fingerprints
+        runner: Runner executing the nodes, an ``AutoRunner`` if not set
+        is_async: Whether the default runner loads and saves asynchronously
+    """
+
+    def __init__(
+        self,
+        manifest_path: str | Path = "data/09_fingerprints/manifest.json",
+        runner: AbstractRunner | None = None,
+        is_async: bool = False,
+    ):
+        super().__init__(is_async=is_async)
+        self.manifest_path = Path(manifest_path)
+        self.runner = runner or AutoRunner(is_async=is_async)
+
+    def run(
+        self, pipeline: Pipeline, catalog, hook_manager=None, *args, **kwargs
+    ) -> dict[str, Any]:
+        manifest = self._read_manifest()
+        outputs: dict[str, Any] = {}
+
+        always_run = pipeline.only_nodes_with_tags(ALWAYS_RUN_TAG)
+        if always_run.nodes:
+            prefix = pipeline.to_nodes(*(node.name for node in always_run.nodes))
+            outputs.update(
+                self.runner.run(prefix, catalog, hook_manager, *args, **kwargs)
+            )
+            pipeline = pipeline - prefix
+            value_hashed = set(prefix.all_outputs())
+        else:
+            value_hashed = set()
+
+        fingerprints = _Fingerprints(pipeline, catalog, manifest["files"], value_hashed)
+        stale = self._plan(pipeline, catalog, manifest["nodes"], fingerprints)
+        skipped = [node.name for node in pipeline.nodes if node.name not in stale]
+        if skipped:
+            logger.info(
+                "Skipping %d unchanged node(s): %s", len(skipped), ", ".join(skipped)
+            )
+        if stale:
+            outputs.update(
+                self.runner.run(
+                    pipeline.only_nodes(*stale), catalog, hook_manager, *args, **kwargs
+                )
+            )
+
+        # Everything is on disk now, so every fingerprint can be computed
+        fingerprints = _Fingerprints(pipeline, catalog, manifest["files"], value_hashed)
+        for node in pipeline.nodes:
+            if node.name in stale:
+                manifest["nodes"][node.name] = {
+                    "fingerprint": fingerprints.node(node),
+                    "outputs": fingerprints.persisted_outputs(node),
+                }
+        self._write_manifest(manifest)
+        return outputs
+
+    def _plan(
+        self,
+        pipeline: Pipeline,
+        catalog,
+        records: dict[str, dict[str, Any]],
+        fingerprints: _Fingerprints,
+    ) -> set[str]:
+        """Return the names of the nodes to run."""
+        stale: set[str] = set()
+        for node in pipeline.nodes:
+            if any(name in fingerprints.unknown for name in node.inputs):
+                stale.add(node.name)
+            else:
+                record = records.get(node.name, {})
+                if record.get("fingerprint") != fingerprints.node(node) or any(
+                    not catalog.exists(name)
+                    or record["outputs"].get(name) != fingerprints.dataset(name)
+                    for name in fingerprints.persisted(node.outputs)
+                ):
+                    stale.add(node.name)
+            if node.name in stale:
+                fingerprints.unknown.update(node.outputs)
+
+        # Skipped nodes do not keep their memory outputs, so rerun the ones
+        # feeding a node that runs
+        for node in reversed(pipeline.nodes):
+            if node.name not in stale:
+                continue
+            for name in node.inputs:
+                producer = fingerprints.producers.get(name)
+                if producer is not None and not fingerprints.is_persisted(name):
+                    stale.add(producer.name)
+        return stale
+
+    def _read_manifest(self) -> dict[str, Any]:
+        if self.manifest_path.exists():
+            manifest = json.loads(self.manifest_path.read_text())
+            if manifest.get("version") == _FINGERPRINT_VERSION:
+                return manifest
+        return {"version": _FINGERPRINT_VERSION, "nodes": {}, "files": {}}
+
+    def _write_manifest(self, manifest: dict[str, Any]) -> None:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + ".part")
+        tmp_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+        os.replace(tmp_path, self.manifest_path)
+
+
+class _Fingerprints:
+    """Fingerprints of the nodes and datasets of one catalog, memoized."""
+
+    def __init__(
+        self,
+        pipeline: Pipeline,
+        catalog,
+        file_cache: dict,
+        value_hashed: Iterable[str] = (),
+    ):
+        self.catalog = catalog
+        self.file_cache = file_cache
+        self.value_hashed = set(value_hashed)
+        self.producers = {
+            name: node for node in pipeline.nodes for name in node.outputs
+        }
+        self.unknown: set[str] = set()
+        self._datasets: dict[str, str] = {}
+        self._nodes: dict[str, str] = {}
+
+    def node(self, node) -> str:
+        if node.name not in self._nodes:
+            self._nodes[node.name] = _sha256(
+                _FINGERPRINT_VERSION,
+                code_fingerprint(node.func),
+                *(part for name in node.inputs for part in (name, self.dataset(name))),
+                *node.outputs,
+            )
+        return self._nodes[node.name]
+
+    def dataset(self, name: str) -> str:
+        if name not in self._datasets:
+            producer = self.producers.get(name)
+            if name.startswith("params:") or name in self.value_hashed:
+                fingerprint = value_fingerprint(self.catalog.load(name))
+            elif not self.is_persisted(name):
+                fingerprint = _sha256(
+                    name,
+                    (
+                        self.node(producer)
+                        if producer is not None
+                        else value_fingerprint(self.catalog.load(name))
+                    ),
+                )
+            elif not self.catalog.exists(name):
+                fingerprint = ""
+            else:
+                path = _local_path(self._get(name))
+                fingerprint = (
+                    file_fingerprint(path, self.file_cache)
+                    if path is not None and path.exists()
+                    else value_fingerprint(self.catalog.load(name))
+                )
+            self._datasets[name] = fingerprint
+        return self._datasets[name]
+
+    def persisted(self, names: Iterable[str]) -> list[str]:
+        return [name for name in names if self.is_persisted(name)]
+
+    def persisted_outputs(self, node) -> dict[str, str]:
+        return {name: self.dataset(name) for name in self.persisted(node.outputs)}
+
+    def is_persisted(self, name: str) -> bool:
+        dataset = self._get(name)
+        if isinstance(dataset, WriteBehindDataset):
+            return dataset.persist
+        return dataset is not None and not isinstance(dataset, MemoryDataset)
+
+    def _get(self, name: str):
+        try:
+            return self.catalog.get(name)
+        except Exception:  # noqa: BLE001 - not a catalog entry
+            return None
+
+
+def _local_path(dataset) -> Path | None:
+    """Return the local file a dataset loads from, if it has one."""
+    if isinstance(dataset, WriteBehindDataset):
+        # Hash the file once it is completely written
+        dataset.flush()
+        dataset = dataset.dataset
+    if getattr(dataset, "_protocol", "file") not in ("file", None):
+        return None
+    if getattr(dataset, "_version", None) is not None:
+        return Path(dataset._get_load_path())
+    filepath = getattr(dataset, "_filepath", None)
+    return Path(filepath) if filepath is not None else None
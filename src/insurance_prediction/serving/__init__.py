@@ -0,0 +1,6 @@
+"""Online scoring service."""
+
+from .app import ScoringApp, load_app
+from .batching import LatencyTracker, MicroBatcher
+
+__all__ = ["LatencyTracker", "MicroBatcher", "ScoringApp", "load_app"]
@@ -0,0 +1,37 @@
+"""Serve online predictions with ``python -m insurance_prediction.serving``."""
+
+import argparse
+
+from insurance_prediction.serving.app import load_app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--project-path", default=".")
+    parser.add_argument("--env", default=None)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    try:
+        import uvicorn
+    except ImportError as exc:
+        raise SystemExit(
+            "Serving requires uvicorn: pip install 'insurance_prediction[serve]'"
+        ) from exc
+
+    app = load_app(
+        args.project_path,
+        args.env,
+        threshold=args.threshold,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+    )
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
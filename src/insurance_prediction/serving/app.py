@@ -0,0 +1,197 @@
+"""ASGI application serving online predictions."""
+
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from insurance_prediction.pipelines.data_processing.encoder import FeatureEncoder
+from insurance_prediction.serving.batching import LatencyTracker, MicroBatcher
+
+
+class ScoringApp:
+    """Minimal ASGI application scoring JSON records with a trained model.
+
+    The model and its fitted ``FeatureEncoder`` are loaded once. Records are
+    encoded with the encoder's precomputed feature positions, and concurrent
+    requests are gathered by a ``MicroBatcher`` so that each batch is encoded
+    and scored with a single call.
+
+    Routes:
+        ``POST /predict``: a record, a list of records or ``{"records": [...]}``;
+        returns the probability and predicted class of each record.
+        ``GET /metrics``: request count, p50/p99 latency and batch sizes.
+        ``GET /health``: liveness check.
+
+    Args:
+        model: Trained model
+        encoder: Feature encoder fitted with the model
+        threshold: Probability above which a record is predicted positive
+        max_batch_size: Maximum number of records per batch
+        max_wait_ms: Longest time a request waits for others to batch with
+    """
+
+    def __init__(
+        self,
+        model,
+        encoder: FeatureEncoder,
+        threshold: float = 0.5,
+        max_batch_size: int = 256,
+        max_wait_ms: float = 2.0,
+    ):
+        self.model = model
+        self.encoder = encoder
+        self.threshold = threshold
+        self.required_columns = list(encoder.numeric_positions) + list(
+            encoder.category_positions
+        )
+        self.batcher = MicroBatcher(self.predict, max_batch_size, max_wait_ms)
+        self.latency = LatencyTracker()
+        self._routes: dict[tuple[str, str], Callable] = {
+            ("POST", "/predict"): self._predict,
+            ("GET", "/metrics"): self._metrics,
+            ("GET", "/health"): self._health,
+        }
+
+    def predict(self, records: list[dict[str, Any]]) -> np.ndarray:
+        """Return the probability of each record, in one model call."""
+        features = self.encoder.transform(
+            pd.DataFrame.from_records(records, columns=self.required_columns)
+        )
+        return self.model.booster_.predict(features)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        start = time.perf_counter()
+        route = self._routes.get((scope["method"], scope["path"]))
+        if route is None:
+            await _respond(send, 404, {"error": "Not found"})
+            return
+        status, body = await route(await _read_body(receive))
+        await _respond(send, status, body)
+        if scope["path"] == "/predict":
+            self.latency.record(time.perf_counter() - start)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self.batcher.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.batcher.stop()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _predict(self, body: bytes) -> tuple[int, dict[str, Any]]:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return 400, {"error": "Body is not valid JSON"}
+        records = payload.get("records") if isinstance(payload, dict) else payload
+        if records is None:
+            records = [payload]
+        if not isinstance(records, list) or not all(
+            isinstance(record, dict) for record in records
+        ):
+            return 400, {"error": "Expected a record or a list of records"}
+        missing = sorted(
+            {
+                column
+                for record in records
+                for column in self.required_columns
+                if column not in record
+            }
+        )
+        if missing:
+            return 422, {"error": f"Missing fields {missing}"}
+        if not records:
+            return 200, {"probabilities": [], "predictions": []}
+
+        try:
+            probabilities = await self.batcher.submit(records)
+        except (ValueError, TypeError) as exc:
+            return 422, {"error": str(exc)}
+        return 200, {
+            "probabilities": probabilities.tolist(),
+            "predictions": (probabilities > self.threshold).astype(int).tolist(),
+        }
+
+    async def _metrics(self, body: bytes) -> tuple[int, dict[str, Any]]:
+        return 200, {**self.latency.summary(), **self.batcher.summary()}
+
+    async def _health(self, body: bytes) -> tuple[int, dict[str, Any]]:
+        return 200, {"status": "ok"}
+
+
+def load_app(
+    project_path: str | None = None, env: str | None = None, **kwargs
+) -> ScoringApp:
+    """Build a ``ScoringApp`` from the latest ``trained_model`` and encoder.
+
+    The artifacts are loaded through the project's Data Catalog, so
+    versioned datasets resolve to their latest version, without running a
+    Kedro session.
+
+    Args:
+        project_path: Root of the Kedro project, the current directory if
+            not set; relative catalog paths are resolved against it
+        env: Configuration environment overriding ``base``
+        **kwargs: Options of ``ScoringApp``
+
+    Returns:
+        The application, ready to be served by any ASGI server
+    """
+    from kedro.config import OmegaConfigLoader
+    from kedro.io import DataCatalog
+
+    project_path = Path(project_path or ".").resolve()
+    loader = OmegaConfigLoader(
+        str(project_path / "conf"), base_env="base", default_run_env=env or "local"
+    )
+    catalog_config = {
+        name: {
+            **config,
+            "filepath": str(project_path / config["filepath"]),
+        }
+        for name, config in loader["catalog"].items()
+        if name in ("trained_model", "feature_encoder")
+    }
+    catalog = DataCatalog.from_config(catalog_config)
+    return ScoringApp(
+        catalog.load("trained_model"), catalog.load("feature_encoder"), **kwargs
+    )
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _respond(send, status: int, body: dict[str, Any]) -> None:
+    payload = json.dumps(body).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(payload)).encode("ascii")),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": payload})
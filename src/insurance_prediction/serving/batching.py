@@ -0,0 +1,169 @@
+"""Micro-batching of concurrent scoring requests."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Records = list[dict[str, Any]]
+
+
+class LatencyTracker:
+    """Keep the latest request latencies and report their percentiles."""
+
+    def __init__(self, window: int = 10_000):
+        self._latencies = deque(maxlen=window)
+        self.requests = 0
+
+    def record(self, seconds: float) -> None:
+        """Record the latency of one request."""
+        self._latencies.append(seconds)
+        self.requests += 1
+
+    def summary(self) -> dict[str, float | None]:
+        """Return the request count and the p50/p99 latency in milliseconds."""
+        if not self._latencies:
+            return {"requests": self.requests, "p50_ms": None, "p99_ms": None}
+        p50, p99 = np.percentile(np.fromiter(self._latencies, float), [50, 99])
+        return {
+            "requests": self.requests,
+            "p50_ms": float(p50) * 1000,
+            "p99_ms": float(p99) * 1000,
+        }
+
+
+class MicroBatcher:
+    """Gather concurrent requests into batches scored by a single call.
+
+    Requests wait in a queue; a background task takes the first waiting
+    request, keeps collecting others until ``max_batch_size`` records are
+    gathered or ``max_wait_ms`` has passed, and scores all of them with one
+    call to ``predict`` on a worker thread, so the event loop keeps
+    accepting requests meanwhile. If a batch fails, its requests are scored
+    one by one so that a bad record only fails its own request.
+
+    Args:
+        predict: Function scoring a list of records, returning one
+            probability per record
+        max_batch_size: Maximum number of records per batch
+        max_wait_ms: Longest time the first request of a batch waits for
+            others
+    """
+
+    def __init__(
+        self,
+        predict: Callable[[Records], np.ndarray],
+        max_batch_size: int = 256,
+        max_wait_ms: float = 2.0,
+    ):
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.batched_records = 0
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """Start the batching task on the running event loop."""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the batching task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, records: Records) -> np.ndarray:
+        """Score records as part of the next batch.
+
+        Args:
+            records: Raw records of one request
+
+        Returns:
+            Probability of each record
+        """
+        await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((records, future))
+        return await future
+
+    def summary(self) -> dict[str, float]:
+        """Return the number of batches and their mean size in records."""
+        return {
+            "batches": self.batches,
+            "mean_batch_size": (
+                self.batched_records / self.batches if self.batches else 0.0
+            ),
+        }
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            await loop.run_in_executor(None, self._score, batch)
+            self.batches += 1
+            self.batched_records += size
+
+    def _score(self, batch: list[tuple[Records, asyncio.Future]]) -> None:
+        loop = batch[0][1].get_loop()
+        records = [record for request, _ in batch for record in request]
+        try:
+            results = self._split(self.predict(records), batch)
+        except Exception:  # noqa: BLE001 - retried request by request below
+            logger.warning(
+                "Batch of %d records failed, retrying per request", len(records)
+            )
+            results = []
+            for request, _ in batch:
+                try:
+                    results.append(self.predict(request))
+                except Exception as exc:  # noqa: BLE001 - sent to the request
+                    results.append(exc)
+
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                loop.call_soon_threadsafe(_set_exception, future, result)
+            else:
+                loop.call_soon_threadsafe(_set_result, future, result)
+
+    @staticmethod
+    def _split(
+        probabilities: np.ndarray, batch: list[tuple[Records, asyncio.Future]]
+    ) -> list[np.ndarray]:
+        bounds = np.cumsum([len(request) for request, _ in batch])[:-1]
+        return np.split(np.asarray(probabilities), bounds)
+
+
+def _set_result(future: asyncio.Future, result: Any) -> None:
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, exc: Exception) -> None:
+    if not future.done():
+        future.set_exception(exc)
@@ -5,6 +5,7 @@ from kedro.pipeline import Pipeline
 from insurance_prediction.pipelines import data_processing as dp
 from insurance_prediction.pipelines import model_evaluation as me
 from insurance_prediction.pipelines import model_training as mt
+from insurance_prediction.pipelines import scoring as sc
 
 
 class TestPipelines:
@@ -19,8 +20,11 @@ class TestPipelines:
         expected_nodes = [
             "download_data_node",
             "load_data_node",
+            "fit_category_mappings_node",
             "preprocess_data_node",
+            "split_indices_node",
             "split_data_node",
+            "fit_feature_encoder_node",
         ]
         node_names = [node.name for node in pipeline.nodes]
 
@@ -33,7 +37,11 @@ class TestPipelines:
         assert isinstance(pipeline, Pipeline)
 
         # Check that the pipeline has the expected nodes
-        expected_nodes = ["tune_model_hyperparameters_node", "train_model_node"]
+        expected_nodes = [
+            "tune_model_hyperparameters_node",
+            "train_model_node",
+            "export_model_node",
+        ]
         node_names = [node.name for node in pipeline.nodes]
 
         for expected_node in expected_nodes:
@@ -45,8 +53,22 @@ class TestPipelines:
         assert isinstance(pipeline, Pipeline)
 
         # Check that the pipeline has the expected nodes
-        expected_nodes = ["evaluate_model_node", "plot_confusion_matrix_node"]
+        expected_nodes = [
+            "predict_probabilities_node",
+            "evaluate_model_node",
+            "threshold_sweep_node",
+            "calibration_bins_node",
+            "plot_confusion_matrix_node",
+        ]
         node_names = [node.name for node in pipeline.nodes]
 
         for expected_node in expected_nodes:
             assert expected_node in node_names
+
+    def test_scoring_pipeline_creation(self):
+        """Test that the batch scoring pipeline can be created."""
+        pipeline = sc.create_pipeline()
+        assert isinstance(pipeline, Pipeline)
+
+        node_names = [node.name for node in pipeline.nodes]
+        assert "score_file_node" in node_names
@@ -0,0 +1,117 @@
+"""Unit tests for the benchmark harness."""
+
+import time
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from insurance_prediction import profiling
+from insurance_prediction.benchmark import (
+    STEPS,
+    compare_results,
+    make_policies,
+    run_benchmark,
+    write_policies,
+)
+from insurance_prediction.benchmark.synthetic import FACTOR_LEVELS
+from insurance_prediction.pipelines.data_processing.nodes import (
+    DROPPED_COLUMNS,
+    load_data,
+)
+from insurance_prediction.profiling import measure
+
+PARAMETERS_PATH = Path(__file__).parents[3] / "conf" / "base" / "parameters.yml"
+
+
+def test_synthetic_policies_match_the_raw_data(tmp_path):
+    """Test that the synthetic file loads like the downloaded data."""
+    path = write_policies(tmp_path / "policies.parquet", 250, chunk_rows=100)
+    parameters = yaml.safe_load(PARAMETERS_PATH.read_text())
+
+    data = load_data(str(path))
+
+    assert len(data) == 250
+    assert data["PolNum"].is_unique
+    assert list(data.columns) == list(make_policies(1).columns)
+    assert set(data.columns) == set(parameters["categorical_columns"]) | {
+        "PolNum",
+        "Age",
+        "Bonus",
+        "Poldur",
+        "Value",
+        "Adind",
+        "Density",
+        "Exppdays",
+        *DROPPED_COLUMNS,
+    }
+    for column, levels in FACTOR_LEVELS.items():
+        assert list(data[column].cat.categories) == levels
+    assert 0 < data["Numtppd"].gt(0).mean() < 0.5
+    # Every subgroup lies within its Group2 level
+    assert (data["SubGroup2"].astype(str).str[0] == data["Group2"].astype(str)).all()
+
+
+def test_run_benchmark_measures_each_step(tmp_path):
+    """Test that every step of the run is timed and memory-profiled."""
+    results = run_benchmark(2_000, str(tmp_path), {"encoding": "native"})
+
+    assert [result["step"] for result in results] == list(STEPS)
+    for result in results:
+        assert result["rows"] == 2_000
+        assert result["wall_seconds"] > 0
+        assert result["cpu_seconds"] >= 0
+        assert isinstance(result["peak_rss_delta_bytes"], int)
+    assert (tmp_path / "policies_2000_0.parquet").exists()
+
+
+def test_compare_results_flags_slow_steps():
+    """Test that only meaningful slow-downs count as regressions."""
+    baseline = {
+        "results": [
+            {"step": "load_data", "rows": 10, "wall_seconds": 1.0},
+            {"step": "train_model", "rows": 10, "wall_seconds": 1.0},
+            {"step": "evaluate_model", "rows": 10, "wall_seconds": 0.001},
+        ]
+    }
+    current = {
+        "results": [
+            {"step": "load_data", "rows": 10, "wall_seconds": 1.05},
+            {"step": "train_model", "rows": 10, "wall_seconds": 2.0},
+            {"step": "evaluate_model", "rows": 10, "wall_seconds": 0.01},
+        ]
+    }
+    for suite in (baseline, current):
+        for result in suite["results"]:
+            result["peak_rss_delta_bytes"] = 0
+
+    rows = compare_results(baseline, current, tolerance=0.1)
+
+    assert {row["step"]: row["regression"] for row in rows} == {
+        "load_data": False,
+        "train_model": True,
+        "evaluate_model": False,
+    }
+
+
+def test_measure_records_time_and_memory():
+    """Test that a block's allocations show up in its peak memory."""
+    with measure() as measurements:
+        block = np.ones(50 * 2**20 // 8)
+        time.sleep(0.02)
+        del block
+
+    assert measurements["wall_seconds"] >= 0.02
+    assert measurements["peak_rss_delta_bytes"] > 40 * 2**20
+
+
+def test_measure_without_resource_module(monkeypatch):
+    """Test that measuring works where neither RSS can be read (Windows)."""
+    monkeypatch.setattr(profiling, "resource", None)
+    monkeypatch.setattr(profiling, "current_rss", lambda: None)
+
+    with measure() as measurements:
+        pass
+
+    assert profiling.max_rss() is None
+    assert measurements["peak_rss_delta_bytes"] == 0
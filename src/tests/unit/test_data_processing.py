@@ -1,13 +1,160 @@
 """Unit tests for data processing nodes."""
 
+import hashlib
+import pickle
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+import rdata
+from sklearn.model_selection import train_test_split
 
+from insurance_prediction.pipelines.data_processing import nodes
+from insurance_prediction.pipelines.data_processing.chunked import (
+    preprocess_split_chunked,
+    scan_raw_data,
+)
 from insurance_prediction.pipelines.data_processing.nodes import (
+    build_sparse_features,
+    download_data,
+    fit_category_mappings,
+    fit_feature_encoder,
+    load_data,
     preprocess_data,
     split_data,
+    split_indices,
+    split_sparse_data,
 )
 
 
+def _write_rda(path, frame):
+    rdata.write_rda(str(path), {"pg15training": frame})
+    return path.read_bytes()
+
+
+@pytest.fixture
+def rda_server(tmp_path):
+    """Serve an .rda file over HTTP with ETag revalidation."""
+    state = {
+        "body": _write_rda(
+            tmp_path / "v1.rda",
+            pd.DataFrame({"Numtppd": [0, 1], "Gender": pd.Categorical(["M", "F"])}),
+        ),
+        "requests": 0,
+        "not_modified": 0,
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["requests"] += 1
+            etag = '"' + hashlib.sha256(state["body"]).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                state["not_modified"] += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(state["body"])))
+            self.end_headers()
+            self.wfile.write(state["body"])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state["url"] = f"http://127.0.0.1:{server.server_port}/pg15training.rda"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+class TestDownloadData:
+    """Test class for the cached download node."""
+
+    def test_cache_hit_skips_parse(self, rda_server, tmp_path, monkeypatch):
+        """A revalidated cache hit must not parse or rewrite the output."""
+        options = {"directory": str(tmp_path / "cache")}
+        out_dir = str(tmp_path / "raw")
+
+        path = download_data(rda_server["url"], out_dir, "data.parquet", options)
+        assert load_data(path)["Numtppd"].tolist() == [0, 1]
+
+        parses = []
+        monkeypatch.setattr(
+            nodes.rdata, "read_rda", lambda *a, **k: parses.append(a) or {}
+        )
+        assert (
+            download_data(rda_server["url"], out_dir, "data.parquet", options) == path
+        )
+        assert rda_server["not_modified"] == 1
+        assert parses == []
+
+    def test_changed_content_is_reparsed(self, rda_server, tmp_path):
+        """New content behind the same URL is downloaded and re-parsed."""
+        options = {"directory": str(tmp_path / "cache")}
+        out_dir = str(tmp_path / "raw")
+        download_data(rda_server["url"], out_dir, "data.parquet", options)
+
+        rda_server["body"] = _write_rda(
+            tmp_path / "v2.rda",
+            pd.DataFrame({"Numtppd": [3, 0, 1], "Gender": pd.Categorical(list("MFM"))}),
+        )
+        path = download_data(rda_server["url"], out_dir, "data.parquet", options)
+
+        assert load_data(path)["Numtppd"].tolist() == [3, 0, 1]
+
+    def test_raw_data_keeps_factor_levels(self, rda_server, tmp_path):
+        """Factors are stored dictionary-encoded and load back as categories."""
+        rda_server["body"] = _write_rda(
+            tmp_path / "levels.rda",
+            pd.DataFrame(
+                {
+                    "Numtppd": [0, 1],
+                    "Gender": pd.Categorical(["M", "M"], categories=["F", "M"]),
+                }
+            ),
+        )
+        path = download_data(
+            rda_server["url"],
+            str(tmp_path / "raw"),
+            "data.parquet",
+            {"directory": str(tmp_path / "cache")},
+        )
+
+        schema = pq.read_schema(path)
+        assert pa.types.is_dictionary(schema.field("Gender").type)
+        assert schema.field("Numtppd").type == pa.int32()
+
+        data = load_data(path)
+        assert isinstance(data["Gender"].dtype, pd.CategoricalDtype)
+        assert data["Gender"].cat.categories.tolist() == ["F", "M"]
+
+    def test_offline_mode(self, rda_server, tmp_path):
+        """Offline mode serves from the cache and fails without one."""
+        options = {"directory": str(tmp_path / "cache"), "offline": True}
+        out_dir = str(tmp_path / "raw")
+        with pytest.raises(RuntimeError, match="offline"):
+            download_data(rda_server["url"], out_dir, "data.parquet", options)
+
+        download_data(
+            rda_server["url"], out_dir, "data.parquet", {**options, "offline": False}
+        )
+        requests_before = rda_server["requests"]
+        download_data(rda_server["url"], out_dir, "other.parquet", options)
+
+        assert rda_server["requests"] == requests_before
+        assert load_data(str(tmp_path / "raw" / "other.parquet"))[
+            "Numtppd"
+        ].tolist() == [0, 1]
+
+
 class TestDataProcessing:
     """Test class for data processing nodes."""
 
@@ -50,6 +197,44 @@ class TestDataProcessing:
         # Check target values
         assert result["target"].tolist() == [0, 1, 1, 0]
 
+    def test_preprocess_data_compact_and_pure(self):
+        """Test dtypes of the preprocessed data and that the input is untouched."""
+        original = self.data.copy()
+
+        result = preprocess_data(self.data, ["Gender", "CalYear"])
+
+        pd.testing.assert_frame_equal(self.data, original)
+        assert result["target"].dtype == "uint8"
+        assert result["Age"].dtype == "int8"
+        assert (result.filter(like="Gender_").dtypes == "uint8").all()
+        assert list(result.columns[:2]) == ["Age", "target"]
+
+    def test_preprocess_data_native_encoding(self):
+        """Test that native encoding keeps stable category columns."""
+        mappings = fit_category_mappings(self.data, ["Gender", "CalYear"])
+        mappings["CalYear"].append(2022)
+
+        result = preprocess_data(
+            self.data, ["Gender", "CalYear"], mappings, encoding="native"
+        )
+
+        assert mappings["Gender"] == ["F", "M"]
+        assert isinstance(result["CalYear"].dtype, pd.CategoricalDtype)
+        assert result["CalYear"].cat.categories.tolist() == [2020, 2021, 2022]
+        assert not any(column.startswith("Gender_") for column in result.columns)
+
+    def test_preprocess_data_uses_mappings_for_dummies(self):
+        """Test that one-hot columns follow the mappings, not the batch."""
+        mappings = {"Gender": ["F", "M", "X"], "CalYear": [2020, 2021]}
+
+        result = preprocess_data(self.data.iloc[:1], ["Gender", "CalYear"], mappings)
+
+        assert result.filter(like="Gender_").columns.tolist() == [
+            "Gender_F",
+            "Gender_M",
+            "Gender_X",
+        ]
+
     def test_split_data(self):
         """Test the split_data function."""
         # Prepare test data with target column
@@ -79,3 +264,284 @@ class TestDataProcessing:
         # Check that other columns are in X
         assert "feature1" in X_train.columns
         assert "feature2" in X_train.columns
+
+
+class TestSplitIndices:
+    """Test class for the index-based split."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.data = pd.DataFrame(
+            {
+                "feature1": np.arange(20),
+                "feature2": np.arange(20, 0, -1).astype("uint8"),
+                "feature3": pd.Categorical(["a", "b"] * 10),
+                "target": [0, 0, 0, 1] * 5,
+            },
+            index=np.arange(100, 120),
+        )
+
+    def test_split_indices_stratified(self):
+        """Test that the stratified split keeps the target ratio."""
+        indices = split_indices(
+            self.data, test_size=0.4, random_state=42, stratify=True
+        )
+
+        assert sorted(np.concatenate([indices["train"], indices["test"]])) == list(
+            range(20)
+        )
+        assert self.data["target"].to_numpy()[indices["test"]].sum() == 2
+        assert self.data["target"].to_numpy()[indices["train"]].sum() == 3
+
+    def test_split_data_matches_train_test_split(self):
+        """Test that the single-copy split returns the usual frames."""
+        X_train, X_test, y_train, y_test = split_data(
+            self.data, test_size=0.4, random_state=42
+        )
+
+        expected = train_test_split(
+            self.data.drop(columns="target"),
+            self.data["target"],
+            test_size=0.4,
+            random_state=42,
+        )
+        pd.testing.assert_frame_equal(X_train, expected[0])
+        pd.testing.assert_frame_equal(X_test, expected[1])
+        pd.testing.assert_frame_equal(y_train, expected[2].to_frame())
+        pd.testing.assert_frame_equal(y_test, expected[3].to_frame())
+
+
+class TestFeatureEncoder:
+    """Test class for the fitted feature encoder."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.data = pd.DataFrame(
+            {
+                "Numtppd": [0, 1, 2, 0],
+                "Numtpbi": [0, 0, 1, 1],
+                "Indtppd": [0, 1, 1, 0],
+                "Indtpbi": [0, 0, 1, 1],
+                "Age": [25, 30, 45, 50],
+                "Gender": ["M", "F", "M", "F"],
+                "CalYear": [2020, 2020, 2021, 2021],
+            }
+        )
+        self.categorical_columns = ["Gender", "CalYear"]
+        self.mappings = fit_category_mappings(self.data, self.categorical_columns)
+
+    def _features(self, data, encoding):
+        preprocessed = preprocess_data(
+            data, self.categorical_columns, self.mappings, encoding
+        )
+        return preprocessed.drop(columns="target")
+
+    def test_transform_matches_preprocess_data(self):
+        """Test that a single-level batch encodes like the training data."""
+        X = self._features(self.data, "one_hot")
+        encoder = fit_feature_encoder(X, self.mappings, "one_hot")
+        batch = self.data.iloc[[1]]
+
+        result = encoder.transform(batch)
+
+        expected = self._features(batch, "one_hot")
+        assert encoder.feature_names == X.columns.tolist()
+        np.testing.assert_array_equal(result, expected.to_numpy(dtype=float))
+
+    def test_transform_unseen_categories(self):
+        """Test unseen categories in both encodings."""
+        batch = self.data.assign(Gender=["X", "F", "M", "X"])
+
+        one_hot = fit_feature_encoder(
+            self._features(self.data, "one_hot"), self.mappings, "one_hot"
+        ).transform_frame(batch)
+        native = fit_feature_encoder(
+            self._features(self.data, "native"), self.mappings, "native"
+        ).transform_frame(batch)
+
+        assert one_hot[["Gender_F", "Gender_M"]].sum(axis=1).tolist() == [0, 1, 1, 0]
+        assert native["Gender"].isna().tolist() == [True, False, False, True]
+        assert native["CalYear"].tolist() == [0, 0, 1, 1]
+
+    def test_transform_into_preallocated_array(self):
+        """Test that the encoder survives pickling and fills ``out`` in place."""
+        X = self._features(self.data, "one_hot")
+        encoder = pickle.loads(
+            pickle.dumps(fit_feature_encoder(X, self.mappings, "one_hot"))
+        )
+        out = np.full((len(self.data), X.shape[1]), -1.0)
+
+        result = encoder.transform(self.data, out=out)
+
+        assert result is out
+        np.testing.assert_array_equal(out, X.to_numpy(dtype=float))
+
+
+class TestSparseFeatures:
+    """Test class for the sparse feature path."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.data = pd.DataFrame(
+            {
+                "Numtppd": [0, 1, 2, 0, 1],
+                "Numtpbi": [0, 0, 1, 1, 0],
+                "Indtppd": [0, 1, 1, 0, 1],
+                "Indtpbi": [0, 0, 1, 1, 0],
+                "Age": [25, 0, 45, 50, np.nan],
+                "Gender": ["M", "F", "M", "F", "F"],
+                "CalYear": [2020, 2020, 2021, 2021, 2020],
+            }
+        )
+        self.categorical_columns = ["Gender", "CalYear"]
+
+    def test_build_sparse_features_matches_dense(self):
+        """Test that the sparse matrix equals the dense one-hot features."""
+        features, target = build_sparse_features(self.data, self.categorical_columns)
+
+        dense = preprocess_data(self.data, self.categorical_columns)
+        assert features.feature_names == dense.drop(columns="target").columns.tolist()
+        np.testing.assert_array_equal(
+            features.matrix.toarray(),
+            dense.drop(columns="target").to_numpy(dtype=float),
+        )
+        assert target["target"].tolist() == dense["target"].tolist()
+        # Two stored categories per row plus the non-zero ages (NaN included)
+        assert features.matrix.nnz == 2 * len(self.data) + 4
+
+    def test_split_sparse_data_selects_same_rows(self):
+        """Test that the sparse split picks the same rows as split_data."""
+        features, target = build_sparse_features(self.data, self.categorical_columns)
+        dense = preprocess_data(self.data, self.categorical_columns)
+
+        X_train, _, _, y_test = split_sparse_data(
+            features, target, split_indices(target, test_size=0.4, random_state=42)
+        )
+        dense_split = split_data(dense, test_size=0.4, random_state=42)
+
+        np.testing.assert_array_equal(
+            X_train.matrix.toarray(), dense_split[0].to_numpy(dtype=float)
+        )
+        assert y_test.index.tolist() == dense_split[3].index.tolist()
+
+
+class TestChunkedPreprocessing:
+    """Test class for the out-of-core preprocessing path."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        rng = np.random.default_rng(0)
+        n = 503
+        self.data = pd.DataFrame(
+            {
+                "Numtppd": rng.poisson(0.3, n),
+                "Numtpbi": rng.poisson(0.1, n),
+                "Gender": pd.Categorical(
+                    rng.choice(["M", "F"], n), categories=["M", "F"]
+                ),
+                "CalYear": rng.choice([2009, 2010], n),
+                # Only the last rows overflow int16 or hold missing values
+                "Value": np.where(np.arange(n) < 450, 1000, 100000),
+                "Bonus": np.where(np.arange(n) < 400, 50.0, np.nan),
+            }
+        )
+        self.categorical_columns = ["Gender", "CalYear"]
+
+    @pytest.mark.parametrize("encoding", ["one_hot", "native"])
+    def test_chunked_path_matches_in_memory_path(self, tmp_path, encoding):
+        """Test that the streamed chunks concatenate to the in-memory split."""
+        path = tmp_path / "raw.parquet"
+        table = pa.Table.from_pandas(self.data, preserve_index=False)
+        # Without pandas metadata, as for files written by other tools
+        pq.write_table(table.replace_schema_metadata(None), path, row_group_size=70)
+        options = {"chunk_rows": 60, "spill_directory": str(tmp_path / "spill")}
+
+        raw = load_data(str(path))
+        mappings = fit_category_mappings(raw, self.categorical_columns)
+        data = preprocess_data(raw, self.categorical_columns, mappings, encoding)
+        indices = split_indices(data, test_size=0.2, random_state=42, stratify=True)
+
+        chunked_mappings, target = scan_raw_data(
+            str(path), self.categorical_columns, options
+        )
+        assert chunked_mappings == mappings
+        pd.testing.assert_frame_equal(target, data[["target"]])
+
+        outputs = preprocess_split_chunked(
+            str(path),
+            self.categorical_columns,
+            chunked_mappings,
+            encoding,
+            indices,
+            options,
+        )
+        for chunks, expected in zip(outputs, nodes.apply_split(data, indices)):
+            chunks = list(chunks)
+            assert max(len(chunk) for chunk in chunks) <= options["chunk_rows"]
+            pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+        assert not any((tmp_path / "spill").iterdir())
+
+
+class TestArrowBackend:
+    """Test class for the Arrow implementation of the preprocessing nodes."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        rng = np.random.default_rng(0)
+        n = 1_000
+        self.data = pd.DataFrame(
+            {
+                "Numtppd": np.where(np.arange(n) == 3, np.nan, rng.poisson(0.3, n)),
+                "Numtpbi": rng.poisson(0.1, n),
+                "Gender": pd.Categorical(
+                    rng.choice(["M", "F", None], n), categories=["M", "F", "X"]
+                ),
+                "CalYear": rng.choice([2009, 2010], n),
+                "Age": rng.integers(18, 80, n).astype("uint8"),
+                "Value": rng.normal(1e6, 1e5, n),
+                "Exact": rng.integers(0, 4, n) / 4,
+                "Close": rng.normal(size=n),
+                "Bonus": pd.array(
+                    np.where(rng.random(n) < 0.3, None, rng.integers(-50, 150, n)),
+                    dtype="Int64",
+                ),
+                "Empty": np.nan,
+            }
+        )
+        self.categorical_columns = ["Gender", "CalYear"]
+
+    @pytest.mark.parametrize("encoding", ["one_hot", "native"])
+    @pytest.mark.parametrize("suffix", [".parquet", ".csv"])
+    def test_arrow_backend_matches_pandas(self, tmp_path, encoding, suffix):
+        """Test that both backends preprocess the raw file into the same frame."""
+        path = tmp_path / f"raw{suffix}"
+        if suffix == ".csv":
+            self.data.to_csv(path, index=False)
+        else:
+            pq.write_table(
+                pa.Table.from_pandas(self.data, preserve_index=False),
+                path,
+                row_group_size=300,
+            )
+
+        frame = load_data(str(path))
+        table = load_data(str(path), backend="arrow")
+        assert isinstance(table, pa.Table)
+        mappings = fit_category_mappings(frame, self.categorical_columns)
+        assert fit_category_mappings(table, self.categorical_columns) == mappings
+
+        expected = preprocess_data(frame, self.categorical_columns, mappings, encoding)
+        result = preprocess_data(table, self.categorical_columns, mappings, encoding)
+
+        pd.testing.assert_frame_equal(result, expected)
+        assert result["Value"].dtype == "float64"
+        assert result["Exact"].dtype == "float32"
+        # Within float32 precision, but not exactly representable
+        assert result["Close"].dtype == "float64"
+        assert result["Empty"].dtype == "float32"
+        assert result["Bonus"].dtype == ("Int16" if suffix == ".parquet" else "float32")
+
+    def test_unknown_backend(self, tmp_path):
+        """Test that an unknown backend is rejected."""
+        with pytest.raises(ValueError, match="Unknown backend"):
+            load_data(str(tmp_path / "raw.parquet"), backend="polars")
@@ -0,0 +1,138 @@
+"""Unit tests for the custom datasets."""
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from kedro.io import AbstractDataset, DatasetError
+from kedro_datasets.pandas import ParquetDataset
+from kedro_datasets.pickle import PickleDataset
+from scipy import sparse
+
+from insurance_prediction.datasets import (
+    ChunkedParquetDataset,
+    SparseFeaturesDataset,
+    WriteBehindDataset,
+    flush_writes,
+)
+from insurance_prediction.pipelines.data_processing.sparse import SparseFeatures
+
+
+def test_sparse_features_dataset_round_trip(tmp_path):
+    """Test that a sparse matrix and its names survive save and load."""
+    matrix = sparse.csr_matrix(np.array([[0.0, 1.0, np.nan], [2.5, 0.0, 0.0]]))
+    dataset = SparseFeaturesDataset(filepath=str(tmp_path / "features.npz"))
+    assert not dataset.exists()
+
+    dataset.save(SparseFeatures(matrix, ["a", "b", "c"]))
+    loaded = dataset.load()
+
+    assert dataset.exists()
+    assert loaded.feature_names == ["a", "b", "c"]
+    assert sparse.isspmatrix_csr(loaded.matrix)
+    np.testing.assert_array_equal(loaded.matrix.toarray(), matrix.toarray())
+
+
+def test_write_behind_dataset_hands_over_saved_object(tmp_path):
+    """Test that loads return the saved object while the file is written."""
+    path = tmp_path / "data.parquet"
+    dataset = WriteBehindDataset(
+        {"type": "pandas.ParquetDataset", "filepath": str(path)}
+    )
+    data = pd.DataFrame({"a": [1.0, 2.0]})
+
+    dataset.save(data)
+
+    assert dataset.load() is data
+    flush_writes()
+    pd.testing.assert_frame_equal(ParquetDataset(filepath=str(path)).load(), data)
+
+    # Released data is read back from the file
+    dataset.release()
+    pd.testing.assert_frame_equal(dataset.load(), data)
+
+
+class _GatedDataset(AbstractDataset):
+    """In-memory dataset whose saves only complete once ``gate`` is set."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.data = None
+
+    def load(self):
+        return self.data
+
+    def save(self, data):
+        self.gate.wait(timeout=10)
+        self.data = data
+
+    def _describe(self):
+        return {}
+
+
+def test_write_behind_dataset_loads_wait_for_the_write():
+    """Test that concurrent loads after a release all wait for the write."""
+    inner = _GatedDataset()
+    dataset = WriteBehindDataset(inner)
+    data = {"a": 1}
+    dataset.save(data)
+    dataset.release()
+
+    loaded = []
+    loaders = [
+        threading.Thread(target=lambda: loaded.append(dataset.load())) for _ in range(2)
+    ]
+    for loader in loaders:
+        loader.start()
+        # Let each loader reach the pending write before the next one starts
+        time.sleep(0.05)
+    inner.gate.set()
+    for loader in loaders:
+        loader.join()
+
+    assert loaded == [data, data]
+
+
+def test_write_behind_dataset_without_persistence(tmp_path):
+    """Test that an unpersisted dataset only lives in memory."""
+    path = tmp_path / "data.parquet"
+    dataset = WriteBehindDataset(ParquetDataset(filepath=str(path)), persist=False)
+
+    dataset.save(pd.DataFrame({"a": [1.0]}))
+    flush_writes()
+
+    assert dataset.exists() and not path.exists()
+    dataset.release()
+    assert not dataset.exists()
+    with pytest.raises(DatasetError, match="has not been saved"):
+        dataset.load()
+
+
+def test_write_behind_dataset_raises_failed_writes(tmp_path):
+    """Test that a failed background write is raised when flushing."""
+    (tmp_path / "file").write_text("")
+    dataset = WriteBehindDataset(PickleDataset(filepath=str(tmp_path / "file/x.pkl")))
+
+    dataset.save({"a": 1})
+
+    with pytest.raises(DatasetError, match="Background write failed"):
+        flush_writes()
+
+
+def test_chunked_parquet_dataset_saves_chunks(tmp_path):
+    """Test that chunks are written to one file and load as one frame."""
+    data = pd.DataFrame(
+        {"a": [1.5, 2.5, 3.5], "b": pd.Categorical(["x", "y", "x"])},
+        index=[4, 0, 2],
+    )
+    dataset = WriteBehindDataset(
+        ChunkedParquetDataset(filepath=str(tmp_path / "data.parquet"))
+    )
+
+    dataset.save(iter([data.iloc[:2], data.iloc[2:]]))
+
+    pd.testing.assert_frame_equal(dataset.load(), data)
+    with pytest.raises(DatasetError, match="no chunk"):
+        ChunkedParquetDataset(filepath=str(tmp_path / "empty.parquet")).save(iter([]))
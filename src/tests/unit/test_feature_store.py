@@ -0,0 +1,62 @@
+"""Unit tests for the shared feature store."""
+
+import pickle
+import shutil
+import tempfile
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from insurance_prediction.feature_store import FeatureStore, shared_memory_directory
+
+
+def _features() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "count": np.array([1, 2, 3], dtype="uint8"),
+            "amount": np.array([0.5, np.nan, 2.0], dtype="float32"),
+            "type": pd.Categorical(["b", None, "a"], categories=["a", "b"]),
+        }
+    )
+
+
+def test_feature_store_encodes_like_lightgbm(tmp_path):
+    """Test that categories are stored as float codes with NaN if missing."""
+    with FeatureStore.create(_features(), tmp_path / "store") as store:
+        assert store.matrix.dtype == np.float32
+        assert isinstance(store.matrix, np.memmap)
+        np.testing.assert_array_equal(
+            store.matrix,
+            np.array([[1, 0.5, 1], [2, np.nan, np.nan], [3, 2.0, 0]], np.float32),
+        )
+        assert store.feature_names == ["count", "amount", "type"]
+        assert store.categorical_feature == ["type"]
+        assert store.categories == {"type": ["a", "b"]}
+        np.testing.assert_array_equal(store.take(np.array([2])).matrix, [[3, 2, 0]])
+
+
+def test_feature_store_pickles_as_its_directory(tmp_path):
+    """Test that workers attach to the file and only the owner deletes it."""
+    store = FeatureStore.create(_features(), tmp_path / "store")
+
+    payload = pickle.dumps(store)
+    attached = pickle.loads(payload)
+
+    assert len(payload) < 500
+    np.testing.assert_array_equal(attached.matrix, store.matrix)
+    attached.close()
+    assert store.directory.exists()
+    store.close()
+    assert not store.directory.exists()
+
+
+def test_feature_store_falls_back_without_shared_memory_space(tmp_path, monkeypatch):
+    """Test that a store the shared memory cannot hold goes to the temp dir."""
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    monkeypatch.setattr(shutil, "disk_usage", lambda path: SimpleNamespace(free=0))
+
+    with FeatureStore.create(_features()) as store:
+        assert shared_memory_directory(store.matrix.nbytes) is None
+        assert store.directory.parent == tmp_path
+        np.testing.assert_array_equal(store.matrix[:, 0], [1, 2, 3])
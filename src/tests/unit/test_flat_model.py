@@ -0,0 +1,91 @@
+"""Unit tests for the flattened tree ensemble."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from lightgbm import LGBMClassifier
+
+from insurance_prediction.datasets import FlatModelDataset
+from insurance_prediction.flat_model import FlatModel
+from insurance_prediction.pipelines.model_training.nodes import export_model
+
+
+@pytest.fixture
+def numeric_data():
+    """Create numeric features with missing and zero values."""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 4))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int)
+    X[rng.random(X.shape) < 0.1] = np.nan
+    X[:, 3] = np.where(rng.random(2000) < 0.3, 0.0, X[:, 3])
+    return X, y
+
+
+def test_flat_model_matches_booster(numeric_data):
+    """Test that the flat model reproduces LightGBM, missing values included."""
+    X, y = numeric_data
+    model = LGBMClassifier(n_estimators=30, num_leaves=15, verbosity=-1).fit(X, y)
+
+    booster_text, flat_model = export_model(model)
+
+    np.testing.assert_allclose(
+        flat_model.predict(X), model.booster_.predict(X), rtol=1e-12
+    )
+    assert booster_text.startswith("tree")
+
+
+def test_flat_model_matches_booster_with_zero_as_missing(numeric_data):
+    """Test the default direction of splits treating zero as missing."""
+    X, y = numeric_data
+    X = np.nan_to_num(X)
+    model = LGBMClassifier(n_estimators=20, zero_as_missing=True, verbosity=-1).fit(
+        X, y
+    )
+
+    flat_model = FlatModel.from_dump(model.booster_.dump_model())
+
+    np.testing.assert_allclose(
+        flat_model.predict(X), model.booster_.predict(X), rtol=1e-12
+    )
+
+
+def test_flat_model_matches_booster_on_categories():
+    """Test categorical splits, including unseen and missing categories."""
+    rng = np.random.default_rng(1)
+    category = rng.integers(0, 30, 3000)
+    X = pd.DataFrame(
+        {
+            "category": pd.Categorical(category, categories=range(30)),
+            "value": rng.normal(size=3000),
+        }
+    )
+    y = ((category % 3 == 0) ^ (X["value"] > 0.5)).astype(int)
+    model = LGBMClassifier(
+        n_estimators=20, min_data_per_group=5, cat_smooth=1, verbosity=-1
+    ).fit(X, y)
+    flat_model = FlatModel.from_dump(model.booster_.dump_model())
+
+    codes = np.column_stack(
+        [X["category"].cat.codes.to_numpy(float), X["value"].to_numpy()]
+    )
+    codes[:10, 0] = np.nan
+    codes[10:20, 0] = 45
+
+    assert flat_model.category_bitsets.shape[0] > 0
+    np.testing.assert_allclose(
+        flat_model.predict(codes), model.booster_.predict(codes), rtol=1e-12
+    )
+
+
+def test_flat_model_dataset_round_trip(numeric_data, tmp_path):
+    """Test that a saved flat model loads and scores identically."""
+    X, y = numeric_data
+    model = LGBMClassifier(n_estimators=5, verbosity=-1).fit(X, y)
+    flat_model = FlatModel.from_dump(model.booster_.dump_model())
+    dataset = FlatModelDataset(filepath=str(tmp_path / "model" / "flat_model.npz"))
+
+    dataset.save(flat_model)
+    loaded = dataset.load()
+
+    assert loaded.feature_names == flat_model.feature_names
+    np.testing.assert_array_equal(loaded.predict(X), flat_model.predict(X))
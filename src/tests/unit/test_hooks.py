@@ -0,0 +1,112 @@
+"""Unit tests for the instrumentation hooks."""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from kedro.framework.hooks import _create_hook_manager
+from kedro.io import DataCatalog, MemoryDataset
+from kedro.pipeline import node, pipeline
+from kedro.runner import SequentialRunner
+from scipy import sparse
+
+from insurance_prediction.hooks import InstrumentationHooks, data_size
+from insurance_prediction.pipelines.data_processing.sparse import SparseFeatures
+
+
+def _double(frame: pd.DataFrame) -> pd.DataFrame:
+    return pd.concat([frame, frame], ignore_index=True)
+
+
+def _fail(frame: pd.DataFrame) -> pd.DataFrame:
+    raise ValueError("bad data")
+
+
+def _run(hooks: InstrumentationHooks, nodes) -> None:
+    """Run nodes with the hooks the way a Kedro session does."""
+    hook_manager = _create_hook_manager()
+    hook_manager.register(hooks)
+    catalog = DataCatalog(
+        {"frame": MemoryDataset(pd.DataFrame({"a": np.arange(10.0)}))}
+    )
+    run_pipeline = pipeline(nodes)
+    run_params = {"run_id": "test-run", "pipeline_names": ["__default__"]}
+    hook_manager.hook.before_pipeline_run(
+        run_params=run_params, pipeline=run_pipeline, catalog=catalog
+    )
+    try:
+        run_result = SequentialRunner().run(run_pipeline, catalog, hook_manager)
+    except Exception as exc:
+        hook_manager.hook.on_pipeline_error(
+            error=exc, run_params=run_params, pipeline=run_pipeline, catalog=catalog
+        )
+        raise
+    hook_manager.hook.after_pipeline_run(
+        run_params=run_params,
+        run_result=run_result,
+        pipeline=run_pipeline,
+        catalog=catalog,
+    )
+
+
+def test_run_report_records_nodes_and_datasets(tmp_path):
+    """Test that each node's time, sizes and dataset I/O are reported."""
+    hooks = InstrumentationHooks(tmp_path, chrome_trace=True)
+
+    _run(
+        hooks,
+        [
+            node(_double, "frame", "doubled", name="double_node"),
+            node(_double, "doubled", "quadrupled", name="double_again_node"),
+        ],
+    )
+
+    report = json.loads((tmp_path / "run_test-run.json").read_text())
+    assert report["status"] == "completed"
+    assert [metrics["node"] for metrics in report["nodes"]] == [
+        "double_node",
+        "double_again_node",
+    ]
+    first = report["nodes"][0]
+    assert first["input_rows"] == 10 and first["output_rows"] == 20
+    assert (
+        first["outputs"]["doubled"]["bytes"]
+        == data_size(pd.DataFrame({"a": np.arange(20.0)}))[1]
+    )
+    assert first["wall_seconds"] >= 0 and "peak_rss_delta_bytes" in first
+    assert {(event["dataset"], event["operation"]) for event in report["datasets"]} >= {
+        ("frame", "load"),
+        ("doubled", "save"),
+        ("doubled", "load"),
+    }
+
+    trace = json.loads((tmp_path / "run_test-run.trace.json").read_text())
+    assert {event["cat"] for event in trace["traceEvents"]} == {"node", "load", "save"}
+    assert all(event["ph"] == "X" for event in trace["traceEvents"])
+
+
+def test_run_report_records_failures(tmp_path):
+    """Test that a failed run still writes its report with the error."""
+    hooks = InstrumentationHooks(tmp_path)
+
+    with pytest.raises(ValueError):
+        _run(hooks, [node(_fail, "frame", "out", name="fail_node")])
+
+    report = json.loads((tmp_path / "run_test-run.json").read_text())
+    assert report["status"] == "failed"
+    assert "bad data" in report["nodes"][0]["error"]
+    assert not (tmp_path / "run_test-run.trace.json").exists()
+
+
+def test_data_size():
+    """Test the rows and bytes reported for the values nodes exchange."""
+    matrix = sparse.csr_matrix(np.eye(4))
+
+    assert data_size(np.zeros((3, 2))) == (3, 48)
+    assert data_size(SparseFeatures(matrix, list("abcd"))) == (
+        4,
+        matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes,
+    )
+    assert data_size(pd.Series([1, 2], dtype="int8"))[0] == 2
+    assert data_size({"n_trials": 3}) == (None, None)
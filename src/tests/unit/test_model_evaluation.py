@@ -2,13 +2,18 @@
 
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import pytest
 from lightgbm import LGBMClassifier
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
 
 from insurance_prediction.pipelines.model_evaluation.nodes import (
+    calibration_bins,
     evaluate_model,
     plot_confusion_matrix,
+    predict_probabilities,
+    threshold_sweep,
 )
 
 
@@ -35,23 +40,78 @@ def mock_trained_model(sample_test_data) -> LGBMClassifier:
     return model
 
 
-def test_evaluate_model(mock_trained_model, sample_test_data):
+@pytest.fixture
+def sample_predictions(mock_trained_model, sample_test_data) -> pd.DataFrame:
+    """Score the sample test data once."""
+    X_test, _ = sample_test_data
+    return predict_probabilities(mock_trained_model, X_test)
+
+
+def test_predict_probabilities(mock_trained_model, sample_test_data):
+    """Test that the stored probabilities match the model's predictions."""
+    X_test, _ = sample_test_data
+    predictions = predict_probabilities(mock_trained_model, X_test)
+
+    assert list(predictions.columns) == ["probability"]
+    np.testing.assert_array_equal(
+        (predictions["probability"] > 0.5).astype(int),
+        mock_trained_model.predict(X_test),
+    )
+
+
+def test_evaluate_model(sample_predictions, sample_test_data):
     """Test the evaluate_model function."""
-    X_test, y_test = sample_test_data
-    metrics = evaluate_model(mock_trained_model, X_test, y_test)
+    _, y_test = sample_test_data
+    metrics = evaluate_model(sample_predictions, y_test)
 
     assert isinstance(metrics, dict)
     assert "accuracy" in metrics
     assert "precision" in metrics
     assert "recall" in metrics
     assert "f1_score" in metrics
+    assert "roc_auc" in metrics
+    assert "pr_auc" in metrics
+    assert "log_loss" in metrics
     # Check types (optional but good practice)
     assert isinstance(metrics["accuracy"], float)
 
 
-def test_plot_confusion_matrix(mock_trained_model, sample_test_data, tmp_path):
+def test_threshold_sweep_matches_scikit_learn():
+    """Test that the vectorized sweep matches per-threshold metrics."""
+    rng = np.random.default_rng(0)
+    y_test = pd.DataFrame({"target": rng.integers(0, 2, 200)})
+    predictions = pd.DataFrame({"probability": rng.random(200).round(2)})
+
+    sweep = threshold_sweep(predictions, y_test, n_thresholds=11)
+
+    assert len(sweep) == 11
+    for row in sweep.itertuples():
+        y_pred = (predictions["probability"] > row.threshold).astype(int)
+        y_true = y_test["target"]
+        assert row.accuracy == pytest.approx(accuracy_score(y_true, y_pred))
+        assert row.precision == pytest.approx(
+            precision_score(y_true, y_pred, zero_division=0)
+        )
+        assert row.recall == pytest.approx(recall_score(y_true, y_pred))
+        assert row.f1_score == pytest.approx(f1_score(y_true, y_pred))
+
+
+def test_calibration_bins():
+    """Test that rows are binned by predicted probability."""
+    predictions = pd.DataFrame({"probability": [0.05, 0.15, 0.12, 0.95, 1.0]})
+    y_test = pd.DataFrame({"target": [0, 1, 0, 1, 1]})
+
+    bins = calibration_bins(predictions, y_test, n_bins=10)
+
+    assert bins["count"].tolist() == [1, 2, 0, 0, 0, 0, 0, 0, 0, 2]
+    assert bins["positive_rate"][1] == 0.5
+    assert bins["mean_probability"][9] == pytest.approx(0.975)
+    assert np.isnan(bins["positive_rate"][2])
+
+
+def test_plot_confusion_matrix(sample_predictions, sample_test_data, tmp_path):
     """Test the plot_confusion_matrix function."""
-    X_test, y_test = sample_test_data
+    _, y_test = sample_test_data
     output_dir = str(tmp_path)
 
     # Ensure the target subdirectory does not exist initially
@@ -59,7 +119,7 @@ def test_plot_confusion_matrix(mock_trained_model, sample_test_data, tmp_path):
     assert not plot_path.exists()
 
     # Call the function
-    plot_confusion_matrix(mock_trained_model, X_test, y_test, output_dir)
+    plot_confusion_matrix(sample_predictions, y_test, output_dir)
 
     # Check if the plot file was created
     assert plot_path.exists()
@@ -1,13 +1,42 @@
 """Unit tests for the model training nodes."""
 
+import os
+import socket
+import subprocess
+import sys
+import time
+import warnings
+from types import SimpleNamespace
+
+import numpy as np
+import optuna
 import pandas as pd
 import pytest
 from lightgbm import LGBMClassifier
+from scipy import sparse
 
+from insurance_prediction.pipelines.data_processing.sparse import (
+    SparseFeatures,
+    positive_probabilities,
+)
 from insurance_prediction.pipelines.model_training.nodes import (
+    ValidationDatasets,
+    objective,
+    suggest_params,
     train_model,
     tune_model_hyperparameters,
 )
+from insurance_prediction.pipelines.model_training.tuning import (
+    create_storage,
+    data_fingerprint,
+    data_profile,
+    fidelity_fractions,
+    load_or_create_study,
+    nested_subsamples,
+    pruning_callback,
+    run_folds,
+    search_space_hash,
+)
 
 
 @pytest.fixture
@@ -43,6 +72,39 @@ def test_train_model(sample_data):
     assert model.get_params()["n_estimators"] == 50  # Check a param
 
 
+def test_train_model_native_categoricals(sample_data):
+    """Test that category columns are passed to LightGBM as categorical."""
+    X_train, y_train = sample_data
+    X_train = X_train.assign(
+        group=pd.Categorical(list("abcabcabca"), categories=["a", "b", "c"])
+    )
+    best_params = {"objective": "binary", "n_estimators": 5}
+
+    model = train_model(X_train, y_train, best_params, random_state=42)
+
+    assert model.booster_.pandas_categorical == [["a", "b", "c"]]
+
+
+def test_train_model_sparse_features(sample_data):
+    """Test training on a sparse feature matrix keeps the feature names."""
+    X_train, y_train = sample_data
+    X_sparse = SparseFeatures(
+        sparse.csr_matrix(X_train.to_numpy(dtype=float)), ["f1", "f2"]
+    )
+    best_params = {"objective": "binary", "n_estimators": 5}
+
+    model = train_model(X_sparse, y_train, best_params, random_state=42)
+
+    assert model.booster_.feature_name() == ["f1", "f2"]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        probabilities = positive_probabilities(model, X_sparse)
+    np.testing.assert_allclose(
+        probabilities,
+        model.predict_proba(X_train.set_axis(["f1", "f2"], axis=1))[:, 1],
+    )
+
+
 def test_tune_model_hyperparameters(sample_data):
     """Test the tune_model_hyperparameters function."""
     X_train, y_train = sample_data
@@ -57,3 +119,286 @@ def test_tune_model_hyperparameters(sample_data):
     assert "learning_rate" in best_params
     # Check for fixed keys added after tuning
     assert best_params["objective"] == "binary"
+
+
+def test_tune_model_hyperparameters_parallel(sample_data, tmp_path):
+    """Test that parallel tuning shares a storage and is reproducible."""
+    X_train, y_train = sample_data
+    runs = []
+    for run in range(2):
+        options = {
+            "n_workers": 2,
+            "n_threads": 1,
+            "storage": str(tmp_path / f"journal_{run}.log"),
+        }
+        runs.append(
+            tune_model_hyperparameters(X_train, y_train, 4, 42, tuning_options=options)
+        )
+
+    assert runs[0] == runs[1]
+    assert (tmp_path / "journal_0.log").stat().st_size > 0
+
+
+def _study_trials(storage_path):
+    storage = create_storage(str(storage_path))
+    return {
+        name: optuna.load_study(study_name=name, storage=storage).trials
+        for name in optuna.get_all_study_names(storage)
+    }
+
+
+def test_tune_model_hyperparameters_resumes_study(sample_data, tmp_path):
+    """Test that a finished study is reused instead of re-run."""
+    X_train, y_train = sample_data
+    options = {"storage": str(tmp_path / "journal.log")}
+
+    first = tune_model_hyperparameters(X_train, y_train, 3, 42, tuning_options=options)
+    second = tune_model_hyperparameters(X_train, y_train, 3, 42, tuning_options=options)
+
+    assert second == first
+    (trials,) = _study_trials(tmp_path / "journal.log").values()
+    assert len(trials) == 3
+
+
+def _start_owned_trial(X_train, y_train, storage_path, pid):
+    study, _ = load_or_create_study(
+        create_storage(storage_path),
+        optuna.samplers.TPESampler(seed=42),
+        search_space_hash(
+            suggest_params, {"validation": "holdout", "early_stopping_rounds": None}
+        ),
+        data_fingerprint(X_train, y_train),
+        data_profile(X_train, y_train),
+        n_trials=3,
+    )
+    # Parameters the seeded sampler does not draw first on its own
+    study.enqueue_trial(
+        {
+            "n_estimators": 123,
+            "learning_rate": 0.05,
+            "max_depth": 4,
+            "num_leaves": 42,
+            "min_child_samples": 7,
+            "subsample": 0.75,
+            "colsample_bytree": 0.75,
+        }
+    )
+    trial = study.ask()
+    trial.set_user_attr("owner", {"host": socket.gethostname(), "pid": pid})
+    suggest_params(trial)
+    return trial
+
+
+def test_tune_model_hyperparameters_retries_crashed_trials(sample_data, tmp_path):
+    """Test that trials left running by a crash are failed and retried."""
+    X_train, y_train = sample_data
+    options = {"storage": str(tmp_path / "journal.log")}
+    exited = subprocess.Popen([sys.executable, "-c", ""])
+    exited.wait()
+    crashed = _start_owned_trial(X_train, y_train, options["storage"], exited.pid)
+
+    tune_model_hyperparameters(X_train, y_train, 3, 42, tuning_options=options)
+
+    (trials,) = _study_trials(tmp_path / "journal.log").values()
+    states = [trial.state for trial in trials]
+    assert states[0] == optuna.trial.TrialState.FAIL
+    assert states.count(optuna.trial.TrialState.COMPLETE) == 3
+    # The retry is the enqueued copy of the crashed trial
+    assert trials[1].system_attrs["fixed_params"] == crashed.params
+    assert trials[1].params == crashed.params
+
+
+def test_tune_model_hyperparameters_leaves_live_trials(sample_data, tmp_path):
+    """Test that trials still run by another process are not retried."""
+    X_train, y_train = sample_data
+    options = {"storage": str(tmp_path / "journal.log")}
+    _start_owned_trial(X_train, y_train, options["storage"], os.getppid())
+
+    tune_model_hyperparameters(X_train, y_train, 3, 42, tuning_options=options)
+
+    (trials,) = _study_trials(tmp_path / "journal.log").values()
+    states = [trial.state for trial in trials]
+    assert states[0] == optuna.trial.TrialState.RUNNING
+    assert states[1:] == [optuna.trial.TrialState.COMPLETE] * 2
+    assert trials[1].user_attrs["owner"]["pid"] == os.getpid()
+
+
+def test_tune_model_hyperparameters_warm_starts(sample_data, tmp_path):
+    """Test that slightly drifted data warm-starts with a smaller budget."""
+    X_train, y_train = sample_data
+    options = {
+        "storage": str(tmp_path / "journal.log"),
+        "warm_start_trials": 2,
+        "warm_start_budget": 0.5,
+    }
+    tune_model_hyperparameters(X_train, y_train, 4, 42, tuning_options=options)
+    (previous,) = _study_trials(tmp_path / "journal.log").values()
+
+    drifted = X_train.assign(feature1=X_train["feature1"] + 1)
+    tune_model_hyperparameters(drifted, y_train, 4, 42, tuning_options=options)
+
+    studies = _study_trials(tmp_path / "journal.log")
+    (warm,) = [trials for trials in studies.values() if len(trials) != 4]
+    best = sorted(previous, key=lambda trial: trial.value, reverse=True)[:2]
+    assert len(warm) == 2
+    assert [trial.params for trial in warm] == [trial.params for trial in best]
+
+
+def test_pruning_callback_prunes_losing_trial():
+    """Test that the callback reports accuracy and raises when told to prune."""
+    reported = []
+    trial = SimpleNamespace(
+        report=lambda value, step: reported.append((step, value)),
+        should_prune=lambda: True,
+    )
+    env = SimpleNamespace(
+        iteration=3,
+        evaluation_result_list=[
+            ("valid_0", "binary_logloss", 0.6, False),
+            ("valid_0", "binary_error", 0.25, False),
+        ],
+    )
+
+    with pytest.raises(optuna.TrialPruned):
+        pruning_callback(trial)(env)
+    assert reported == [(3, 0.75)]
+
+
+def test_objective_records_early_stopped_iteration():
+    """Test that early stopping records the best iteration on the trial."""
+    rng = np.random.default_rng(0)
+    X_train = pd.DataFrame({"feature1": rng.normal(size=400)})
+    y_train = pd.DataFrame({"target": rng.integers(0, 2, size=400)})
+    trial = optuna.trial.FixedTrial(
+        {
+            "n_estimators": 200,
+            "learning_rate": 0.3,
+            "max_depth": 10,
+            "num_leaves": 150,
+            "min_child_samples": 5,
+            "subsample": 1.0,
+            "colsample_bytree": 1.0,
+        }
+    )
+
+    objective(
+        trial, ValidationDatasets.holdout(X_train, y_train, 42), early_stopping_rounds=5
+    )
+
+    assert 1 <= trial.user_attrs["best_iteration"] < 200
+
+
+def test_shared_validation_datasets_score_like_the_frame():
+    """Test that a trial scores the same on features moved to a store."""
+    rng = np.random.default_rng(0)
+    X_train = pd.DataFrame(
+        {
+            "feature1": rng.normal(size=400).astype("float32"),
+            "group": pd.Categorical(rng.choice(["a", "b", "c", None], size=400)),
+        }
+    )
+    y_train = pd.DataFrame({"target": rng.integers(0, 2, size=400)})
+    params = {
+        "n_estimators": 20,
+        "learning_rate": 0.3,
+        "max_depth": 5,
+        "num_leaves": 20,
+        "min_child_samples": 5,
+        "subsample": 1.0,
+        "colsample_bytree": 1.0,
+    }
+    shared = ValidationDatasets.holdout(X_train, y_train, 42)
+    store = shared.share()
+
+    try:
+        assert objective(optuna.trial.FixedTrial(params), shared) == objective(
+            optuna.trial.FixedTrial(params),
+            ValidationDatasets.holdout(X_train, y_train, 42),
+        )
+    finally:
+        store.close()
+
+
+def test_validation_datasets_k_fold_is_stratified():
+    """Test that the k-fold folds partition the rows and keep the target rate."""
+    X_train = pd.DataFrame({"feature1": np.arange(40)})
+    y_train = pd.DataFrame({"target": [0, 0, 0, 1] * 10})
+
+    validation = ValidationDatasets.k_fold(X_train, y_train, 42, n_folds=5)
+
+    val_rows = np.concatenate([val for _, val in validation.folds])
+    assert sorted(val_rows) == list(range(40))
+    for train, val in validation.folds:
+        assert len(np.intersect1d(train, val)) == 0
+        assert y_train["target"].to_numpy()[val].sum() == 2
+    assert len(validation.datasets()) == 5
+
+
+def test_tune_model_hyperparameters_k_fold():
+    """Test tuning with the cross-validated objective and parallel folds."""
+    rng = np.random.default_rng(0)
+    X_train = pd.DataFrame({"feature1": rng.normal(size=200)})
+    y_train = pd.DataFrame({"target": (X_train["feature1"] > 0).astype(int)})
+    options = {"validation": "k_fold", "n_folds": 3, "n_threads": 3}
+
+    best_params = tune_model_hyperparameters(
+        X_train, y_train, 2, 42, tuning_options=options
+    )
+
+    assert "n_estimators" in best_params
+
+
+def test_run_folds_stops_other_folds():
+    """Test that a failing fold stops the others and is re-raised."""
+    stopped = []
+
+    def fit_fold(fold, stop_callback):
+        if fold == 0:
+            raise optuna.TrialPruned()
+        for _ in range(1000):
+            try:
+                stop_callback(None)
+            except Exception:
+                stopped.append(fold)
+                raise
+            time.sleep(0.01)
+        return fold
+
+    with pytest.raises(optuna.TrialPruned):
+        run_folds(fit_fold, 3, 3)
+    assert sorted(stopped) == [1, 2]
+
+
+def test_nested_subsamples_are_nested_and_stratified():
+    """Test that multi-fidelity subsamples grow by the reduction factor."""
+    fractions = fidelity_fractions(0.1, reduction_factor=3)
+    target = np.array([0, 0, 0, 1] * 90)
+
+    subsamples = nested_subsamples(target, fractions, random_state=0)
+
+    assert fractions == [1 / 9, 1 / 3, 1.0]
+    assert [len(rows) for rows in subsamples] == [40, 120, 360]
+    assert [target[rows].mean() for rows in subsamples] == [0.25] * 3
+    assert np.isin(subsamples[0], subsamples[1]).all()
+
+
+def test_tune_model_hyperparameters_multi_fidelity(tmp_path):
+    """Test that multi-fidelity tuning reports per rung and prunes trials."""
+    rng = np.random.default_rng(0)
+    X_train = pd.DataFrame({"feature1": rng.normal(size=900)})
+    y_train = pd.DataFrame(
+        {"target": (X_train["feature1"] + rng.normal(size=900) > 0).astype(int)}
+    )
+    options = {
+        "storage": str(tmp_path / "journal.log"),
+        "min_subsample": 0.1,
+        "reduction_factor": 3,
+        "pruner": "successive_halving",
+    }
+
+    tune_model_hyperparameters(X_train, y_train, 8, 42, tuning_options=options)
+
+    (trials,) = _study_trials(tmp_path / "journal.log").values()
+    states = [trial.state for trial in trials]
+    assert optuna.trial.TrialState.PRUNED in states
+    assert all(set(trial.intermediate_values) <= {1, 3} for trial in trials)
@@ -0,0 +1,178 @@
+"""Unit tests for the project runners."""
+
+from collections import Counter
+
+import pandas as pd
+import pytest
+from kedro.io import DataCatalog, MemoryDataset
+from kedro.pipeline import node, pipeline
+from kedro.runner import SequentialRunner, ThreadRunner
+from kedro_datasets.pandas import CSVDataset
+
+from insurance_prediction.runners import (
+    AutoRunner,
+    IncrementalRunner,
+    pipeline_width,
+    select_runner,
+    value_fingerprint,
+)
+
+CALLS = Counter()
+
+
+def _source() -> str:
+    CALLS["source"] += 1
+    return "unchanged"
+
+
+def _scale(frame: pd.DataFrame, factor: float, marker: str) -> pd.DataFrame:
+    CALLS["scale"] += 1
+    return frame * factor
+
+
+def _total(frame: pd.DataFrame) -> pd.DataFrame:
+    CALLS["total"] += 1
+    return frame.sum().to_frame("total")
+
+
+def _report(totals: pd.DataFrame, digits: int) -> pd.DataFrame:
+    CALLS["report"] += 1
+    return totals.round(digits)
+
+
+@pytest.fixture
+def run(tmp_path):
+    """Run a small pipeline incrementally and return the nodes that ran."""
+    raw_path = tmp_path / "raw.csv"
+    pd.DataFrame({"a": [1.0, 2.0], "b": [3.0, 4.0]}).to_csv(raw_path, index=False)
+    test_pipeline = pipeline(
+        [
+            node(_source, None, "marker", name="source", tags="always_run"),
+            node(_scale, ["raw", "params:factor", "marker"], "scaled", name="scale"),
+            node(_total, "scaled", "totals", name="total"),
+            node(_report, ["totals", "params:digits"], "report", name="report"),
+        ]
+    )
+
+    def _run(factor=2.0, digits=1):
+        CALLS.clear()
+        catalog = DataCatalog(
+            {
+                "raw": CSVDataset(filepath=str(raw_path)),
+                "marker": MemoryDataset(),
+                "scaled": MemoryDataset(),
+                "totals": CSVDataset(filepath=str(tmp_path / "totals.csv")),
+                "report": CSVDataset(filepath=str(tmp_path / "report.csv")),
+                "params:factor": MemoryDataset(factor),
+                "params:digits": MemoryDataset(digits),
+            }
+        )
+        runner = IncrementalRunner(manifest_path=tmp_path / "manifest.json")
+        runner.run(test_pipeline, catalog)
+        return set(CALLS)
+
+    return _run
+
+
+def test_unchanged_nodes_are_skipped(run):
+    """Test that a second run only repeats the always-run node."""
+    assert run() == {"source", "scale", "total", "report"}
+    assert run() == {"source"}
+
+
+def test_changed_parameter_reruns_downstream_nodes(run):
+    """Test that only the nodes depending on a parameter rerun."""
+    run()
+
+    assert run(digits=2) == {"source", "report"}
+    assert run(factor=3.0, digits=2) == {"source", "scale", "total", "report"}
+
+
+def test_changed_input_file_reruns_its_consumers(run, tmp_path):
+    """Test that input files are compared by content."""
+    run()
+    pd.DataFrame({"a": [5.0, 6.0], "b": [7.0, 8.0]}).to_csv(
+        tmp_path / "raw.csv", index=False
+    )
+
+    assert run() == {"source", "scale", "total", "report"}
+
+
+def test_overwritten_output_reruns_its_producer(run, tmp_path):
+    """Test that a persisted output changed outside the run is rebuilt."""
+    run()
+    pd.DataFrame({"total": [0.0]}).to_csv(tmp_path / "totals.csv", index=False)
+
+    # The memory input of ``total`` is only available by running ``scale``
+    assert run() == {"source", "scale", "total", "report"}
+    assert pd.read_csv(tmp_path / "totals.csv")["total"].tolist() == [6.0, 14.0]
+
+
+def test_value_fingerprint_follows_file_paths(tmp_path):
+    """Test that a string naming a file changes with the file content."""
+    path = tmp_path / "data.txt"
+    path.write_text("one")
+    before = value_fingerprint(str(path))
+    path.write_text("two")
+
+    assert value_fingerprint(str(path)) != before
+    assert value_fingerprint({"a": [1, 2]}) == value_fingerprint({"a": [1, 2]})
+    assert value_fingerprint(pd.DataFrame({"a": [1]})) != value_fingerprint(
+        pd.DataFrame({"a": [2]})
+    )
+
+
+def _identity(value):
+    return value
+
+
+def test_select_runner_follows_pipeline_shape():
+    """Test that only pipelines with independent nodes run on threads."""
+    chain = pipeline(
+        [
+            node(_identity, "a", "b", name="first"),
+            node(_identity, "b", "c", name="second"),
+        ]
+    )
+    fan_out = chain + pipeline(
+        [
+            node(_identity, "b", "d", name="third"),
+            node(_identity, "b", "e", name="fourth"),
+        ]
+    )
+
+    assert pipeline_width(chain) == 1
+    assert pipeline_width(fan_out) == 3
+    assert isinstance(select_runner(chain), SequentialRunner)
+    runner = select_runner(fan_out, is_async=True)
+    assert isinstance(runner, ThreadRunner)
+    assert runner._max_workers == 3
+    assert select_runner(chain, is_async=True)._is_async
+    assert isinstance(select_runner(fan_out, "sequential"), SequentialRunner)
+    with pytest.raises(ValueError, match="Unknown runner"):
+        select_runner(chain, "process")
+
+
+def test_auto_runner_runs_independent_nodes(tmp_path):
+    """Test that the auto runner runs a fan-out and saves every output."""
+    test_pipeline = pipeline(
+        [
+            node(_scale, ["raw", "params:factor", "params:marker"], "scaled"),
+            node(_total, "scaled", "totals"),
+            node(_report, ["scaled", "params:digits"], "report"),
+        ]
+    )
+    catalog = DataCatalog(
+        {
+            "raw": MemoryDataset(pd.DataFrame({"a": [1.0, 2.0]})),
+            "totals": CSVDataset(filepath=str(tmp_path / "totals.csv")),
+            "params:factor": MemoryDataset(2.0),
+            "params:marker": MemoryDataset("marker"),
+            "params:digits": MemoryDataset(0),
+        }
+    )
+
+    outputs = AutoRunner(is_async=True).run(test_pipeline, catalog)
+
+    assert pd.read_csv(tmp_path / "totals.csv")["total"].tolist() == [6.0]
+    assert outputs["report"].load()["a"].tolist() == [2.0, 4.0]
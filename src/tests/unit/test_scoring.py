@@ -0,0 +1,107 @@
+"""Unit tests for the batch scoring nodes."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from lightgbm import LGBMClassifier
+
+from insurance_prediction.flat_model import FlatModel
+from insurance_prediction.pipelines.data_processing.nodes import (
+    fit_category_mappings,
+    fit_feature_encoder,
+    preprocess_data,
+)
+from insurance_prediction.pipelines.scoring.nodes import score_file
+
+
+@pytest.fixture
+def raw_records() -> pd.DataFrame:
+    """Create raw policy records."""
+    rng = np.random.default_rng(0)
+    n_rows = 300
+    return pd.DataFrame(
+        {
+            "PolNum": np.arange(n_rows),
+            "Numtppd": rng.poisson(0.3, n_rows),
+            "Numtpbi": rng.poisson(0.1, n_rows),
+            "Indtppd": rng.random(n_rows),
+            "Indtpbi": rng.random(n_rows),
+            "Age": rng.integers(18, 80, n_rows),
+            "Gender": rng.choice(["Female", "Male"], n_rows),
+        }
+    )
+
+
+@pytest.fixture
+def fitted_model(raw_records):
+    """Train a model and its feature encoder on the raw records."""
+    mappings = fit_category_mappings(raw_records, ["Gender"])
+    data = preprocess_data(raw_records.drop(columns="PolNum"), ["Gender"], mappings)
+    X, y = data.drop(columns="target"), data["target"]
+    model = LGBMClassifier(n_estimators=5, min_child_samples=5, verbosity=-1)
+    model.fit(X, y)
+    return model, fit_feature_encoder(X, mappings), model.predict_proba(X)[:, 1]
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".csv"])
+def test_score_file_streams_chunks(raw_records, fitted_model, tmp_path, suffix):
+    """Test that chunked scoring matches scoring the whole frame."""
+    model, encoder, expected = fitted_model
+    input_path = tmp_path / f"records{suffix}"
+    if suffix == ".csv":
+        raw_records.to_csv(input_path, index=False)
+    else:
+        raw_records.to_parquet(input_path, row_group_size=100)
+    output_path = tmp_path / "out" / "predictions.parquet"
+
+    summary = score_file(
+        model,
+        encoder,
+        str(input_path),
+        str(output_path),
+        chunk_size=64,
+        id_columns=["PolNum"],
+    )
+
+    predictions = pd.read_parquet(output_path)
+    assert summary["rows"] == 300
+    assert summary["chunks"] == 5
+    assert predictions["PolNum"].tolist() == list(range(300))
+    np.testing.assert_allclose(predictions["probability"], expected)
+    assert predictions["prediction"].tolist() == (expected > 0.5).astype(int).tolist()
+
+
+def test_score_file_in_workers(raw_records, fitted_model, tmp_path):
+    """Test that worker processes write the predictions in input order."""
+    model, encoder, expected = fitted_model
+    input_path = tmp_path / "records.parquet"
+    raw_records.to_parquet(input_path)
+    output_path = tmp_path / "predictions.parquet"
+
+    score_file(
+        model,
+        encoder,
+        str(input_path),
+        str(output_path),
+        chunk_size=50,
+        n_workers=2,
+        id_columns=["PolNum"],
+    )
+
+    predictions = pd.read_parquet(output_path)
+    assert predictions["PolNum"].tolist() == list(range(300))
+    np.testing.assert_allclose(predictions["probability"], expected)
+
+
+def test_score_file_with_flat_model(raw_records, fitted_model, tmp_path):
+    """Test that the flat model export scores like the trained model."""
+    model, encoder, expected = fitted_model
+    input_path = tmp_path / "records.parquet"
+    raw_records.to_parquet(input_path)
+    output_path = tmp_path / "predictions.parquet"
+    flat_model = FlatModel.from_dump(model.booster_.dump_model())
+
+    score_file(flat_model, encoder, str(input_path), str(output_path), chunk_size=64)
+
+    predictions = pd.read_parquet(output_path)
+    np.testing.assert_allclose(predictions["probability"], expected)
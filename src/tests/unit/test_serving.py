@@ -0,0 +1,134 @@
+"""Unit tests for the online scoring service."""
+
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from lightgbm import LGBMClassifier
+
+from insurance_prediction.pipelines.data_processing.nodes import (
+    fit_category_mappings,
+    fit_feature_encoder,
+    preprocess_data,
+)
+from insurance_prediction.serving import MicroBatcher, ScoringApp
+
+
+async def _request(app, method, path, body=None):
+    """Send one HTTP request to an ASGI app in process."""
+    payload = b"" if body is None else json.dumps(body).encode("utf-8")
+    messages = [{"type": "http.request", "body": payload, "more_body": False}]
+    response = {}
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        else:
+            response["body"] = json.loads(message["body"])
+
+    await app({"type": "http", "method": method, "path": path}, receive, send)
+    return response["status"], response["body"]
+
+
+@pytest.fixture
+def raw_records() -> pd.DataFrame:
+    """Create raw policy records."""
+    rng = np.random.default_rng(0)
+    n_rows = 200
+    return pd.DataFrame(
+        {
+            "Numtppd": rng.poisson(0.3, n_rows),
+            "Numtpbi": rng.poisson(0.1, n_rows),
+            "Indtppd": rng.random(n_rows),
+            "Indtpbi": rng.random(n_rows),
+            "Age": rng.integers(18, 80, n_rows),
+            "Gender": rng.choice(["Female", "Male"], n_rows),
+        }
+    )
+
+
+@pytest.fixture
+def app(raw_records) -> ScoringApp:
+    """Create a scoring app around a model trained on the raw records."""
+    mappings = fit_category_mappings(raw_records, ["Gender"])
+    data = preprocess_data(raw_records, ["Gender"], mappings)
+    X, y = data.drop(columns="target"), data["target"]
+    model = LGBMClassifier(n_estimators=5, min_child_samples=5, verbosity=-1)
+    model.fit(X, y)
+    return ScoringApp(model, fit_feature_encoder(X, mappings), max_wait_ms=20)
+
+
+def test_predict_matches_model(app, raw_records):
+    """Test that served probabilities match the model on encoded features."""
+    records = raw_records[["Age", "Gender"]].head(3).to_dict("records")
+
+    status, body = asyncio.run(_request(app, "POST", "/predict", {"records": records}))
+
+    assert status == 200
+    expected = app.model.predict_proba(
+        app.encoder.transform_frame(pd.DataFrame.from_records(records))
+    )[:, 1]
+    np.testing.assert_allclose(body["probabilities"], expected)
+    assert body["predictions"] == (expected > 0.5).astype(int).tolist()
+
+
+def test_concurrent_requests_are_batched(app, raw_records):
+    """Test that concurrent requests share batches and latency is reported."""
+    records = raw_records[["Age", "Gender"]].to_dict("records")[:20]
+
+    async def run():
+        responses = await asyncio.gather(
+            *[_request(app, "POST", "/predict", record) for record in records]
+        )
+        return responses, await _request(app, "GET", "/metrics")
+
+    responses, (_, metrics) = asyncio.run(run())
+
+    assert all(status == 200 for status, _ in responses)
+    assert metrics["requests"] == 20
+    assert metrics["batches"] < 20
+    assert metrics["p50_ms"] <= metrics["p99_ms"]
+
+
+def test_predict_rejects_bad_requests(app):
+    """Test that invalid bodies fail their own request only."""
+
+    async def run():
+        return await asyncio.gather(
+            _request(app, "POST", "/predict", {"Age": 30}),
+            _request(app, "POST", "/predict", {"Age": "old", "Gender": "Male"}),
+            _request(app, "POST", "/predict", {"Age": 30, "Gender": "Male"}),
+            _request(app, "GET", "/missing"),
+        )
+
+    statuses = [status for status, _ in asyncio.run(run())]
+
+    assert statuses == [422, 422, 200, 404]
+
+
+def test_micro_batcher_splits_results():
+    """Test that each request gets the results of its own records."""
+    calls = []
+
+    def predict(records):
+        calls.append(len(records))
+        return np.array([record["x"] for record in records], dtype=float)
+
+    batcher = MicroBatcher(predict, max_batch_size=10, max_wait_ms=50)
+
+    async def run():
+        results = await asyncio.gather(
+            *[batcher.submit([{"x": i}, {"x": i + 0.5}]) for i in range(4)]
+        )
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(run())
+
+    assert [result.tolist() for result in results] == [[i, i + 0.5] for i in range(4)]
+    assert calls == [8]